@@ -0,0 +1,144 @@
+"""
+Comandos administrativos
+Uso: flask --app src.main <comando>
+"""
+
+import time
+
+import click
+
+from src.database import db
+from src.migrations import run_migrations
+from src.services.balance_ledger import open_ledgers, verify_ledger
+from src.services.bootstrap import initialize_database
+from src.services.ledger import rebuild_player_daily_totals, rebuild_session_totals
+from src.services.money_migration import migrate_money
+from src.services.payment_queue import PaymentWorkerPool, run_pending_jobs
+from src.services.webhook_inbox import drain_inbox
+from src.services.session_cleanup import session_sweeper
+from src.services.stats_rollup import rebuild_stats_rollups
+from src.services.transaction_archive import archive_closed_months, attach_archive
+
+
+def register_commands(app):
+    """Registrar comandos administrativos na aplicação"""
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Criar tabelas, aplicar migrações e dados padrão (uma vez por deploy)"""
+        timings = initialize_database()
+        for step, elapsed in timings.items():
+            click.echo(f'{step}: {elapsed} ms')
+        click.echo('Banco de dados inicializado')
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Aplicar migrações pendentes no banco existente"""
+        result = run_migrations()
+        for column in result['columns'] + result['money']['added']:
+            click.echo(f'Coluna adicionada: {column}')
+        for column in result['money']['dropped']:
+            click.echo(f'Coluna removida: {column}')
+        for index in result['indexes']:
+            click.echo(f'Índice criado: {index}')
+        click.echo('Migrações aplicadas')
+
+    @app.cli.command('migrate-money')
+    @click.option('--chunk-size', type=int, default=None, help='Linhas por lote (padrão: MONEY_MIGRATION_CHUNK_SIZE)')
+    @click.option('--contract/--no-contract', default=True, help='Remover as colunas em reais ao final')
+    def migrate_money_command(chunk_size, contract):
+        """
+        Converter valores em reais para centavos em lotes, com o sistema no ar
+        Antes do deploy: DB_AUTO_INIT=false flask migrate-money --no-contract
+        """
+        result = migrate_money(db.engine, chunk_size=chunk_size, contract_columns=contract)
+        for column in result['added']:
+            click.echo(f'Coluna adicionada: {column}')
+        for table, rows in result['backfilled'].items():
+            click.echo(f'{table}: {rows} linhas convertidas')
+        for column in result['dropped']:
+            click.echo(f'Coluna removida: {column}')
+        click.echo('Valores em centavos')
+
+    @app.cli.command('rebuild-session-totals')
+    def rebuild_session_totals_command():
+        """Recalcular os agregados por sessão (session_totals) e por dia (player_daily_totals) a partir do ledger"""
+        count = rebuild_session_totals()
+        click.echo(f'{count} sessões recalculadas')
+        count = rebuild_player_daily_totals()
+        click.echo(f'{count} linhas de totais diários recalculadas')
+
+    @app.cli.command('verify-ledger')
+    @click.option('--open', 'open_missing', is_flag=True, help='Abrir antes o ledger das sessões com saldo e sem lançamentos')
+    def verify_ledger_command(open_missing):
+        """Conferir o saldo de cada sessão contra o ledger (snapshot + lançamentos)"""
+        if open_missing:
+            click.echo(f'{open_ledgers()} ledgers abertos')
+        mismatches = verify_ledger()
+        for row in mismatches:
+            click.echo(
+                f"{row['anon_id']}: saldo {row['balance']} (seq {row['seq']}), "
+                f"ledger {row['ledger_balance']} (seq {row['ledger_seq']})"
+            )
+        click.echo(f'{len(mismatches)} divergências')
+        if mismatches:
+            raise SystemExit(1)
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Recalcular os contadores diários do admin (stats_rollups) a partir do ledger"""
+        count = rebuild_stats_rollups()
+        click.echo(f'{count} linhas de estatísticas recalculadas')
+
+    @app.cli.command('process-payments')
+    @click.option('--once', is_flag=True, help='Executar os jobs prontos e sair')
+    @click.option('--workers', type=int, default=4, help='Threads do pool')
+    def process_payments_command(once, workers):
+        """Consumir a fila de pagamentos (jobs do gateway)"""
+        if once:
+            click.echo(f'{run_pending_jobs()} jobs executados')
+            return
+        pool = PaymentWorkerPool(app, concurrency=workers).start()
+        click.echo(f'{pool.concurrency} workers de pagamento em execução (Ctrl+C para sair)')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pool.stop()
+
+    @app.cli.command('drain-webhooks')
+    @click.option('--batch-size', type=int, default=None, help='Eventos por lote')
+    def drain_webhooks_command(batch_size):
+        """Processar os eventos pendentes da inbox de webhooks"""
+        click.echo(f'{drain_inbox(batch_size)} eventos processados')
+
+    @app.cli.command('cleanup-sessions')
+    @click.option('--days', type=int, default=None, help='Dias de inatividade (padrão: SESSION_CLEANUP_DAYS)')
+    @click.option('--chunk-size', type=int, default=None, help='Linhas por DELETE')
+    def cleanup_sessions_command(days, chunk_size):
+        """Remover sessões anônimas inativas e as linhas órfãs"""
+        deleted = session_sweeper.run(days=days, chunk_size=chunk_size)
+        for table, count in deleted.items():
+            click.echo(f'{table}: {count} removidas')
+
+    @app.cli.command('archive-transactions')
+    @click.option('--hot-months', type=int, default=None, help='Meses mantidos na tabela (padrão: TRANSACTION_HOT_MONTHS)')
+    @click.option('--chunk-size', type=int, default=None, help='Linhas por lote')
+    def archive_transactions_command(hot_months, chunk_size):
+        """Mover meses fechados do ledger para arquivos comprimidos"""
+        result = archive_closed_months(hot_months=hot_months, chunk_size=chunk_size)
+        for month, rows in result.items():
+            if rows == 'open':
+                click.echo(f'{month}: ignorado (transações em aberto)')
+            else:
+                click.echo(f'{month}: {rows} transações arquivadas')
+        if not result:
+            click.echo('Nenhum mês fechado para arquivar')
+
+    @app.cli.command('attach-archive')
+    @click.argument('month')
+    def attach_archive_command(month):
+        """Descomprimir um mês arquivado (AAAA-MM) para auditoria"""
+        path = attach_archive(month)
+        click.echo(path)
+        click.echo(f"Para consultar junto ao banco: ATTACH DATABASE '{path}' AS archive_{month.replace('-', '_')}")
@@ -1,6 +1,32 @@
 import os
-from src.database import db
+from src.database import db, insert_missing
 from src.models.casino import CasinoSettings
+from src.services.settings_cache import settings_cache, bump_settings_version
+from src.services.money import to_cents
+
+# Configurações padrão: (chave, valor, tipo, descrição, categoria)
+DEFAULT_SETTINGS = [
+    # Limites de depósito e saque
+    ('min_deposit_amount', '10', 'number', 'Valor mínimo de depósito em BRL', 'payment'),
+    ('max_deposit_amount', '5000', 'number', 'Valor máximo de depósito em BRL', 'payment'),
+    ('min_withdraw_amount', '20', 'number', 'Valor mínimo de saque em BRL', 'payment'),
+    ('daily_deposit_limit', '1000', 'number', 'Limite diário de depósitos por jogador em BRL (0 desativa)', 'payment'),
+    
+    # Limites de jogo responsável
+    ('daily_loss_limit', '500', 'number', 'Limite diário de perda por jogador em BRL (0 desativa)', 'game'),
+    
+    # Limites de apostas por jogo
+    ('min_bet_roulette', '5', 'number', 'Aposta mínima na roleta em BRL', 'game'),
+    ('min_bet_blackjack', '10', 'number', 'Aposta mínima no blackjack em BRL', 'game'),
+    ('min_bet_slots', '1', 'number', 'Aposta mínima nos slots em BRL', 'game'),
+    ('min_bet_dice', '5', 'number', 'Aposta mínima nos dados em BRL', 'game'),
+    
+    # Configurações de rate limiting
+    ('rate_limit_enabled', 'true', 'boolean', 'Rate limiting habilitado', 'security'),
+    ('rate_limit_requests_per_minute', '60', 'number', 'Requisições por minuto', 'security'),
+    ('rate_limit_requests_per_hour', '1000', 'number', 'Requisições por hora', 'security'),
+]
+
 
 class Config:
     """Classe para gerenciar configurações do cassino"""
@@ -12,10 +38,10 @@ class Config:
         Prioridade: Banco de dados > Variável de ambiente > Valor padrão
         """
         try:
-            # Tentar obter do banco de dados primeiro
-            setting = CasinoSettings.query.filter_by(setting_key=key).first()
-            if setting:
-                return setting.get_value()
+            # Tentar obter do snapshot em memória (recarregado só quando a versão muda)
+            found, value = settings_cache.lookup(key)
+            if found:
+                return value
         except:
             # Se houver erro no banco, continuar para variáveis de ambiente
             pass
@@ -36,29 +62,42 @@ class Config:
         # Retornar valor padrão
         return default
     
+    @staticmethod
+    def get_money_setting(key, default):
+        """Obter configuração em reais convertida para centavos"""
+        return to_cents(Config.get_setting(key, default, 'number'))
+    
     @staticmethod
     def get_deposit_limits():
-        """Obter limites de depósito"""
+        """Obter limites de depósito (centavos)"""
         return {
-            'min_amount': Config.get_setting('min_deposit_amount', 10, 'number'),
-            'max_amount': Config.get_setting('max_deposit_amount', 5000, 'number')
+            'min_amount': Config.get_money_setting('min_deposit_amount', 10),
+            'max_amount': Config.get_money_setting('max_deposit_amount', 5000)
         }
     
     @staticmethod
     def get_withdraw_limits():
-        """Obter limites de saque"""
+        """Obter limites de saque (centavos)"""
         return {
-            'min_amount': Config.get_setting('min_withdraw_amount', 20, 'number')
+            'min_amount': Config.get_money_setting('min_withdraw_amount', 20)
+        }
+    
+    @staticmethod
+    def get_daily_limits():
+        """Obter limites diários por jogador em centavos (0 desativa o limite)"""
+        return {
+            'deposit': Config.get_money_setting('daily_deposit_limit', 1000),
+            'loss': Config.get_money_setting('daily_loss_limit', 500)
         }
     
     @staticmethod
     def get_bet_limits():
-        """Obter limites de apostas por jogo"""
+        """Obter limites de apostas por jogo (centavos)"""
         return {
-            'roulette': Config.get_setting('min_bet_roulette', 5, 'number'),
-            'blackjack': Config.get_setting('min_bet_blackjack', 10, 'number'),
-            'slots': Config.get_setting('min_bet_slots', 1, 'number'),
-            'dice': Config.get_setting('min_bet_dice', 5, 'number')
+            'roulette': Config.get_money_setting('min_bet_roulette', 5),
+            'blackjack': Config.get_money_setting('min_bet_blackjack', 10),
+            'slots': Config.get_money_setting('min_bet_slots', 1),
+            'dice': Config.get_money_setting('min_bet_dice', 5)
         }
     
     @staticmethod
@@ -71,8 +110,8 @@ class Config:
         }
     
     @staticmethod
-    def set_setting(key, value, setting_type='string', description=None, category=None):
-        """Definir configuração no banco de dados"""
+    def set_setting(key, value, setting_type='string', description=None, category=None, is_public=None):
+        """Definir configuração no banco de dados (is_public a expõe em /api/config)"""
         try:
             setting = CasinoSettings.query.filter_by(setting_key=key).first()
             if setting:
@@ -82,57 +121,48 @@ class Config:
                     setting.description = description
                 if category:
                     setting.category = category
+                if is_public is not None:
+                    setting.is_public = is_public
             else:
                 setting = CasinoSettings(
                     setting_key=key,
                     setting_value=str(value),
                     setting_type=setting_type,
                     description=description,
-                    category=category
+                    category=category,
+                    is_public=bool(is_public)
                 )
                 db.session.add(setting)
             
+            # Invalidar o cache dos demais workers
+            bump_settings_version()
             db.session.commit()
+            settings_cache.invalidate()
             return True
         except Exception as e:
             db.session.rollback()
             return False
     
+    @staticmethod
+    def get_cache_stats():
+        """Obter contadores do cache de configurações"""
+        return settings_cache.get_stats()
+    
     @staticmethod
     def initialize_default_settings():
         """Inicializar configurações padrão no banco de dados"""
-        default_settings = [
-            # Limites de depósito e saque
-            ('min_deposit_amount', '10', 'number', 'Valor mínimo de depósito em BRL', 'payment'),
-            ('max_deposit_amount', '5000', 'number', 'Valor máximo de depósito em BRL', 'payment'),
-            ('min_withdraw_amount', '20', 'number', 'Valor mínimo de saque em BRL', 'payment'),
-            
-            # Limites de apostas por jogo
-            ('min_bet_roulette', '5', 'number', 'Aposta mínima na roleta em BRL', 'game'),
-            ('min_bet_blackjack', '10', 'number', 'Aposta mínima no blackjack em BRL', 'game'),
-            ('min_bet_slots', '1', 'number', 'Aposta mínima nos slots em BRL', 'game'),
-            ('min_bet_dice', '5', 'number', 'Aposta mínima nos dados em BRL', 'game'),
-            
-            # Configurações de rate limiting
-            ('rate_limit_enabled', 'true', 'boolean', 'Rate limiting habilitado', 'security'),
-            ('rate_limit_requests_per_minute', '60', 'number', 'Requisições por minuto', 'security'),
-            ('rate_limit_requests_per_hour', '1000', 'number', 'Requisições por hora', 'security'),
-        ]
-        
         try:
-            for key, value, type_, desc, cat in default_settings:
-                existing = CasinoSettings.query.filter_by(setting_key=key).first()
-                if not existing:
-                    setting = CasinoSettings(
-                        setting_key=key,
-                        setting_value=value,
-                        setting_type=type_,
-                        description=desc,
-                        category=cat
-                    )
-                    db.session.add(setting)
+            # Um único INSERT para as chaves que ainda não existem
+            added = insert_missing(CasinoSettings, [
+                {'setting_key': key, 'setting_value': value, 'setting_type': type_,
+                 'description': desc, 'category': cat}
+                for key, value, type_, desc, cat in DEFAULT_SETTINGS
+            ], 'setting_key')
             
+            if added:
+                bump_settings_version()
             db.session.commit()
+            settings_cache.invalidate()
             return True
         except Exception as e:
             db.session.rollback()
@@ -1,3 +1,43 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
 db = SQLAlchemy()
 
+# Dialetos com INSERT ... ON CONFLICT
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def upsert_insert(model):
+    """insert() com suporte a ON CONFLICT no banco em uso (None se não houver)"""
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    return insert(model) if insert is not None else None
+
+
+def insert_missing(model, rows, key):
+    """
+    Inserir em lote as linhas cuja chave única ainda não existe (sem commit)
+    Retorna quantas linhas foram inseridas
+    """
+    if not rows:
+        return 0
+
+    # Todas as linhas com as mesmas colunas (defaults escalares do modelo)
+    columns = {name for row in rows for name in row}
+    defaults = {
+        column.key: column.default.arg if column.default is not None and column.default.is_scalar else None
+        for column in model.__table__.columns if column.key in columns
+    }
+    rows = [{**defaults, **row} for row in rows]
+
+    stmt = upsert_insert(model)
+    if stmt is not None:
+        result = db.session.execute(stmt.values(rows).on_conflict_do_nothing(index_elements=[key]))
+        return max(result.rowcount, 0)
+
+    # Outros bancos: uma consulta pelas chaves existentes
+    column = getattr(model, key)
+    existing = set(db.session.scalars(db.select(column).where(column.in_([row[key] for row in rows]))))
+    missing = [row for row in rows if row[key] not in existing]
+    for row in missing:
+        db.session.add(model(**row))
+    return len(missing)
@@ -0,0 +1,152 @@
+"""
+Benchmark dos perfis de engine do banco
+Vários threads debitam saldo e gravam transações (o caminho de uma aposta)
+enquanto leem o histórico recente, com cada perfil sobre o mesmo banco.
+Informa operações por segundo, latência p50/p99 e erros de trava
+
+Uso: python -m src.db_benchmark --threads 8 --ops 500
+     python -m src.db_benchmark --uri postgresql://... --profile default --profile server
+(--uri deve apontar para um banco descartável: a carga grava jogadores e transações)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.services.engine_profiles import engine_options, install_profile, resolve_profile
+
+PLAYERS = 16
+# Centavos
+INITIAL_BALANCE = 100_000_000
+BET = 100
+# Uma leitura de histórico a cada READ_EVERY operações
+READ_EVERY = 4
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _prepare(engine):
+    """Tabelas (se faltarem) e jogadores novos com saldo"""
+    db.metadata.create_all(engine)
+    players = [str(uuid.uuid4()) for _ in range(PLAYERS)]
+    with engine.begin() as conn:
+        conn.execute(insert(AnonymousSession), [
+            {'anon_id': anon_id, 'balance_cents': INITIAL_BALANCE} for anon_id in players
+        ])
+    return players
+
+
+def _bet(conn, anon_id):
+    """Débito condicional e registro da transação numa única transação"""
+    balance = conn.execute(
+        update(AnonymousSession).where(AnonymousSession.anon_id == anon_id, AnonymousSession.balance_cents >= BET)
+        .values(balance_cents=AnonymousSession.balance_cents - BET).returning(AnonymousSession.balance_cents)
+    ).scalar()
+    conn.execute(insert(Transaction).values(
+        anon_id=anon_id, transaction_type='bet', amount_cents=BET, balance_after_cents=balance, status='completed'
+    ))
+
+
+def _history(conn, anon_id):
+    return conn.execute(
+        select(Transaction.id, Transaction.amount_cents).where(Transaction.anon_id == anon_id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(20)
+    ).all()
+
+
+def run_profile(uri, profile, threads=8, ops=500):
+    """Executar a carga com um perfil; retorna o relatório"""
+    name = resolve_profile(uri, profile)
+    engine = create_engine(uri, **engine_options(uri, name))
+    install_profile(engine, name)
+    try:
+        players = _prepare(engine)
+        latencies, errors = [], []
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def worker(index):
+            local, failures = [], []
+            anon_id = players[index % len(players)]
+            start.wait()
+            for op in range(ops):
+                began = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        if op % READ_EVERY == READ_EVERY - 1:
+                            _history(conn, anon_id)
+                        else:
+                            _bet(conn, anon_id)
+                except OperationalError as e:
+                    failures.append(str(e.orig))
+                    continue
+                local.append(time.perf_counter() - began)
+            with lock:
+                latencies.extend(local)
+                errors.extend(failures)
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        began = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        return {
+            'profile': name,
+            'ops': len(latencies),
+            'ops_per_second': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p99_ms': _percentile(latencies, 0.99) * 1000,
+            'errors': len(errors),
+            'locked_errors': sum('locked' in error or 'busy' in error for error in errors)
+        }
+    finally:
+        engine.dispose()
+
+
+def run(uri=None, profiles=None, threads=8, ops=500):
+    """Medir cada perfil; sem URI usa um SQLite temporário por perfil"""
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in profiles or (['default', 'sqlite'] if uri is None or uri.startswith('sqlite')
+                                    else ['default', 'server']):
+            target = uri or f"sqlite:///{os.path.join(tmp, f'bench_{profile}.db')}"
+            reports.append(run_profile(target, profile, threads, ops))
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vazão e latência dos perfis de engine do banco')
+    parser.add_argument('--uri', help='URI do banco (padrão: SQLite temporário)')
+    parser.add_argument('--profile', action='append', help='Perfil a medir (pode repetir)')
+    parser.add_argument('--threads', type=int, default=8, help='Threads concorrentes')
+    parser.add_argument('--ops', type=int, default=500, help='Operações por thread')
+    args = parser.parse_args(argv)
+
+    print(f"{'perfil':<10}{'ops':>8}{'ops/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'erros':>8}{'travas':>8}")
+    for r in run(args.uri, args.profile, args.threads, args.ops):
+        print(f"{r['profile']:<10}{r['ops']:>8}{r['ops_per_second']:>10.0f}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['errors']:>8}{r['locked_errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Microbenchmark do custo por chamada dos motores de jogo
+Compara a implementação anterior (dicionários e listas recriados a cada
+chamada, despacho por if/elif) com o registro de motores pré-compilados
+
+Uso: python -m src.engine_benchmark --calls 200000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.game_engines import get_engine
+from src.services.money import to_cents, to_reais
+from src.services.outcome_engine import uniform
+
+# Implementação anterior, mantida aqui apenas como referência de desempenho
+
+
+def round_money(value):
+    """Arredondar em centavos (a implementação anterior usava float)"""
+    return round(value * 100) / 100
+
+
+def legacy_process_game_result(game_type, bet_data, bet_amount, rng=None):
+    """Processar resultado do jogo com vantagem da casa"""
+
+    # Obter configurações de vantagem da casa
+    house_edges = {
+        'roulette': 0.027,  # 2.7%
+        'blackjack': 0.005,  # 0.5%
+        'slots': 0.05,      # 5%
+        'dice': 0.014       # 1.4%
+    }
+
+    house_edge = house_edges.get(game_type, 0.05)
+
+    if game_type == 'roulette':
+        return legacy_process_roulette_result(bet_data, bet_amount, house_edge, rng)
+    elif game_type == 'blackjack':
+        return legacy_process_blackjack_result(bet_data, bet_amount, house_edge)
+    elif game_type == 'slots':
+        return legacy_process_slots_result(bet_data, bet_amount, house_edge, rng)
+    elif game_type == 'dice':
+        return legacy_process_dice_result(bet_data, bet_amount, house_edge, rng)
+    else:
+        return {'payout': 0, 'house_edge': house_edge, 'result': 'unknown'}
+
+
+def legacy_process_roulette_result(bet_data, bet_amount, house_edge, rng=None):
+    """Processar resultado da roleta"""
+    # Gerar número vencedor (0-36)
+    winning_number = int(uniform(rng) * 37)
+
+    # Definir cor do número
+    red_numbers = [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36]
+    winning_color = 'red' if winning_number in red_numbers else 'black' if winning_number != 0 else 'green'
+
+    payout = 0
+    bet_type = bet_data.get('type')
+    bet_value = bet_data.get('value')
+
+    # Calcular pagamento baseado no tipo de aposta
+    if bet_type == 'number' and bet_value == winning_number:
+        payout = bet_amount * 35  # 35:1
+    elif bet_type == 'color' and bet_value == winning_color and winning_number != 0:
+        payout = bet_amount * 2  # 1:1
+    elif bet_type == 'even_odd':
+        if bet_value == 'even' and winning_number % 2 == 0 and winning_number != 0:
+            payout = bet_amount * 2
+        elif bet_value == 'odd' and winning_number % 2 == 1:
+            payout = bet_amount * 2
+    elif bet_type == 'high_low':
+        if bet_value == 'low' and 1 <= winning_number <= 18:
+            payout = bet_amount * 2
+        elif bet_value == 'high' and 19 <= winning_number <= 36:
+            payout = bet_amount * 2
+
+    # Aplicar vantagem da casa
+    if payout > bet_amount:
+        house_cut = (payout - bet_amount) * house_edge
+        payout -= house_cut
+
+    return {
+        'payout': round_money(payout),
+        'house_edge': house_edge,
+        'result': {
+            'winning_number': winning_number,
+            'winning_color': winning_color,
+            'bet_type': bet_type,
+            'bet_value': bet_value,
+            'won': payout > 0
+        }
+    }
+
+def legacy_process_blackjack_result(bet_data, bet_amount, house_edge):
+    """Processar resultado do blackjack"""
+    # Simular jogo de blackjack
+    player_cards = bet_data.get('player_cards', [])
+    dealer_cards = bet_data.get('dealer_cards', [])
+
+    player_total = sum(card['value'] for card in player_cards)
+    dealer_total = sum(card['value'] for card in dealer_cards)
+
+    payout = 0
+    result_type = 'lose'
+
+    if player_total > 21:
+        result_type = 'bust'
+    elif dealer_total > 21:
+        result_type = 'dealer_bust'
+        payout = bet_amount * 2
+    elif player_total == 21 and len(player_cards) == 2:
+        result_type = 'blackjack'
+        payout = bet_amount * 2.5
+    elif player_total > dealer_total:
+        result_type = 'win'
+        payout = bet_amount * 2
+    elif player_total == dealer_total:
+        result_type = 'push'
+        payout = bet_amount
+
+    # Aplicar vantagem da casa
+    if payout > bet_amount:
+        house_cut = (payout - bet_amount) * house_edge
+        payout -= house_cut
+
+    return {
+        'payout': round_money(payout),
+        'house_edge': house_edge,
+        'result': {
+            'player_total': player_total,
+            'dealer_total': dealer_total,
+            'result_type': result_type,
+            'won': payout > bet_amount
+        }
+    }
+
+def legacy_process_slots_result(bet_data, bet_amount, house_edge, rng=None):
+    """Processar resultado do caça-níqueis"""
+    symbols = ['🍒', '🍋', '🍊', '🍇', '⭐', '💎', '7️⃣']
+
+    # Gerar resultado dos 3 rolos
+    reels = [symbols[int(uniform(rng) * len(symbols))] for _ in range(3)]
+
+    payout = 0
+
+    # Verificar combinações vencedoras
+    if reels[0] == reels[1] == reels[2]:
+        # Três símbolos iguais
+        multipliers = {
+            '🍒': 5, '🍋': 8, '🍊': 10, '🍇': 15,
+            '⭐': 25, '💎': 50, '7️⃣': 100
+        }
+        payout = bet_amount * multipliers.get(reels[0], 5)
+    elif reels[0] == reels[1] or reels[1] == reels[2] or reels[0] == reels[2]:
+        # Dois símbolos iguais
+        payout = bet_amount * 2
+
+    # Aplicar vantagem da casa
+    if payout > bet_amount:
+        house_cut = (payout - bet_amount) * house_edge
+        payout -= house_cut
+
+    return {
+        'payout': round_money(payout),
+        'house_edge': house_edge,
+        'result': {
+            'reels': reels,
+            'won': payout > 0
+        }
+    }
+
+def legacy_process_dice_result(bet_data, bet_amount, house_edge, rng=None):
+    """Processar resultado dos dados"""
+    dice1 = int(uniform(rng) * 6) + 1
+    dice2 = int(uniform(rng) * 6) + 1
+    total = dice1 + dice2
+
+    bet_type = bet_data.get('type')
+    bet_value = bet_data.get('value')
+
+    payout = 0
+
+    if bet_type == 'total' and bet_value == total:
+        # Aposta no total exato
+        multipliers = {7: 4, 6: 6, 8: 6, 5: 8, 9: 8, 4: 10, 10: 10, 3: 15, 11: 15, 2: 30, 12: 30}
+        payout = bet_amount * multipliers.get(total, 1)
+    elif bet_type == 'high_low':
+        if bet_value == 'low' and total <= 6:
+            payout = bet_amount * 2
+        elif bet_value == 'high' and total >= 8:
+            payout = bet_amount * 2
+    elif bet_type == 'even_odd':
+        if bet_value == 'even' and total % 2 == 0:
+            payout = bet_amount * 2
+        elif bet_value == 'odd' and total % 2 == 1:
+            payout = bet_amount * 2
+
+    # Aplicar vantagem da casa
+    if payout > bet_amount:
+        house_cut = (payout - bet_amount) * house_edge
+        payout -= house_cut
+
+    return {
+        'payout': round_money(payout),
+        'house_edge': house_edge,
+        'result': {
+            'dice1': dice1,
+            'dice2': dice2,
+            'total': total,
+            'bet_type': bet_type,
+            'bet_value': bet_value,
+            'won': payout > 0
+        }
+    }
+
+
+# Apostas usadas na medição
+SCENARIOS = [
+    ('roulette', {'type': 'color', 'value': 'red'}),
+    ('roulette', {'type': 'number', 'value': 17}),
+    ('dice', {'type': 'total', 'value': 7}),
+    ('dice', {'type': 'high_low', 'value': 'high'}),
+    ('slots', {}),
+    ('blackjack', {'player_cards': [{'value': 10}, {'value': 9}], 'dealer_cards': [{'value': 10}, {'value': 8}]}),
+]
+
+
+# Valor apostado em cada cenário (reais no caminho anterior, centavos no atual)
+BET_AMOUNT = 10.0
+
+
+def registry_process_game_result(game_type, bet_data, bet_amount, rng=None):
+    """Caminho atual: uma consulta ao registro e o motor pré-compilado (centavos)"""
+    return get_engine(game_type).play(bet_data, bet_amount, rng)
+
+
+def measure(function, game_type, bet_data, calls, repeat, bet_amount=BET_AMOUNT):
+    """Melhor tempo por chamada (em nanossegundos) entre as repetições"""
+    rng = np.random.default_rng(0)
+    timer = timeit.Timer(lambda: function(game_type, bet_data, bet_amount, rng))
+    return min(timer.repeat(repeat=repeat, number=calls)) / calls * 1e9
+
+
+def check_equivalence(game_type, bet_data, rounds=1000):
+    """As duas implementações produzem o mesmo resultado com o mesmo seed"""
+    legacy_rng = np.random.default_rng(42)
+    registry_rng = np.random.default_rng(42)
+    for _ in range(rounds):
+        legacy = legacy_process_game_result(game_type, bet_data, BET_AMOUNT, legacy_rng)
+        current = registry_process_game_result(game_type, bet_data, to_cents(BET_AMOUNT), registry_rng)
+        current = {'payout': to_reais(current.pop('payout_cents')), **current}
+        if legacy != current:
+            return False
+    return True
+
+
+def run(calls=100_000, repeat=5):
+    """Medir todos os cenários"""
+    reports = []
+    for game_type, bet_data in SCENARIOS:
+        before = measure(legacy_process_game_result, game_type, bet_data, calls, repeat)
+        after = measure(registry_process_game_result, game_type, bet_data, calls, repeat, to_cents(BET_AMOUNT))
+        reports.append({
+            'game_type': game_type,
+            'bet': bet_data.get('type', '-'),
+            'before_ns': before,
+            'after_ns': after,
+            'speedup': before / after if after else 0.0,
+            'equivalent': check_equivalence(game_type, bet_data)
+        })
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Custo por chamada dos motores de jogo (antes/depois)')
+    parser.add_argument('--calls', type=int, default=100_000, help='Chamadas por medição')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições (usa a melhor)')
+    args = parser.parse_args(argv)
+
+    print(f"{'jogo':<11}{'aposta':<10}{'antes (ns)':>12}{'depois (ns)':>13}{'ganho':>8}{'mesmo resultado':>17}")
+    for r in run(args.calls, args.repeat):
+        print(f"{r['game_type']:<11}{r['bet']:<10}{r['before_ns']:>12.0f}{r['after_ns']:>13.0f}"
+              f"{r['speedup']:>7.2f}x{'sim' if r['equivalent'] else 'NÃO':>17}")
+
+
+if __name__ == '__main__':
+    main()
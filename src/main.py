@@ -3,17 +3,36 @@ import sys
 # DON'T CHANGE: Add the parent directory to the path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 from src.database import db
-from src.models.casino import Transaction, GameSession, GameRound, CasinoSettings
+from src.models.casino import Transaction, GameSession, GameRound, CasinoSettings, StatsRollup
 from src.models.anon_session import AnonymousSession
 from src.models.payment_methods import SystemPaymentMethod
+from src.models.payment_job import PaymentJob
+from src.models.webhook_event import WebhookEvent
+from src.models.transaction_archive import TransactionArchive
+from src.models.schema_version import SchemaVersion
 from src.routes.casino import casino_bp
 from src.routes.anon import anon_bp
 from src.routes.payments import payments_bp
 from src.config import Config
+from src.services.settings_cache import settings_cache
+from src.services.engine_profiles import init_engine_profile, get_profile_stats
+from src.services.bootstrap import ensure_database, get_startup_stats
+from src.services.static_assets import AssetManifest
+from src.cli import register_commands
+from src.services.rate_limiter import init_rate_limiting
+from src.services.payment_queue import init_payment_workers
+from src.services.webhook_inbox import init_webhook_consumer
+from src.services.session_cleanup import schedule_session_cleanup, session_sweeper
+from src.services.activity_buffer import activity_buffer
+from src.payment_gateways import payment_manager
+from src.services.status_cache import gateway_status_cache
+from src.services.stats_rollup import get_admin_stats
+from src.services.transaction_archive import get_archive_stats
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -22,6 +41,12 @@ app.config['SECRET_KEY'] = os.getenv('APP_KEY', 'asdf#FGSgvasgf$5$WGT')
 app.config['DEBUG'] = os.getenv('APP_DEBUG', 'false').lower() == 'true'
 app.config['ENV'] = os.getenv('APP_ENV', 'production')
 
+# Atrás de proxy reverso: confiar só nos TRUSTED_PROXY_COUNT saltos de
+# X-Forwarded-For (remote_addr passa a ser o IP do cliente visto pelo proxy)
+trusted_proxies = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
 # Configurar CORS para permitir requisições do frontend
 CORS(app, origins=['*'], supports_credentials=True)
 
@@ -30,70 +55,59 @@ app.register_blueprint(casino_bp, url_prefix='/api/casino')
 app.register_blueprint(anon_bp, url_prefix='/api/anon')
 app.register_blueprint(payments_bp, url_prefix='/api/payments')
 
+# Rate limiting global das rotas /api/ (limites em casino_settings)
+init_rate_limiting(app)
+
 # Configuração do banco de dados
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DB_DATABASE", "sqlite:///casino.db")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+# Perfil da engine (DB_ENGINE_PROFILE): WAL e busy_timeout no SQLite, pool nos servidores
+init_engine_profile(app, db)
+register_commands(app)
 
-# Criar tabelas
+# Verificar o banco: um SELECT em schema_versions quando já está atualizado
+# (a inicialização completa roda uma vez por deploy com `flask init-db`)
 with app.app_context():
-    db.create_all()
-    
-    # Inicializar configurações padrão
-    Config.initialize_default_settings()
-    
-    # Inicializar métodos de pagamento padrão
-    SystemPaymentMethod.initialize_default_methods()
-    
-    print("Banco de dados inicializado com configurações padrão")
+    ensure_database()
+
+# Workers da fila de pagamentos (PAYMENT_WORKERS=0 para rodar só via `flask process-payments`)
+init_payment_workers(app)
+
+# Consumidor da inbox de webhooks (WEBHOOK_CONSUMER_ENABLED=false para rodar só via `flask drain-webhooks`)
+init_webhook_consumer(app)
+
+# Limpeza periódica de sessões inativas (SESSION_CLEANUP_INTERVAL_SECONDS=0 desliga)
+schedule_session_cleanup(app)
+
+# Gravação em lote de last_activity das rotas de leitura
+activity_buffer.start(app)
+
+# Manifesto dos estáticos (hash, gzip/brotli) montado uma vez no boot
+static_manifest = AssetManifest(
+    app.static_folder,
+    index_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'index.html')
+).build()
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    # Servir index.html da raiz do projeto
-    if path == "" or path == "index.html":
-        root_path = os.path.dirname(os.path.dirname(__file__))  # Volta para a raiz do projeto
-        index_path = os.path.join(root_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(root_path, 'index.html')
-        else:
-            return "index.html not found", 404
-    
-    # Servir arquivos estáticos com caminho src/static/
-    if path.startswith('src/static/'):
-        # Remove 'src/static/' do caminho para acessar a pasta static correta
-        static_path = path[11:]  # Remove 'src/static/'
-        static_folder_path = app.static_folder
-        if static_folder_path and os.path.exists(os.path.join(static_folder_path, static_path)):
-            return send_from_directory(static_folder_path, static_path)
-    
-    # Servir arquivos estáticos diretamente da pasta src/static
-    static_folder_path = app.static_folder
-    if static_folder_path and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    
-    # Se não encontrar o arquivo, servir o index.html
-    root_path = os.path.dirname(os.path.dirname(__file__))
-    index_path = os.path.join(root_path, 'index.html')
-    if os.path.exists(index_path):
-        return send_from_directory(root_path, 'index.html')
-    else:
+    # Arquivo do manifesto; qualquer outro caminho cai no index.html (SPA)
+    asset = static_manifest.lookup(path) or static_manifest.index
+    if asset is None:
         return "File not found", 404
+    return static_manifest.respond(asset, request)
 
-# Rota para obter configurações públicas do cassino
-@app.route('/api/config', methods=['GET'])
-def get_public_config():
-    """Obter configurações públicas do cassino"""
-    
-    config = {}
-    for setting in public_settings:
-        config[setting.setting_key] = setting.get_value()
+def _public_config(snapshot):
+    """Payload de /api/config: configurações is_public mais as de ambiente"""
+    config = dict(snapshot.public)
     
     # Adicionar configurações de ambiente
     config.update({
         'app_name': os.getenv('APP_NAME', 'Triger Bank'),
         'app_url': os.getenv('APP_URL', 'https://seu-dominio.com'),
         'paypal_mode': os.getenv('PAYPAL_MODE', 'live'),
+        # Chave pública de criptografia do cartão (pagarme.js gera o card_hash)
+        'pagarme_encryption_key': os.getenv('PAGARME_ENCRYPTION_KEY', ''),
         'environment': os.getenv('APP_ENV', 'production')
     })
     
@@ -103,6 +117,20 @@ def get_public_config():
         'environment': os.getenv('APP_ENV', 'production')
     }
 
+# Rota para obter configurações públicas do cassino
+@app.route('/api/config', methods=['GET'])
+def get_public_config():
+    """Obter configurações públicas do cassino"""
+    # JSON pronto em memória, refeito só quando a versão das configurações muda
+    body, etag = settings_cache.serialized(_public_config)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # Rota de saúde da aplicação
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -128,18 +156,20 @@ def health_check():
 def admin_stats():
     """Estatísticas do sistema para administradores"""
     try:
-        # total_users = CasinoUser.query.count() # Removido, pois não há mais usuários registrados
-        total_transactions = Transaction.query.count()
-        total_game_sessions = GameSession.query.count()
-        
-        # Calcular volume total de transações
-        total_volume = db.session.query(db.func.sum(Transaction.amount)).scalar() or 0
-        
+        # Totais vindos do rollup diário (sem varrer transactions/game_sessions)
+        days = request.args.get('days', 30, type=int)
         return {
             'total_users': 0, # Definido como 0, pois não há mais usuários registrados
-            'total_transactions': total_transactions,
-            'total_game_sessions': total_game_sessions,
-            'total_volume': float(total_volume),
+            **get_admin_stats(days=min(max(days, 1), 366)),
+            'settings_cache': Config.get_cache_stats(),
+            'gateway_latency': payment_manager.get_metrics(),
+            'gateway_status_cache': gateway_status_cache.get_stats(),
+            'session_cleanup': session_sweeper.get_stats(),
+            'activity_buffer': activity_buffer.get_stats(),
+            'transaction_archive': get_archive_stats(),
+            'startup': get_startup_stats(),
+            'engine_profile': get_profile_stats(),
+            'static_assets': static_manifest.get_stats(),
             'timestamp': datetime.utcnow().isoformat()
         }
     except Exception as e:
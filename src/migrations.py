@@ -0,0 +1,76 @@
+"""
+Migrações incrementais do esquema
+db.create_all() cria tabelas novas mas não altera tabelas existentes;
+aqui ficam as alterações idempotentes para bancos já em produção
+"""
+
+from sqlalchemy import inspect, text
+
+from src.database import db
+from src.services.balance_ledger import open_ledgers
+from src.services.ledger import backfill_player_daily_totals
+from src.services.money_migration import migrate_money
+from src.services.payment_queue import scrub_card_data
+from src.services.stats_rollup import backfill_stats_rollups
+
+# Colunas adicionadas após a criação das tabelas: (tabela, coluna, tipo SQL)
+ADDED_COLUMNS = [
+    ('transactions', 'payment_method', 'VARCHAR(50)'),
+    ('transactions', 'updated_at', 'DATETIME'),
+    ('anonymous_sessions', 'ledger_seq', 'BIGINT NOT NULL DEFAULT 0'),
+    ('payment_jobs', 'reconcile', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+    ('webhook_events', 'attempts', 'INTEGER NOT NULL DEFAULT 0'),
+    ('webhook_events', 'next_attempt_at', 'DATETIME'),
+]
+
+
+def add_missing_columns():
+    """Adicionar colunas que ainda não existem no banco"""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    added = []
+
+    for table, column, column_type in ADDED_COLUMNS:
+        if table not in tables:
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column not in existing:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+            added.append(f'{table}.{column}')
+
+    db.session.commit()
+    return added
+
+
+def create_missing_indexes():
+    """Criar índices declarados nos modelos que ainda não existem no banco"""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+
+    return created
+
+
+def run_migrations():
+    """Aplicar todas as migrações pendentes"""
+    return {
+        'columns': add_missing_columns(),
+        # Reais (Float) -> centavos antes de qualquer leitura dos agregados
+        'money': migrate_money(db.engine),
+        # Lançamento de abertura para saldos anteriores ao ledger
+        'ledger': open_ledgers(),
+        # Cartões em claro gravados antes do fluxo com card_hash
+        'card_data': scrub_card_data(),
+        'indexes': create_missing_indexes(),
+        'rollups': backfill_stats_rollups(),
+        'daily_totals': backfill_player_daily_totals()
+    }
@@ -1,13 +1,23 @@
 from src.database import db
+from src.models.balance_ledger import LedgerEntry
+from src.services.money import to_reais
 from datetime import datetime
+from sqlalchemy import update
 import uuid
 
 class AnonymousSession(db.Model):
     __tablename__ = 'anonymous_sessions'
+    __table_args__ = (
+        # Limpeza de sessões inativas
+        db.Index('ix_anonymous_sessions_last_activity', 'last_activity'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     anon_id = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
-    balance = db.Column(db.Float, default=0.0)
+    # Cabeça do ledger: saldo em centavos (src.services.money) e seq do último
+    # lançamento em ledger_entries, alterados juntos no mesmo UPDATE
+    balance_cents = db.Column(db.BigInteger, default=0)
+    ledger_seq = db.Column(db.BigInteger, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_activity = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
@@ -21,7 +31,7 @@ class AnonymousSession(db.Model):
         return {
             'id': self.id,
             'anon_id': self.anon_id,
-            'balance': self.balance,
+            'balance': to_reais(self.balance_cents),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_activity': self.last_activity.isoformat() if self.last_activity else None,
             'is_active': self.is_active
@@ -33,19 +43,65 @@ class AnonymousSession(db.Model):
         db.session.commit()
     
     def add_balance(self, amount):
-        """Adicionar saldo"""
-        self.balance += amount
-        self.update_activity()
+        """Adicionar saldo (centavos)"""
+        AnonymousSession.credit(self.anon_id, amount, entry_type='adjustment')
         db.session.commit()
     
     def subtract_balance(self, amount):
-        """Subtrair saldo"""
-        if self.balance >= amount:
-            self.balance -= amount
-            self.update_activity()
-            db.session.commit()
-            return True
-        return False
+        """Subtrair saldo (centavos)"""
+        if AnonymousSession.debit(self.anon_id, amount, entry_type='adjustment') is None:
+            return False
+        db.session.commit()
+        return True
+    
+    @staticmethod
+    def post_entries(anon_id, entries, min_balance=None):
+        """
+        Aplicar lançamentos [(tipo, centavos com sinal)] com um único UPDATE
+        atômico, que soma o saldo e reserva os seqs, e anexá-los ao ledger (sem commit)
+        Com min_balance, só aplica se o saldo >= min_balance no momento do UPDATE
+        Retorna o novo saldo em centavos ou None se nenhuma linha foi alterada
+        """
+        conditions = [AnonymousSession.anon_id == anon_id]
+        if min_balance is not None:
+            conditions.append(AnonymousSession.balance_cents >= min_balance)
+        stmt = update(AnonymousSession)\
+            .where(*conditions)\
+            .values(
+                balance_cents=AnonymousSession.balance_cents + sum(amount for _, amount in entries),
+                ledger_seq=AnonymousSession.ledger_seq + len(entries),
+                last_activity=datetime.utcnow()
+            )\
+            .returning(AnonymousSession.balance_cents, AnonymousSession.ledger_seq)\
+            .execution_options(synchronize_session='fetch')
+        row = db.session.execute(stmt).first()
+        if row is None:
+            return None
+        balance, seq = int(row[0]), int(row[1])
+        LedgerEntry.append(anon_id, entries, balance, seq)
+        return balance
+    
+    @staticmethod
+    def adjust_balance(anon_id, delta, min_balance=None, entry_type='adjustment'):
+        """Somar delta (centavos) ao saldo como um lançamento (ver post_entries)"""
+        return AnonymousSession.post_entries(anon_id, [(entry_type, delta)], min_balance=min_balance)
+    
+    @staticmethod
+    def credit(anon_id, amount, entry_type='adjustment'):
+        """
+        Creditar saldo com um único UPDATE atômico (sem commit)
+        Retorna o novo saldo ou None se a sessão não existir
+        """
+        return AnonymousSession.adjust_balance(anon_id, amount, entry_type=entry_type)
+    
+    @staticmethod
+    def debit(anon_id, amount, entry_type='adjustment'):
+        """
+        Debitar saldo com um único UPDATE condicional (sem commit)
+        UPDATE ... SET balance_cents = balance_cents - :x WHERE anon_id = :id AND balance_cents >= :x
+        Retorna o novo saldo ou None se a sessão não existir ou o saldo for insuficiente
+        """
+        return AnonymousSession.adjust_balance(anon_id, -amount, min_balance=amount, entry_type=entry_type)
     
     @staticmethod
     def get_or_create(anon_id):
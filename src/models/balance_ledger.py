@@ -0,0 +1,83 @@
+from src.database import db
+from src.services.money import to_reais
+from datetime import datetime
+from sqlalchemy import insert
+import os
+
+# Um snapshot do saldo a cada N lançamentos da sessão
+SNAPSHOT_INTERVAL = int(os.getenv('BALANCE_SNAPSHOT_INTERVAL', 100))
+
+class LedgerEntry(db.Model):
+    """Lançamento imutável no saldo de uma sessão (somente INSERT)"""
+    __tablename__ = 'ledger_entries'
+    __table_args__ = (
+        # Sequência sem lacunas por sessão; também serve às leituras por intervalo de seq
+        db.UniqueConstraint('anon_id', 'seq', name='uq_ledger_entries_anon_seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    anon_id = db.Column(db.String(36), nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False)
+
+    # opening, deposit, fee, withdraw, bet, win, adjustment
+    entry_type = db.Column(db.String(20), nullable=False)
+    # Valor com sinal e saldo depois do lançamento (centavos)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    balance_cents = db.Column(db.BigInteger, nullable=False)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<LedgerEntry {self.anon_id}#{self.seq}: {self.entry_type} {self.amount_cents}>'
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'entry_type': self.entry_type,
+            'amount': to_reais(self.amount_cents),
+            'balance': to_reais(self.balance_cents),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    @staticmethod
+    def append(anon_id, entries, balance, seq, now=None):
+        """
+        Gravar lançamentos [(tipo, centavos)] que levaram o saldo a `balance`
+        e a sequência a `seq` (valores devolvidos pelo UPDATE da sessão),
+        com os snapshots que caírem no intervalo (sem commit)
+        """
+        now = now or datetime.utcnow()
+        running = balance - sum(amount for _, amount in entries)
+        first_seq = seq - len(entries) + 1
+        rows, snapshots = [], []
+        for offset, (entry_type, amount) in enumerate(entries):
+            running += amount
+            entry_seq = first_seq + offset
+            rows.append({
+                'anon_id': anon_id, 'seq': entry_seq, 'entry_type': entry_type,
+                'amount_cents': amount, 'balance_cents': running, 'created_at': now
+            })
+            if entry_seq % SNAPSHOT_INTERVAL == 0:
+                snapshots.append({'anon_id': anon_id, 'seq': entry_seq, 'balance_cents': running, 'created_at': now})
+
+        db.session.execute(insert(LedgerEntry), rows)
+        if snapshots:
+            db.session.execute(insert(BalanceSnapshot), snapshots)
+
+class BalanceSnapshot(db.Model):
+    """Saldo da sessão após o lançamento `seq` (a cada SNAPSHOT_INTERVAL lançamentos)"""
+    __tablename__ = 'balance_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('anon_id', 'seq', name='uq_balance_snapshots_anon_seq'),
+        # Snapshot mais recente antes de um instante (saldo histórico)
+        db.Index('ix_balance_snapshots_anon_created', 'anon_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    anon_id = db.Column(db.String(36), nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False)
+    balance_cents = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BalanceSnapshot {self.anon_id}#{self.seq}: {self.balance_cents}>'
@@ -1,4 +1,5 @@
 from src.database import db
+from src.services.money import to_reais
 from datetime import datetime
 from sqlalchemy import func
 import bcrypt
@@ -19,19 +20,20 @@ class CasinoUser(db.Model):
     full_name = db.Column(db.String(100), nullable=True)
     phone = db.Column(db.String(20), nullable=True)
     
-    balance = db.Column(db.Float, default=0.0, nullable=False)
-    total_deposited = db.Column(db.Float, default=0.0, nullable=False)
-    total_withdrawn = db.Column(db.Float, default=0.0, nullable=False)
-    total_bet = db.Column(db.Float, default=0.0, nullable=False)
-    total_won = db.Column(db.Float, default=0.0, nullable=False)
+    # Valores em centavos (src.services.money)
+    balance_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_deposited_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_withdrawn_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_bet_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_won_cents = db.Column(db.BigInteger, default=0, nullable=False)
     
     # Configurações do usuário
     preferred_currency = db.Column(db.String(3), default='BRL')
     risk_level = db.Column(db.String(20), default='medium')  # low, medium, high
     
     # Limites de segurança
-    daily_deposit_limit = db.Column(db.Float, default=1000.0)
-    daily_loss_limit = db.Column(db.Float, default=500.0)
+    daily_deposit_limit_cents = db.Column(db.BigInteger, default=100000)
+    daily_loss_limit_cents = db.Column(db.BigInteger, default=50000)
     session_time_limit = db.Column(db.Integer, default=240)  # minutos
     
     # Status da conta
@@ -45,8 +47,10 @@ class CasinoUser(db.Model):
     last_login = db.Column(db.DateTime)
     
     # Relacionamentos
-    transactions = db.relationship('Transaction', backref='casino_user', lazy=True, cascade='all, delete-orphan')
-    game_sessions = db.relationship('GameSession', backref='casino_user', lazy=True, cascade='all, delete-orphan')
+    transactions = db.relationship('Transaction', backref='casino_user', lazy=True, cascade='all, delete-orphan',
+                                   primaryjoin='CasinoUser.user_id == foreign(Transaction.user_id)')
+    game_sessions = db.relationship('GameSession', backref='casino_user', lazy=True, cascade='all, delete-orphan',
+                                    primaryjoin='CasinoUser.user_id == foreign(GameSession.user_id)')
     
     def set_password(self, password):
         """Hash e armazenar senha"""
@@ -89,18 +93,18 @@ class CasinoUser(db.Model):
             'email': self.email,
             'full_name': self.full_name,
             'phone': self.phone,
-            'balance': self.balance,
-            'total_deposited': self.total_deposited,
-            'total_withdrawn': self.total_withdrawn,
-            'total_bet': self.total_bet,
-            'total_won': self.total_won,
-            'net_result': self.total_won - self.total_bet,
+            'balance': to_reais(self.balance_cents),
+            'total_deposited': to_reais(self.total_deposited_cents),
+            'total_withdrawn': to_reais(self.total_withdrawn_cents),
+            'total_bet': to_reais(self.total_bet_cents),
+            'total_won': to_reais(self.total_won_cents),
+            'net_result': to_reais(self.total_won_cents - self.total_bet_cents),
             'preferred_currency': self.preferred_currency,
             'risk_level': self.risk_level,
             'is_active': self.is_active,
             'is_verified': self.is_verified,
             'verification_level': self.verification_level,
-            'daily_loss_limit': self.daily_loss_limit,
+            'daily_loss_limit': to_reais(self.daily_loss_limit_cents),
             'session_time_limit': self.session_time_limit,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_login': self.last_login.isoformat() if self.last_login else None
@@ -110,33 +114,22 @@ class CasinoUser(db.Model):
         """Obter estatísticas do dia"""
         if date is None:
             date = datetime.utcnow().date()
-        
-        start_of_day = datetime.combine(date, datetime.min.time())
-        end_of_day = datetime.combine(date, datetime.max.time())
-        
-        daily_transactions = Transaction.query.filter(
-            Transaction.user_id == self.user_id,
-            Transaction.created_at >= start_of_day,
-            Transaction.created_at <= end_of_day
-        ).all()
-        
-        daily_deposits = sum(t.amount for t in daily_transactions if t.transaction_type == 'deposit')
-        daily_withdrawals = sum(t.amount for t in daily_transactions if t.transaction_type == 'withdraw')
-        daily_bets = sum(t.amount for t in daily_transactions if t.transaction_type == 'bet')
-        daily_wins = sum(t.amount for t in daily_transactions if t.transaction_type == 'win')
-        
-        return {
-            'date': date.isoformat(),
-            'deposits': daily_deposits,
-            'withdrawals': daily_withdrawals,
-            'bets': daily_bets,
-            'wins': daily_wins,
-            'net_result': daily_wins - daily_bets
-        }
+
+        # Lido do agregado diário (player_daily_totals), sem carregar as transações
+        totals = PlayerDailyTotals.totals_by_day(self.user_id, date, date)
+        return PlayerDailyTotals.daily_summary(date, totals.get(date))
 
 class Transaction(db.Model):
     """Modelo para transações financeiras"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Histórico por sessão ordenado por data (paginação)
+        db.Index('ix_transactions_anon_created', 'anon_id', 'created_at', 'id'),
+        # Busca do webhook pelo ID do gateway
+        db.Index('ix_transactions_external_id', 'external_transaction_id'),
+        # Meses a arquivar (partição quente por data)
+        db.Index('ix_transactions_created', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(100), nullable=True)  # Tornado opcional para sessões anônimas
@@ -144,8 +137,8 @@ class Transaction(db.Model):
     
     # Tipo de transação
     transaction_type = db.Column(db.String(20), nullable=False)  # deposit, withdraw, bet, win, bonus
-    amount = db.Column(db.Float, nullable=False)
-    balance_after = db.Column(db.Float, nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    balance_after_cents = db.Column(db.BigInteger, nullable=False)
     
     # Descrição e detalhes
     description = db.Column(db.Text)
@@ -155,6 +148,7 @@ class Transaction(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, completed, failed, cancelled
     
     # Referências externas
+    payment_method = db.Column(db.String(50))  # paypal, pix, credit_card, etc.
     external_transaction_id = db.Column(db.String(100))  # ID do PayPal, etc.
     game_session_id = db.Column(db.Integer, db.ForeignKey('game_sessions.id'))
     
@@ -163,10 +157,11 @@ class Transaction(db.Model):
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     processed_at = db.Column(db.DateTime)
     
     def __repr__(self):
-        return f'<Transaction {self.id}: {self.transaction_type} {self.amount}>'
+        return f'<Transaction {self.id}: {self.transaction_type} {self.amount_cents}>'
     
     def to_dict(self):
         return {
@@ -174,11 +169,12 @@ class Transaction(db.Model):
             'user_id': self.user_id,
             'anon_id': self.anon_id,
             'transaction_type': self.transaction_type,
-            'amount': self.amount,
-            'balance_after': self.balance_after,
+            'amount': to_reais(self.amount_cents),
+            'balance_after': to_reais(self.balance_after_cents),
             'description': self.description,
             'category': self.category,
             'status': self.status,
+            'payment_method': self.payment_method,
             'external_transaction_id': self.external_transaction_id,
             'game_session_id': self.game_session_id,
             'extra_data': self.extra_data,
@@ -186,9 +182,133 @@ class Transaction(db.Model):
             'processed_at': self.processed_at.isoformat() if self.processed_at else None
         }
 
+class SessionTotals(db.Model):
+    """Agregados materializados do ledger por sessão anônima"""
+    __tablename__ = 'session_totals'
+    
+    anon_id = db.Column(db.String(36), primary_key=True)
+    
+    # Totais por tipo de transação (centavos)
+    total_deposited_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_withdrawn_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_bet_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_won_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    
+    # Contagens por tipo de transação
+    deposit_count = db.Column(db.Integer, default=0, nullable=False)
+    withdraw_count = db.Column(db.Integer, default=0, nullable=False)
+    bet_count = db.Column(db.Integer, default=0, nullable=False)
+    win_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # transaction_type -> (coluna de total, coluna de contagem)
+    COLUMNS = {
+        'deposit': ('total_deposited_cents', 'deposit_count'),
+        'withdraw': ('total_withdrawn_cents', 'withdraw_count'),
+        'bet': ('total_bet_cents', 'bet_count'),
+        'win': ('total_won_cents', 'win_count'),
+    }
+    
+    def __repr__(self):
+        return f'<SessionTotals {self.anon_id}>'
+    
+    def to_dict(self):
+        return {
+            'total_deposited_cents': self.total_deposited_cents,
+            'total_withdrawn_cents': self.total_withdrawn_cents,
+            'total_bet_cents': self.total_bet_cents,
+            'total_won_cents': self.total_won_cents,
+            'deposit_count': self.deposit_count,
+            'withdraw_count': self.withdraw_count,
+            'bet_count': self.bet_count,
+            'win_count': self.win_count
+        }
+
+class PlayerDailyTotals(db.Model):
+    """Agregados do ledger por jogador, dia e jogo (limites diários e relatórios)"""
+    __tablename__ = 'player_daily_totals'
+
+    # anon_id da sessão anônima ou user_id do CasinoUser
+    player_id = db.Column(db.String(100), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    # Tipo de jogo; '' para depósitos e saques
+    game_type = db.Column(db.String(50), primary_key=True, default='')
+
+    total_deposited_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_withdrawn_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_bet_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    total_won_cents = db.Column(db.BigInteger, default=0, nullable=False)
+
+    deposit_count = db.Column(db.Integer, default=0, nullable=False)
+    withdraw_count = db.Column(db.Integer, default=0, nullable=False)
+    bet_count = db.Column(db.Integer, default=0, nullable=False)
+    win_count = db.Column(db.Integer, default=0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    COLUMNS = SessionTotals.COLUMNS
+
+    def __repr__(self):
+        return f'<PlayerDailyTotals {self.player_id} {self.day} {self.game_type or "-"}>'
+
+    @staticmethod
+    def totals_by_day(player_id, start, end):
+        """Somar os jogos de cada dia entre start e end (inclusive); retorna {dia: dict}"""
+        rows = db.session.query(
+            PlayerDailyTotals.day,
+            *[func.sum(getattr(PlayerDailyTotals, column))
+              for pair in PlayerDailyTotals.COLUMNS.values() for column in pair]
+        ).filter(
+            PlayerDailyTotals.player_id == player_id,
+            PlayerDailyTotals.day >= start,
+            PlayerDailyTotals.day <= end
+        ).group_by(PlayerDailyTotals.day).order_by(PlayerDailyTotals.day).all()
+
+        names = [column for pair in PlayerDailyTotals.COLUMNS.values() for column in pair]
+        return {row[0]: {name: value or 0 for name, value in zip(names, row[1:])} for row in rows}
+
+    @staticmethod
+    def daily_summary(day, totals=None):
+        """Formato de get_daily_stats (em reais) a partir dos totais de um dia"""
+        totals = totals or {}
+        bets = int(totals.get('total_bet_cents', 0))
+        wins = int(totals.get('total_won_cents', 0))
+        return {
+            'date': day.isoformat(),
+            'deposits': to_reais(int(totals.get('total_deposited_cents', 0))),
+            'withdrawals': to_reais(int(totals.get('total_withdrawn_cents', 0))),
+            'bets': to_reais(bets),
+            'wins': to_reais(wins),
+            'net_result': to_reais(wins - bets)
+        }
+
+class StatsRollup(db.Model):
+    """Contadores diários mantidos pelas escritas do ledger (estatísticas do admin)"""
+    __tablename__ = 'stats_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    # transaction, game_session, game_round, game_payout
+    dimension = db.Column(db.String(30), primary_key=True)
+    # Tipo de transação ou tipo de jogo
+    key = db.Column(db.String(50), primary_key=True)
+    
+    count = db.Column(db.Integer, default=0, nullable=False)
+    total_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StatsRollup {self.day} {self.dimension}:{self.key}>'
+
 class GameSession(db.Model):
     """Modelo para sessões de jogo"""
     __tablename__ = 'game_sessions'
+    __table_args__ = (
+        # Sessão ativa do jogo em place_bet
+        db.Index('ix_game_sessions_anon_game_status', 'anon_id', 'game_type', 'status'),
+        # Histórico de jogos por sessão ordenado por início
+        db.Index('ix_game_sessions_anon_start', 'anon_id', 'start_time', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(100), nullable=True)  # Tornado opcional para sessões anônimas
@@ -199,15 +319,15 @@ class GameSession(db.Model):
     game_variant = db.Column(db.String(50))  # european_roulette, classic_blackjack, etc.
     
     # Saldos e apostas
-    initial_balance = db.Column(db.Float, nullable=False)
-    current_balance = db.Column(db.Float, nullable=False)
-    total_bet = db.Column(db.Float, default=0.0)
-    total_won = db.Column(db.Float, default=0.0)
+    initial_balance_cents = db.Column(db.BigInteger, nullable=False)
+    current_balance_cents = db.Column(db.BigInteger, nullable=False)
+    total_bet_cents = db.Column(db.BigInteger, default=0)
+    total_won_cents = db.Column(db.BigInteger, default=0)
     
     # Estatísticas da sessão
     rounds_played = db.Column(db.Integer, default=0)
     rounds_won = db.Column(db.Integer, default=0)
-    biggest_win = db.Column(db.Float, default=0.0)
+    biggest_win_cents = db.Column(db.BigInteger, default=0)
     longest_streak = db.Column(db.Integer, default=0)
     current_streak = db.Column(db.Integer, default=0)
     
@@ -221,8 +341,8 @@ class GameSession(db.Model):
     
     # Configurações da sessão
     auto_play = db.Column(db.Boolean, default=False)
-    max_loss_limit = db.Column(db.Float)
-    max_win_target = db.Column(db.Float)
+    max_loss_limit_cents = db.Column(db.BigInteger)
+    max_win_target_cents = db.Column(db.BigInteger)
     
     # Metadados do jogo
     game_data = db.Column(db.JSON)  # Dados específicos do jogo
@@ -240,15 +360,15 @@ class GameSession(db.Model):
             'anon_id': self.anon_id,
             'game_type': self.game_type,
             'game_variant': self.game_variant,
-            'initial_balance': self.initial_balance,
-            'current_balance': self.current_balance,
-            'total_bet': self.total_bet,
-            'total_won': self.total_won,
-            'net_result': self.total_won - self.total_bet,
+            'initial_balance': to_reais(self.initial_balance_cents),
+            'current_balance': to_reais(self.current_balance_cents),
+            'total_bet': to_reais(self.total_bet_cents or 0),
+            'total_won': to_reais(self.total_won_cents or 0),
+            'net_result': to_reais((self.total_won_cents or 0) - (self.total_bet_cents or 0)),
             'rounds_played': self.rounds_played,
             'rounds_won': self.rounds_won,
             'win_rate': (self.rounds_won / self.rounds_played * 100) if self.rounds_played > 0 else 0,
-            'biggest_win': self.biggest_win,
+            'biggest_win': to_reais(self.biggest_win_cents),
             'longest_streak': self.longest_streak,
             'current_streak': self.current_streak,
             'start_time': self.start_time.isoformat() if self.start_time else None,
@@ -256,8 +376,8 @@ class GameSession(db.Model):
             'duration_minutes': self.duration_minutes,
             'status': self.status,
             'auto_play': self.auto_play,
-            'max_loss_limit': self.max_loss_limit,
-            'max_win_target': self.max_win_target,
+            'max_loss_limit': to_reais(self.max_loss_limit_cents),
+            'max_win_target': to_reais(self.max_win_target_cents),
             'game_data': self.game_data
         }
     
@@ -280,8 +400,8 @@ class GameRound(db.Model):
     
     # Informações da rodada
     round_number = db.Column(db.Integer, nullable=False)
-    bet_amount = db.Column(db.Float, nullable=False)
-    win_amount = db.Column(db.Float, default=0.0)
+    bet_amount_cents = db.Column(db.BigInteger, nullable=False)
+    win_amount_cents = db.Column(db.BigInteger, default=0)
     
     # Detalhes do jogo
     bet_type = db.Column(db.String(50))
@@ -303,9 +423,9 @@ class GameRound(db.Model):
             'session_id': self.session_id,
             'user_id': self.user_id,
             'round_number': self.round_number,
-            'bet_amount': self.bet_amount,
-            'win_amount': self.win_amount,
-            'net_result': self.win_amount - self.bet_amount,
+            'bet_amount': to_reais(self.bet_amount_cents),
+            'win_amount': to_reais(self.win_amount_cents),
+            'net_result': to_reais((self.win_amount_cents or 0) - self.bet_amount_cents),
             'bet_type': self.bet_type,
             'game_result': self.game_result,
             'started_at': self.started_at.isoformat() if self.started_at else None,
@@ -333,8 +453,8 @@ class PaymentMethod(db.Model):
     is_default = db.Column(db.Boolean, default=False)
     
     # Limites
-    daily_limit = db.Column(db.Float)
-    monthly_limit = db.Column(db.Float)
+    daily_limit_cents = db.Column(db.BigInteger)
+    monthly_limit_cents = db.Column(db.BigInteger)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -355,8 +475,8 @@ class PaymentMethod(db.Model):
             'is_active': self.is_active,
             'is_verified': self.is_verified,
             'is_default': self.is_default,
-            'daily_limit': self.daily_limit,
-            'monthly_limit': self.monthly_limit,
+            'daily_limit': to_reais(self.daily_limit_cents),
+            'monthly_limit': to_reais(self.monthly_limit_cents),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'verified_at': self.verified_at.isoformat() if self.verified_at else None,
             'last_used': self.last_used.isoformat() if self.last_used else None
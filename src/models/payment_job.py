@@ -0,0 +1,52 @@
+from src.database import db
+from datetime import datetime
+
+class PaymentJob(db.Model):
+    """Chamada ao gateway de pagamento aguardando execução em background"""
+    __tablename__ = 'payment_jobs'
+    __table_args__ = (
+        # Próximo job pronto para execução
+        db.Index('ix_payment_jobs_status_next_run', 'status', 'next_run_at'),
+        db.Index('ix_payment_jobs_transaction', 'transaction_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False)
+
+    # queued, running, succeeded, failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Resposta ambígua do gateway: as próximas tentativas só consultam a
+    # transação pela reference_key, sem postar de novo
+    reconcile = db.Column(db.Boolean, nullable=False, default=False)
+
+    # Worker que está executando o job (e desde quando)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+
+    # Dados enviados ao gateway (apagados quando o job termina)
+    payload = db.Column(db.JSON)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<PaymentJob {self.id}: {self.status} ({self.attempts}/{self.max_attempts})>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'transaction_id': self.transaction_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'reconcile': self.reconcile,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -1,4 +1,5 @@
-from src.database import db
+from src.database import db, insert_missing
+from src.services.money import percent_of, to_reais
 from datetime import datetime
 
 class SystemPaymentMethod(db.Model):
@@ -15,17 +16,17 @@ class SystemPaymentMethod(db.Model):
     supports_deposit = db.Column(db.Boolean, default=True)
     supports_withdrawal = db.Column(db.Boolean, default=True)
     
-    # Limites específicos do método
-    min_deposit = db.Column(db.Float)
-    max_deposit = db.Column(db.Float)
-    min_withdrawal = db.Column(db.Float)
-    max_withdrawal = db.Column(db.Float)
+    # Limites específicos do método (centavos)
+    min_deposit_cents = db.Column(db.BigInteger)
+    max_deposit_cents = db.Column(db.BigInteger)
+    min_withdrawal_cents = db.Column(db.BigInteger)
+    max_withdrawal_cents = db.Column(db.BigInteger)
     
-    # Taxas
-    deposit_fee_percentage = db.Column(db.Float, default=0.0)
-    deposit_fee_fixed = db.Column(db.Float, default=0.0)
-    withdrawal_fee_percentage = db.Column(db.Float, default=0.0)
-    withdrawal_fee_fixed = db.Column(db.Float, default=0.0)
+    # Taxas: percentual em pontos-base (350 = 3,5%) e fixa em centavos
+    deposit_fee_bps = db.Column(db.Integer, default=0)
+    deposit_fee_fixed_cents = db.Column(db.BigInteger, default=0)
+    withdrawal_fee_bps = db.Column(db.Integer, default=0)
+    withdrawal_fee_fixed_cents = db.Column(db.BigInteger, default=0)
     
     # Tempo de processamento (em minutos)
     deposit_processing_time = db.Column(db.Integer, default=0)  # 0 = instantâneo
@@ -38,6 +39,54 @@ class SystemPaymentMethod(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Métodos criados na inicialização do banco
+    DEFAULT_METHODS = [
+        {
+            'method_name': 'paypal',
+            'display_name': 'PayPal',
+            'description': 'Pagamento via PayPal',
+            'is_active': True,
+            'supports_deposit': True,
+            'supports_withdrawal': True,
+            'min_deposit_cents': 1000,
+            'max_deposit_cents': 500000,
+            'min_withdrawal_cents': 2000,
+            'max_withdrawal_cents': 200000,
+            'deposit_fee_bps': 350,
+            'withdrawal_fee_bps': 200,
+            'deposit_processing_time': 0,
+            'withdrawal_processing_time': 1440
+        },
+        {
+            'method_name': 'pix',
+            'display_name': 'PIX',
+            'description': 'Pagamento instantâneo via PIX',
+            'is_active': True,
+            'supports_deposit': True,
+            'supports_withdrawal': True,
+            'min_deposit_cents': 500,
+            'max_deposit_cents': 1000000,
+            'min_withdrawal_cents': 1000,
+            'max_withdrawal_cents': 500000,
+            'deposit_fee_bps': 0,
+            'withdrawal_fee_bps': 0,
+            'deposit_processing_time': 0,
+            'withdrawal_processing_time': 30
+        },
+        {
+            'method_name': 'credit_card',
+            'display_name': 'Cartão de Crédito',
+            'description': 'Pagamento via cartão de crédito',
+            'is_active': True,
+            'supports_deposit': True,
+            'supports_withdrawal': False,
+            'min_deposit_cents': 2000,
+            'max_deposit_cents': 300000,
+            'deposit_fee_bps': 400,
+            'deposit_processing_time': 0
+        }
+    ]
+    
     def __repr__(self):
         return f'<SystemPaymentMethod {self.method_name}: {self.display_name}>'
     
@@ -50,29 +99,25 @@ class SystemPaymentMethod(db.Model):
             'is_active': self.is_active,
             'supports_deposit': self.supports_deposit,
             'supports_withdrawal': self.supports_withdrawal,
-            'min_deposit': self.min_deposit,
-            'max_deposit': self.max_deposit,
-            'min_withdrawal': self.min_withdrawal,
-            'max_withdrawal': self.max_withdrawal,
-            'deposit_fee_percentage': self.deposit_fee_percentage,
-            'deposit_fee_fixed': self.deposit_fee_fixed,
-            'withdrawal_fee_percentage': self.withdrawal_fee_percentage,
-            'withdrawal_fee_fixed': self.withdrawal_fee_fixed,
+            'min_deposit': to_reais(self.min_deposit_cents),
+            'max_deposit': to_reais(self.max_deposit_cents),
+            'min_withdrawal': to_reais(self.min_withdrawal_cents),
+            'max_withdrawal': to_reais(self.max_withdrawal_cents),
+            'deposit_fee_percentage': (self.deposit_fee_bps or 0) / 100,
+            'deposit_fee_fixed': to_reais(self.deposit_fee_fixed_cents or 0),
+            'withdrawal_fee_percentage': (self.withdrawal_fee_bps or 0) / 100,
+            'withdrawal_fee_fixed': to_reais(self.withdrawal_fee_fixed_cents or 0),
             'deposit_processing_time': self.deposit_processing_time,
             'withdrawal_processing_time': self.withdrawal_processing_time
         }
     
     def calculate_deposit_fee(self, amount):
-        """Calcular taxa de depósito"""
-        percentage_fee = amount * (self.deposit_fee_percentage / 100)
-        total_fee = percentage_fee + self.deposit_fee_fixed
-        return round(total_fee, 2)
+        """Calcular taxa de depósito (centavos)"""
+        return percent_of(amount, self.deposit_fee_bps or 0) + (self.deposit_fee_fixed_cents or 0)
     
     def calculate_withdrawal_fee(self, amount):
-        """Calcular taxa de saque"""
-        percentage_fee = amount * (self.withdrawal_fee_percentage / 100)
-        total_fee = percentage_fee + self.withdrawal_fee_fixed
-        return round(total_fee, 2)
+        """Calcular taxa de saque (centavos)"""
+        return percent_of(amount, self.withdrawal_fee_bps or 0) + (self.withdrawal_fee_fixed_cents or 0)
     
     @staticmethod
     def get_active_methods(operation_type=None):
@@ -89,63 +134,9 @@ class SystemPaymentMethod(db.Model):
     @staticmethod
     def initialize_default_methods():
         """Inicializar métodos de pagamento padrão"""
-        default_methods = [
-            {
-                'method_name': 'paypal',
-                'display_name': 'PayPal',
-                'description': 'Pagamento via PayPal',
-                'is_active': True,
-                'supports_deposit': True,
-                'supports_withdrawal': True,
-                'min_deposit': 10.0,
-                'max_deposit': 5000.0,
-                'min_withdrawal': 20.0,
-                'max_withdrawal': 2000.0,
-                'deposit_fee_percentage': 3.5,
-                'withdrawal_fee_percentage': 2.0,
-                'deposit_processing_time': 0,
-                'withdrawal_processing_time': 1440
-            },
-            {
-                'method_name': 'pix',
-                'display_name': 'PIX',
-                'description': 'Pagamento instantâneo via PIX',
-                'is_active': True,
-                'supports_deposit': True,
-                'supports_withdrawal': True,
-                'min_deposit': 5.0,
-                'max_deposit': 10000.0,
-                'min_withdrawal': 10.0,
-                'max_withdrawal': 5000.0,
-                'deposit_fee_percentage': 0.0,
-                'withdrawal_fee_percentage': 0.0,
-                'deposit_processing_time': 0,
-                'withdrawal_processing_time': 30
-            },
-            {
-                'method_name': 'credit_card',
-                'display_name': 'Cartão de Crédito',
-                'description': 'Pagamento via cartão de crédito',
-                'is_active': True,
-                'supports_deposit': True,
-                'supports_withdrawal': False,
-                'min_deposit': 20.0,
-                'max_deposit': 3000.0,
-                'deposit_fee_percentage': 4.0,
-                'deposit_processing_time': 0
-            }
-        ]
-        
         try:
-            for method_data in default_methods:
-                existing = SystemPaymentMethod.query.filter_by(
-                    method_name=method_data['method_name']
-                ).first()
-                
-                if not existing:
-                    method = SystemPaymentMethod(**method_data)
-                    db.session.add(method)
-            
+            # Um único INSERT para os métodos que ainda não existem
+            insert_missing(SystemPaymentMethod, SystemPaymentMethod.DEFAULT_METHODS, 'method_name')
             db.session.commit()
             return True
         except Exception as e:
@@ -0,0 +1,15 @@
+from src.database import db
+from datetime import datetime
+
+class SchemaVersion(db.Model):
+    """Versão aplicada do esquema e dos dados padrão (evita repetir a inicialização a cada boot)"""
+    __tablename__ = 'schema_versions'
+
+    # schema ou seed
+    component = db.Column(db.String(50), primary_key=True)
+    # Impressão digital do que foi aplicado
+    version = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaVersion {self.component}: {self.version[:12]}>'
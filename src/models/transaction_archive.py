@@ -0,0 +1,39 @@
+from src.database import db
+from src.services.money import to_reais
+from datetime import datetime
+
+class TransactionArchive(db.Model):
+    """Mês de transações movido da tabela quente para um arquivo frio (SQLite comprimido)"""
+    __tablename__ = 'transaction_archives'
+
+    # Mês no formato AAAA-MM
+    month = db.Column(db.String(7), primary_key=True)
+    # Arquivo .db.gz relativo a TRANSACTION_ARCHIVE_DIR
+    filename = db.Column(db.String(255), nullable=False)
+
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    min_id = db.Column(db.Integer)
+    max_id = db.Column(db.Integer)
+    # SHA-256 do arquivo comprimido
+    checksum = db.Column(db.String(64), nullable=False)
+
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Preenchido quando as linhas foram removidas da tabela quente
+    purged_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<TransactionArchive {self.month}: {self.row_count} linhas>'
+
+    def to_dict(self):
+        return {
+            'month': self.month,
+            'filename': self.filename,
+            'row_count': self.row_count,
+            'total_amount': to_reais(self.total_amount_cents),
+            'min_id': self.min_id,
+            'max_id': self.max_id,
+            'checksum': self.checksum,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+            'purged_at': self.purged_at.isoformat() if self.purged_at else None
+        }
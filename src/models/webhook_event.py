@@ -0,0 +1,48 @@
+from src.database import db
+from datetime import datetime
+
+class WebhookEvent(db.Model):
+    """Notificação recebida de um gateway, aguardando processamento (inbox)"""
+    __tablename__ = 'webhook_events'
+    __table_args__ = (
+        # Eventos ainda não processados, em ordem de chegada
+        db.Index('ix_webhook_events_pending', 'processed_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    gateway = db.Column(db.String(50), nullable=False, default='pagarme')
+    # Chave de idempotência: entregas repetidas do mesmo evento colidem aqui
+    event_key = db.Column(db.String(200), unique=True, nullable=False)
+
+    event_type = db.Column(db.String(100))
+    external_transaction_id = db.Column(db.String(100), nullable=False)
+    gateway_status = db.Column(db.String(50))
+    payload = db.Column(db.JSON)
+
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    # applied, ignored, not_found
+    result = db.Column(db.String(20))
+
+    # Evento que chegou antes de a transação ter o id do gateway gravado:
+    # fica na inbox e é tentado de novo com backoff
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<WebhookEvent {self.id}: {self.event_key}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'gateway': self.gateway,
+            'event_key': self.event_key,
+            'event_type': self.event_type,
+            'external_transaction_id': self.external_transaction_id,
+            'gateway_status': self.gateway_status,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'result': self.result,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None
+        }
@@ -4,11 +4,62 @@ Implementa integração real com Pagar.me para processar pagamentos
 """
 
 import os
+import hashlib
+import hmac
 import json
 import requests
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
 from datetime import datetime
 from typing import Dict, Any, Optional
-import pagarme
+from src.services.http_transport import PooledHTTPTransport
+from src.services.money import to_cents, to_reais
+
+class GatewayHTTPError(Exception):
+    """Resposta de erro da API do gateway"""
+    
+    def __init__(self, status_code: int, errors: Any):
+        super().__init__(errors)
+        self.status_code = status_code
+
+def _never_connected(error: Exception) -> bool:
+    """Falha antes de a conexão ser estabelecida: a requisição não saiu daqui"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    # Conexão recusada ou DNS (já esgotadas as tentativas do transporte);
+    # conexão derrubada depois do envio também vira ConnectionError e é ambígua
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Falhas que podem ser repetidas sem risco de cobrança em dobro: só as
+    em que a conexão nem chegou a ser estabelecida
+    """
+    return _never_connected(error)
+
+def needs_reconciliation(error: Exception) -> bool:
+    """
+    Resultado desconhecido: o gateway pode ter criado a transação (5xx, 429,
+    timeout de leitura, conexão derrubada, resposta ilegível). Não se posta de
+    novo; consulta-se a transação pela reference_key (find_payment)
+    """
+    if is_retryable(error):
+        return False
+    if isinstance(error, GatewayHTTPError):
+        return error.status_code == 429 or error.status_code >= 500
+    return True
+
+def _failure(message: str, error: Exception) -> Dict[str, Any]:
+    return {
+        'success': False,
+        'error': f'{message}: {str(error)}',
+        'retryable': is_retryable(error),
+        'reconcile': needs_reconciliation(error)
+    }
 
 class PaymentGateway:
     """Classe base para gateways de pagamento"""
@@ -25,6 +76,14 @@ class PaymentGateway:
         """Obter status do pagamento"""
         raise NotImplementedError
 
+    def find_payment(self, reference_key: str) -> Dict[str, Any]:
+        """Procurar transação pela chave de referência enviada na criação"""
+        raise NotImplementedError
+
+    def verify_postback(self, body: bytes, signature: Optional[str]) -> bool:
+        """Conferir a assinatura de uma notificação (webhook)"""
+        raise NotImplementedError
+
 class PagarMeGateway(PaymentGateway):
     """Gateway de pagamento Pagar.me"""
     
@@ -34,15 +93,43 @@ class PagarMeGateway(PaymentGateway):
         self.api_key = os.getenv('PAGARME_API_KEY', 'ak_test_your_api_key_here')
         self.encryption_key = os.getenv('PAGARME_ENCRYPTION_KEY', 'ek_test_your_encryption_key_here')
         self.recipient_id = os.getenv('PAGARME_RECIPIENT_ID', '07425293129')
-        # Configurar cliente Pagar.me
-        pagarme.authentication_key(self.api_key)
+        # Cliente HTTP com pool keep-alive e timeouts (a SDK abre uma sessão nova a cada chamada)
+        self.transport = PooledHTTPTransport(
+            os.getenv('PAGARME_API_URL', 'https://api.pagar.me/1'),
+            auth=(self.api_key, ''),
+            pool_size=int(os.getenv('PAGARME_POOL_SIZE', 10)),
+            connect_timeout=float(os.getenv('PAGARME_CONNECT_TIMEOUT', 3.05)),
+            read_timeout=float(os.getenv('PAGARME_READ_TIMEOUT', 20))
+        )
+    
+    def _request(self, method: str, path: str, operation: str, data: Optional[Dict[str, Any]] = None,
+                 params: Optional[Dict[str, Any]] = None) -> Any:
+        """Chamar a API do Pagar.me (mesmo contrato de erro da SDK)"""
+        response = self.transport.request(method, path, operation=operation, json=data, params=params)
+        if response.ok:
+            return response.json()
+        try:
+            errors = response.json().get('errors')
+        except ValueError:
+            errors = response.text
+        raise GatewayHTTPError(response.status_code, errors or f'HTTP {response.status_code}')
+    
+    def verify_postback(self, body: bytes, signature: Optional[str]) -> bool:
+        """Conferir o X-Hub-Signature do postback (HMAC do corpo com a chave da API)"""
+        algorithm, _, digest = (signature or '').partition('=')
+        if algorithm not in ('sha1', 'sha256') or not digest:
+            return False
+        expected = hmac.new(self.api_key.encode(), body, getattr(hashlib, algorithm)).hexdigest()
+        return hmac.compare_digest(expected, digest)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Histogramas de latência das chamadas ao gateway"""
+        return self.transport.get_metrics()
         
-    def process_pix_payment(self, amount: float, customer_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Processar pagamento PIX"""
+    def process_pix_payment(self, amount_cents: int, customer_data: Dict[str, Any],
+                            reference_key: Optional[str] = None) -> Dict[str, Any]:
+        """Processar pagamento PIX (valor em centavos, como a API espera)"""
         try:
-            # Converter valor para centavos
-            amount_cents = int(amount * 100)
-            
             # Dados da transação PIX
             transaction_data = {
                 'amount': amount_cents,
@@ -83,10 +170,14 @@ class PagarMeGateway(PaymentGateway):
                 ],
                 'metadata': {
                     'casino_session': customer_data.get('session_id'),
+                    'casino_reference': reference_key,
                     'deposit_type': 'pix'
                 }
             }
-            transaction = pagarme.transaction.create(transaction_data)
+            if reference_key:
+                # Única no gateway: identifica a transação se a resposta se perder
+                transaction_data['reference_key'] = reference_key
+            transaction = self._request('POST', '/transactions', 'create_transaction', transaction_data)
             
             if transaction.get('status') == 'waiting_payment':
                 return {
@@ -95,7 +186,7 @@ class PagarMeGateway(PaymentGateway):
                     'status': 'waiting_payment',
                     'pix_qr_code': transaction.get('pix_qr_code'),
                     'pix_expiration_date': transaction.get('pix_expiration_date'),
-                    'amount': amount,
+                    'amount': to_reais(amount_cents),
                     'message': 'PIX gerado com sucesso. Escaneie o QR Code para pagar.'
                 }
             else:
@@ -105,17 +196,12 @@ class PagarMeGateway(PaymentGateway):
                     'details': transaction
                 }
         except Exception as e:
-            return {
-                'success': False,
-                'error': f'Erro no processamento PIX: {str(e)}'
-            }
+            return _failure('Erro no processamento PIX', e)
 
-    def process_card_payment(self, amount: float, card_data: Dict[str, Any], customer_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Processar pagamento com cartão de crédito/débito"""
+    def process_card_payment(self, amount_cents: int, card_data: Dict[str, Any], customer_data: Dict[str, Any],
+                             reference_key: Optional[str] = None) -> Dict[str, Any]:
+        """Processar pagamento com cartão de crédito/débito (valor em centavos)"""
         try:
-            # Converter valor para centavos
-            amount_cents = int(amount * 100)
-
             # Dados da transação de cartão
             transaction_data = {
                 'amount': amount_cents,
@@ -157,19 +243,23 @@ class PagarMeGateway(PaymentGateway):
                 ],
                 'metadata': {
                     'casino_session': customer_data.get('session_id'),
+                    'casino_reference': reference_key,
                     'deposit_type': 'credit_card'
                 }
             }
+            if reference_key:
+                # Única no gateway: identifica a transação se a resposta se perder
+                transaction_data['reference_key'] = reference_key
 
             # Criar transação
-            transaction = pagarme.transaction.create(transaction_data)
+            transaction = self._request('POST', '/transactions', 'create_transaction', transaction_data)
 
             if transaction.get('status') in ['paid', 'authorized']:
                 return {
                     'success': True,
                     'transaction_id': transaction['id'],
                     'status': transaction['status'],
-                    'amount': amount,
+                    'amount': to_reais(amount_cents),
                     'message': 'Pagamento processado com sucesso!'
                 }
             elif transaction.get('status') == 'refused':
@@ -186,22 +276,19 @@ class PagarMeGateway(PaymentGateway):
                 }
 
         except Exception as e:
-            return {
-                'success': False,
-                'error': f'Erro no processamento do cartão: {str(e)}'
-            }
+            return _failure('Erro no processamento do cartão', e)
 
     def get_payment_status(self, transaction_id: str) -> Dict[str, Any]:
         """Obter status do pagamento"""
         try:
-            transaction = pagarme.transaction.find_by_id(transaction_id)
+            transaction = self._request('GET', f'/transactions/{transaction_id}', 'find_transaction')
 
             return {
                 'success': True,
                 'transaction_id': transaction_id,
                 'status': transaction.get('status'),
-                'amount': transaction.get('amount', 0) / 100,  # Converter de centavos
-                'paid_amount': transaction.get('paid_amount', 0) / 100,
+                'amount': to_reais(transaction.get('amount', 0)),
+                'paid_amount': to_reais(transaction.get('paid_amount', 0)),
                 'payment_method': transaction.get('payment_method'),
                 'created_at': transaction.get('date_created'),
                 'updated_at': transaction.get('date_updated')
@@ -213,17 +300,54 @@ class PagarMeGateway(PaymentGateway):
                 'error': f'Erro ao consultar status: {str(e)}'
             }
 
+    def find_payment(self, reference_key: str) -> Dict[str, Any]:
+        """
+        Procurar a transação criada com a reference_key (GET, seguro repetir)
+        found=False quando o gateway não tem a transação
+        """
+        try:
+            transactions = self._request('GET', '/transactions', 'find_by_reference',
+                                         params={'reference_key': reference_key})
+        except Exception as e:
+            return {'success': False, 'error': f'Erro ao consultar transação: {str(e)}', 'retryable': True}
+
+        if not transactions:
+            return {'success': False, 'found': False, 'error': 'Transação não encontrada no gateway'}
+        transaction = transactions[0]
+        status = transaction.get('status')
+        if status in ('refused', 'failed'):
+            return {
+                'success': False,
+                'found': True,
+                'error': 'Pagamento recusado',
+                'details': transaction.get('refuse_reason', 'Motivo não especificado')
+            }
+        return {
+            'success': True,
+            'found': True,
+            'transaction_id': transaction['id'],
+            'status': status,
+            'pix_qr_code': transaction.get('pix_qr_code'),
+            'pix_expiration_date': transaction.get('pix_expiration_date'),
+            'amount': to_reais(transaction.get('amount', 0))
+        }
+
     def process_payment(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
         """Processar pagamento baseado no método escolhido"""
         payment_method = payment_data.get('method')
-        amount = float(payment_data.get('amount', 0))
+        if 'amount_cents' in payment_data:
+            amount_cents = int(payment_data['amount_cents'])
+        else:
+            # Jobs enfileirados antes da migração guardam o valor em reais
+            amount_cents = to_cents(payment_data.get('amount', 0))
         customer_data = payment_data.get('customer', {})
+        reference_key = payment_data.get('reference_key')
 
         if payment_method == 'pix':
-            return self.process_pix_payment(amount, customer_data)
+            return self.process_pix_payment(amount_cents, customer_data, reference_key)
         elif payment_method in ['credit_card', 'debit_card']:
             card_data = payment_data.get('card', {})
-            return self.process_card_payment(amount, card_data, customer_data)
+            return self.process_card_payment(amount_cents, card_data, customer_data, reference_key)
         else:
             return {
                 'success': False,
@@ -271,6 +395,27 @@ class PaymentManager:
         gateway_instance = self.gateways[gateway_name]
         return gateway_instance.get_payment_status(transaction_id)
 
+    def find_payment(self, reference_key: str, gateway: str = None) -> Dict[str, Any]:
+        """Procurar no gateway a transação criada com a reference_key"""
+        gateway_name = gateway or self.default_gateway
+
+        if gateway_name not in self.gateways:
+            return {
+                'success': False,
+                'error': f'Gateway não encontrado: {gateway_name}'
+            }
+
+        return self.gateways[gateway_name].find_payment(reference_key)
+
+    def verify_postback(self, body: bytes, signature: Optional[str], gateway: str = None) -> bool:
+        """Conferir a assinatura do webhook do gateway"""
+        gateway_instance = self.gateways.get(gateway or self.default_gateway)
+        return gateway_instance is not None and gateway_instance.verify_postback(body, signature)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Latência das chamadas de cada gateway"""
+        return {name: gateway.get_metrics() for name, gateway in self.gateways.items()}
+
 # Instância global do gerenciador de pagamentos
 payment_manager = PaymentManager()
 
@@ -1,37 +1,22 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from src.database import db
 from src.models.anon_session import AnonymousSession
 from src.models.casino import Transaction, GameSession
+from src.services.pagination import keyset_paginate, wants_total
+from src.services.transaction_archive import count_transactions, page_transactions, paginate_transactions
+from src.services.rate_limiter import rate_limiter, client_ip
+from src.services.session_cleanup import session_sweeper
+from src.services.activity_buffer import activity_buffer
+from src.services.money import to_reais
 import uuid
 from datetime import datetime, timedelta
 import re
 
 anon_bp = Blueprint('anon', __name__)
 
-# Cache simples para rate limiting (em produção, usar Redis)
-_rate_limit_cache = {}
-
 def check_rate_limit(ip_address, endpoint, limit=10, window=60):
-    """Verificar rate limiting simples"""
-    now = datetime.utcnow()
-    key = f"{ip_address}:{endpoint}"
-    
-    # Limpar entradas antigas
-    if key in _rate_limit_cache:
-        _rate_limit_cache[key] = [
-            timestamp for timestamp in _rate_limit_cache[key]
-            if now - timestamp < timedelta(seconds=window)
-        ]
-    else:
-        _rate_limit_cache[key] = []
-    
-    # Verificar limite
-    if len(_rate_limit_cache[key]) >= limit:
-        return False
-    
-    # Adicionar nova requisição
-    _rate_limit_cache[key].append(now)
-    return True
+    """Verificar rate limiting do endpoint (janela deslizante, backend compartilhado)"""
+    return rate_limiter.hit(f"{ip_address}:{endpoint}", limit, window)
 
 def validate_anon_id(anon_id):
     """Validar formato do ID anônimo"""
@@ -50,8 +35,7 @@ def generate_anonymous_id():
     """Gerar um novo ID anônimo"""
     try:
         # Rate limiting para geração de IDs
-        client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-        if not check_rate_limit(client_ip, 'generate-id', limit=5, window=300):  # 5 por 5 minutos
+        if not check_rate_limit(client_ip(), 'generate-id', limit=5, window=300):  # 5 por 5 minutos
             return jsonify({'error': 'Muitas tentativas. Tente novamente em alguns minutos.'}), 429
         
         # Gerar novo UUID
@@ -64,7 +48,7 @@ def generate_anonymous_id():
             anon_id = str(uuid.uuid4())
         
         # Criar nova sessão anônima
-        session = AnonymousSession(anon_id=anon_id, balance=0.0)
+        session = AnonymousSession(anon_id=anon_id, balance_cents=0)
         db.session.add(session)
         db.session.commit()
         
@@ -91,12 +75,14 @@ def get_session_info(anon_id):
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
-        # Atualizar última atividade
-        session.last_activity = datetime.utcnow()
-        db.session.commit()
+        # Registrar atividade (gravada em lote pelo buffer, sem escrita nesta requisição)
+        last_activity = activity_buffer.touch(anon_id)
+        
+        session_data = session.to_dict()
+        session_data['last_activity'] = last_activity.isoformat()
         
         return jsonify({
-            'session': session.to_dict(),
+            'session': session_data,
             'message': 'Sessão encontrada'
         }), 200
         
@@ -116,13 +102,12 @@ def get_balance(anon_id):
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
-        # Atualizar última atividade
-        session.last_activity = datetime.utcnow()
-        db.session.commit()
+        # Registrar atividade (gravada em lote pelo buffer, sem escrita nesta requisição)
+        activity_buffer.touch(anon_id)
         
         return jsonify({
             'anon_id': anon_id,
-            'balance': float(session.balance)
+            'balance': to_reais(session.balance_cents)
         }), 200
         
     except Exception as e:
@@ -153,29 +138,49 @@ def get_transactions(anon_id):
         per_page = min(max(per_page, 1), 100)
         page = max(page, 1)
         
-        # Buscar transações com paginação
-        transactions_query = Transaction.query.filter_by(anon_id=anon_id)\
-            .order_by(Transaction.created_at.desc())
-        
-        transactions = transactions_query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        transactions_query = Transaction.query.filter_by(anon_id=anon_id)
+        
+        # Modo cursor: sem OFFSET e sem COUNT(*), salvo se pedido
+        # Inclui os meses arquivados, abertos só quando a página chega neles
+        if 'cursor' in request.args:
+            try:
+                items, next_cursor = paginate_transactions(
+                    transactions_query, Transaction.anon_id == anon_id,
+                    cursor=request.args.get('cursor'), per_page=per_page
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+            if wants_total(request.args):
+                pagination['total'] = count_transactions(transactions_query, Transaction.anon_id == anon_id)
+        else:
+            # Modo por número de página (compatibilidade), também com os meses arquivados
+            include_total = wants_total(request.args, default=True)
+            items, total = page_transactions(
+                transactions_query, Transaction.anon_id == anon_id,
+                page=page, per_page=per_page, include_total=include_total
+            )
+            
+            pagination = {
+                'page': page,
+                'per_page': per_page
+            }
+            if include_total:
+                pagination['total'] = total
+                pagination['pages'] = (total + per_page - 1) // per_page
         
-        # Atualizar última atividade
-        session.last_activity = datetime.utcnow()
-        db.session.commit()
+        # Registrar atividade (gravada em lote pelo buffer, sem escrita nesta requisição)
+        activity_buffer.touch(anon_id)
         
         return jsonify({
             'anon_id': anon_id,
-            'transactions': [t.to_dict() for t in transactions.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': transactions.total,
-                'pages': transactions.pages
-            }
+            'transactions': [t.to_dict() for t in items],
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -206,29 +211,48 @@ def get_game_sessions(anon_id):
         per_page = min(max(per_page, 1), 50)
         page = max(page, 1)
         
-        # Buscar sessões de jogo com paginação
-        game_sessions_query = GameSession.query.filter_by(anon_id=anon_id)\
-            .order_by(GameSession.created_at.desc())
+        game_sessions_query = GameSession.query.filter_by(anon_id=anon_id)
+        
+        # Modo cursor: sem OFFSET e sem COUNT(*), salvo se pedido
+        if 'cursor' in request.args:
+            try:
+                items, next_cursor = keyset_paginate(
+                    game_sessions_query, GameSession.start_time, GameSession.id,
+                    cursor=request.args.get('cursor'), per_page=per_page
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+            if wants_total(request.args):
+                pagination['total'] = game_sessions_query.count()
+        else:
+            # Modo por número de página (compatibilidade)
+            include_total = wants_total(request.args, default=True)
+            page_result = game_sessions_query\
+                .order_by(GameSession.start_time.desc(), GameSession.id.desc())\
+                .paginate(page=page, per_page=per_page, error_out=False, count=include_total)
+            items = page_result.items
+            
+            pagination = {
+                'page': page,
+                'per_page': per_page
+            }
+            if include_total:
+                pagination['total'] = page_result.total
+                pagination['pages'] = page_result.pages
         
-        game_sessions = game_sessions_query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        # Atualizar última atividade
-        session.last_activity = datetime.utcnow()
-        db.session.commit()
+        # Registrar atividade (gravada em lote pelo buffer, sem escrita nesta requisição)
+        activity_buffer.touch(anon_id)
         
         return jsonify({
             'anon_id': anon_id,
-            'game_sessions': [gs.to_dict() for gs in game_sessions.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': game_sessions.total,
-                'pages': game_sessions.pages
-            }
+            'game_sessions': [gs.to_dict() for gs in items],
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -253,21 +277,27 @@ def validate_session(anon_id):
                 'message': 'Sessão não encontrada'
             }), 404
         
-        # Atualizar última atividade
-        session.last_activity = datetime.utcnow()
-        db.session.commit()
+        # Registrar atividade (gravada em lote pelo buffer, sem escrita nesta requisição)
+        last_activity = activity_buffer.touch(anon_id)
         
         return jsonify({
             'valid': True,
             'anon_id': anon_id,
-            'balance': float(session.balance),
-            'last_activity': session.last_activity.isoformat(),
+            'balance': to_reais(session.balance_cents),
+            'last_activity': last_activity.isoformat(),
             'message': 'Sessão válida'
         }), 200
         
     except Exception as e:
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@anon_bp.route('/cleanup-old-sessions', methods=['GET'])
+def cleanup_progress():
+    """Progresso da limpeza de sessões (endpoint administrativo)"""
+    if request.headers.get('X-Admin-Key') != 'admin-cleanup-key-2024':
+        return jsonify({'error': 'Não autorizado'}), 401
+    return jsonify(session_sweeper.get_stats()), 200
+
 @anon_bp.route('/cleanup-old-sessions', methods=['POST'])
 def cleanup_old_sessions():
     """Limpar sessões antigas (endpoint administrativo)"""
@@ -277,26 +307,14 @@ def cleanup_old_sessions():
         if admin_key != 'admin-cleanup-key-2024':  # Em produção, usar chave segura
             return jsonify({'error': 'Não autorizado'}), 401
         
-        # Definir limite de tempo (sessões inativas por mais de 30 dias)
-        cutoff_date = datetime.utcnow() - timedelta(days=30)
-        
-        # Buscar sessões antigas
-        old_sessions = AnonymousSession.query.filter(
-            AnonymousSession.last_activity < cutoff_date
-        ).all()
-        
-        count = len(old_sessions)
-        
-        # Remover sessões antigas
-        for session in old_sessions:
-            db.session.delete(session)
-        
-        db.session.commit()
+        # A limpeza roda em lotes numa thread; o progresso fica em GET /cleanup-old-sessions
+        started = session_sweeper.start_background(current_app._get_current_object())
         
         return jsonify({
-            'message': f'{count} sessões antigas removidas com sucesso',
-            'removed_count': count
-        }), 200
+            'message': 'Limpeza iniciada' if started else 'Limpeza já em andamento',
+            'started': started,
+            'progress': session_sweeper.get_stats()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
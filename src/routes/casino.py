@@ -1,15 +1,27 @@
 from flask import Blueprint, jsonify, request
 from src.database import db
-from src.models.casino import Transaction, GameSession, GameRound, CasinoSettings
+from src.models.casino import Transaction, GameSession, GameRound, CasinoSettings, SessionTotals
 from src.models.anon_session import AnonymousSession
 from src.models.payment_methods import SystemPaymentMethod
 from src.config import Config
-from datetime import datetime
-import random
+from src.services.balance_ledger import balance_at
+from src.services.ledger import record_transaction, record_transactions, get_session_totals, get_daily_totals, check_daily_limits
+from src.services.pagination import wants_total
+from src.services.transaction_archive import count_transactions, page_transactions, paginate_transactions
+from src.services.game_engines import get_engine, DEFAULT_HOUSE_EDGE
+from src.services.stats_rollup import record_game_stats
+from src.services.money import to_cents, to_reais, format_money
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
 import os
 
 casino_bp = Blueprint('casino', __name__)
 
+# Número máximo de apostas aceitas em /bets/batch
+MAX_BATCH_BETS = int(os.getenv('MAX_BATCH_BETS', 100))
+# Aposta mínima de jogos sem limite configurado (centavos)
+DEFAULT_MIN_BET = to_cents(1)
+
 @casino_bp.route('/deposit', methods=['POST'])
 def deposit():
     """Processar depósito"""
@@ -29,9 +41,9 @@ def deposit():
         if not anon_session:
             return jsonify({'error': 'Sessão anônima não encontrada'}), 404
         
-        # Validar amount
+        # Validar amount (reais na requisição, centavos daqui em diante)
         try:
-            amount = float(data.get('amount', 0))
+            amount = to_cents(data.get('amount', 0))
         except (ValueError, TypeError):
             return jsonify({'error': 'Valor deve ser um número válido'}), 400
         
@@ -47,10 +59,10 @@ def deposit():
         max_deposit = deposit_limits['max_amount']
         
         if amount < min_deposit:
-            return jsonify({'error': f'Valor mínimo de depósito é R$ {min_deposit:.2f}'}), 400
+            return jsonify({'error': f'Valor mínimo de depósito é R$ {format_money(min_deposit)}'}), 400
         
         if amount > max_deposit:
-            return jsonify({'error': f'Valor máximo de depósito é R$ {max_deposit:.2f}'}), 400
+            return jsonify({'error': f'Valor máximo de depósito é R$ {format_money(max_deposit)}'}), 400
         
         # Validar método de pagamento
         payment_method_obj = SystemPaymentMethod.query.filter_by(
@@ -63,41 +75,64 @@ def deposit():
             return jsonify({'error': 'Método de pagamento inválido ou não disponível para depósitos'}), 400
         
         # Verificar limites específicos do método de pagamento
-        if payment_method_obj.min_deposit and amount < payment_method_obj.min_deposit:
-            return jsonify({'error': f'Valor mínimo para {payment_method_obj.display_name} é R$ {payment_method_obj.min_deposit:.2f}'}), 400
+        if payment_method_obj.min_deposit_cents and amount < payment_method_obj.min_deposit_cents:
+            return jsonify({'error': f'Valor mínimo para {payment_method_obj.display_name} é R$ {format_money(payment_method_obj.min_deposit_cents)}'}), 400
         
-        if payment_method_obj.max_deposit and amount > payment_method_obj.max_deposit:
-            return jsonify({'error': f'Valor máximo para {payment_method_obj.display_name} é R$ {payment_method_obj.max_deposit:.2f}'}), 400
+        if payment_method_obj.max_deposit_cents and amount > payment_method_obj.max_deposit_cents:
+            return jsonify({'error': f'Valor máximo para {payment_method_obj.display_name} é R$ {format_money(payment_method_obj.max_deposit_cents)}'}), 400
         
         # Calcular taxa de depósito
         deposit_fee = payment_method_obj.calculate_deposit_fee(amount)
         net_amount = amount - deposit_fee
         
-        # Criar transação
-        transaction = Transaction(
-            anon_id=anon_id,
-            transaction_type='deposit',
-            amount=amount,
-            status='completed',
+        if net_amount <= 0:
+            return jsonify({'error': 'Valor insuficiente após dedução da taxa'}), 400
+        
+        # Limite diário de depósitos (agregado diário do jogador, travado até o commit)
+        limit_error = check_daily_limits(anon_id, deposit=amount)
+        if limit_error:
+            db.session.rollback()
+            return jsonify({'error': limit_error}), 400
+        
+        # Depósito bruto e taxa como lançamentos separados (saldo fica com o líquido)
+        entries = [('deposit', amount)]
+        if deposit_fee:
+            entries.append(('fee', -deposit_fee))
+        new_balance = AnonymousSession.post_entries(anon_id, entries)
+        if new_balance is None:
+            # Sessão removida (ex.: limpeza) entre a leitura e o UPDATE
+            db.session.rollback()
+            return jsonify({'error': 'Sessão anônima não encontrada'}), 404
+        
+        # Criar transações (a taxa tem a sua, para o histórico reproduzir o saldo)
+        transaction = record_transaction(
+            anon_id,
+            'deposit',
+            amount,
+            balance_after=new_balance + deposit_fee,
             payment_method=payment_method,
             external_transaction_id=external_transaction_id,
             description=f'Depósito via {payment_method}',
             extra_data=data.get('paypal_order')
         )
+        if deposit_fee:
+            record_transaction(
+                anon_id,
+                'fee',
+                deposit_fee,
+                balance_after=new_balance,
+                payment_method=payment_method,
+                description=f'Taxa de depósito via {payment_method}'
+            )
         
-        # Atualizar saldo da sessão anônima (valor líquido após taxa)
-        anon_session.balance += net_amount
-        anon_session.last_activity = datetime.utcnow()
-        
-        db.session.add(transaction)
         db.session.commit()
         
         return jsonify({
             'message': 'Depósito realizado com sucesso',
-            'amount': amount,
-            'fee': deposit_fee,
-            'net_amount': net_amount,
-            'new_balance': float(anon_session.balance),
+            'amount': to_reais(amount),
+            'fee': to_reais(deposit_fee),
+            'net_amount': to_reais(net_amount),
+            'new_balance': to_reais(new_balance),
             'transaction_id': transaction.id,
             'payment_method': payment_method_obj.display_name
         }), 200
@@ -125,9 +160,9 @@ def withdraw():
         if not anon_session:
             return jsonify({'error': 'Sessão anônima não encontrada'}), 404
         
-        # Validar amount
+        # Validar amount (reais na requisição, centavos daqui em diante)
         try:
-            amount = float(data.get('amount', 0))
+            amount = to_cents(data.get('amount', 0))
         except (ValueError, TypeError):
             return jsonify({'error': 'Valor deve ser um número válido'}), 400
         
@@ -142,9 +177,9 @@ def withdraw():
         min_withdraw = withdraw_limits['min_amount']
         
         if amount < min_withdraw:
-            return jsonify({'error': f'Valor mínimo de saque é R$ {min_withdraw:.2f}'}), 400
+            return jsonify({'error': f'Valor mínimo de saque é R$ {format_money(min_withdraw)}'}), 400
         
-        if amount > anon_session.balance:
+        if amount > anon_session.balance_cents:
             return jsonify({'error': 'Saldo insuficiente'}), 400
         
         if not paypal_email:
@@ -161,11 +196,11 @@ def withdraw():
             return jsonify({'error': 'Método de pagamento inválido ou não disponível para saques'}), 400
         
         # Verificar limites específicos do método de pagamento
-        if payment_method_obj.min_withdrawal and amount < payment_method_obj.min_withdrawal:
-            return jsonify({'error': f'Valor mínimo para saque via {payment_method_obj.display_name} é R$ {payment_method_obj.min_withdrawal:.2f}'}), 400
+        if payment_method_obj.min_withdrawal_cents and amount < payment_method_obj.min_withdrawal_cents:
+            return jsonify({'error': f'Valor mínimo para saque via {payment_method_obj.display_name} é R$ {format_money(payment_method_obj.min_withdrawal_cents)}'}), 400
         
-        if payment_method_obj.max_withdrawal and amount > payment_method_obj.max_withdrawal:
-            return jsonify({'error': f'Valor máximo para saque via {payment_method_obj.display_name} é R$ {payment_method_obj.max_withdrawal:.2f}'}), 400
+        if payment_method_obj.max_withdrawal_cents and amount > payment_method_obj.max_withdrawal_cents:
+            return jsonify({'error': f'Valor máximo para saque via {payment_method_obj.display_name} é R$ {format_money(payment_method_obj.max_withdrawal_cents)}'}), 400
         
         # Calcular taxa de saque
         withdrawal_fee = payment_method_obj.calculate_withdrawal_fee(amount)
@@ -174,28 +209,30 @@ def withdraw():
         if net_amount <= 0:
             return jsonify({'error': 'Valor insuficiente após dedução da taxa'}), 400
         
+        # Atualizar saldo da sessão anônima (falha se outra operação consumiu o saldo)
+        new_balance = AnonymousSession.debit(anon_id, amount, entry_type='withdraw')
+        if new_balance is None:
+            db.session.rollback()
+            return jsonify({'error': 'Saldo insuficiente'}), 400
+        
         # Criar transação
-        transaction = Transaction(
-            anon_id=anon_id,
-            transaction_type='withdraw',
-            amount=amount,
+        transaction = record_transaction(
+            anon_id,
+            'withdraw',
+            amount,
+            balance_after=new_balance,
             status='pending',
             payment_method=payment_method,
             description=f'Saque via {payment_method}',
             extra_data={'paypal_email': paypal_email}
         )
         
-        # Atualizar saldo da sessão anônima
-        anon_session.balance -= amount
-        anon_session.last_activity = datetime.utcnow()
-        
-        db.session.add(transaction)
         db.session.commit()
         
         return jsonify({
             'message': 'Saque solicitado com sucesso',
-            'amount': amount,
-            'new_balance': float(anon_session.balance),
+            'amount': to_reais(amount),
+            'new_balance': to_reais(new_balance),
             'transaction_id': transaction.id
         }), 200
         
@@ -217,18 +254,13 @@ def place_bet():
         if not anon_id:
             return jsonify({'error': 'ID da sessão anônima é obrigatório'}), 400
         
-        # Buscar sessão anônima
-        anon_session = AnonymousSession.query.filter_by(anon_id=anon_id).first()
-        if not anon_session:
-            return jsonify({'error': 'Sessão anônima não encontrada'}), 404
-        
         game_type = data.get('game_type')
         if not game_type:
             return jsonify({'error': 'Tipo de jogo é obrigatório'}), 400
         
-        # Validar bet_amount
+        # Validar bet_amount (reais na requisição, centavos daqui em diante)
         try:
-            bet_amount = float(data.get('bet_amount', 0))
+            bet_amount = to_cents(data.get('bet_amount', 0))
         except (ValueError, TypeError):
             return jsonify({'error': 'Valor da aposta deve ser um número válido'}), 400
         
@@ -237,15 +269,26 @@ def place_bet():
         if bet_amount <= 0:
             return jsonify({'error': 'Valor de aposta inválido'}), 400
         
-        if bet_amount > anon_session.balance:
-            return jsonify({'error': 'Saldo insuficiente'}), 400
-        
         # Verificar limites mínimos por jogo (configuráveis)
         bet_limits = Config.get_bet_limits()
-        min_bet = bet_limits.get(game_type, 1)
+        min_bet = bet_limits.get(game_type, DEFAULT_MIN_BET)
         
         if bet_amount < min_bet:
-            return jsonify({'error': f'Aposta mínima para {game_type} é R$ {min_bet:.2f}'}), 400
+            return jsonify({'error': f'Aposta mínima para {game_type} é R$ {format_money(min_bet)}'}), 400
+        
+        # Limite diário de perda (agregado diário do jogador, travado até o commit)
+        limit_error = check_daily_limits(anon_id, bet=bet_amount)
+        if limit_error:
+            db.session.rollback()
+            return jsonify({'error': limit_error}), 400
+        
+        # Deduzir aposta atomicamente (verifica saldo e debita no mesmo UPDATE)
+        balance_after_bet = AnonymousSession.debit(anon_id, bet_amount, entry_type='bet')
+        if balance_after_bet is None:
+            db.session.rollback()
+            if not AnonymousSession.query.filter_by(anon_id=anon_id).first():
+                return jsonify({'error': 'Sessão anônima não encontrada'}), 404
+            return jsonify({'error': 'Saldo insuficiente'}), 400
         
         # Criar sessão de jogo se não existir
         game_session = GameSession.query.filter_by(
@@ -258,62 +301,71 @@ def place_bet():
             game_session = GameSession(
                 anon_id=anon_id,
                 game_type=game_type,
-                status='active'
+                status='active',
+                initial_balance_cents=balance_after_bet + bet_amount,
+                current_balance_cents=balance_after_bet + bet_amount,
+                rounds_played=0
             )
             db.session.add(game_session)
             db.session.flush()
+            record_game_stats(game_type, sessions=1)
         
         # Processar resultado do jogo
         result = process_game_result(game_type, bet_data, bet_amount)
         
+        # Adicionar ganhos (se houver)
+        payout = result['payout_cents']
+        new_balance = balance_after_bet
+        if payout > 0:
+            new_balance = AnonymousSession.credit(anon_id, payout, entry_type='win')
+        
         # Criar round do jogo
+        game_session.rounds_played = (game_session.rounds_played or 0) + 1
+        game_session.current_balance_cents = new_balance
         game_round = GameRound(
-            game_session_id=game_session.id,
-            bet_amount=bet_amount,
-            result_data=result,
-            payout_amount=result['payout'],
-            house_edge=result['house_edge']
+            session_id=game_session.id,
+            user_id=anon_id,
+            round_number=game_session.rounds_played,
+            bet_amount_cents=bet_amount,
+            win_amount_cents=payout,
+            bet_type=bet_data.get('type'),
+            game_result=public_result(result),
+            completed_at=datetime.utcnow()
         )
         
-        # Atualizar saldo da sessão anônima
-        anon_session.balance -= bet_amount  # Deduzir aposta
-        anon_session.balance += result['payout']  # Adicionar ganhos (se houver)
-        anon_session.last_activity = datetime.utcnow()
-        
         # Criar transações
-        bet_transaction = Transaction(
-            anon_id=anon_id,
-            transaction_type='bet',
-            amount=bet_amount,
-            status='completed',
+        record_transaction(
+            anon_id,
+            'bet',
+            bet_amount,
+            balance_after=balance_after_bet,
             description=f'Aposta em {game_type}',
-            game_session_id=game_session.id
+            game_session_id=game_session.id,
+            game_type=game_type
         )
         
-        if result['payout'] > 0:
-            win_transaction = Transaction(
-                anon_id=anon_id,
-                transaction_type='win',
-                amount=result['payout'],
-                status='completed',
+        if payout > 0:
+            record_transaction(
+                anon_id,
+                'win',
+                payout,
+                balance_after=new_balance,
                 description=f'Ganho em {game_type}',
-                game_session_id=game_session.id
+                game_session_id=game_session.id,
+                game_type=game_type
             )
-            db.session.add(win_transaction)
         
-        # Calcular lucro do cassino
-        if result["payout"] < bet_amount:
-            casino_profit = bet_amount - result["payout"]
-            enviar_lucro_para_operador(casino_profit)
-
         db.session.add(game_round)
-        db.session.add(bet_transaction)
+        record_game_stats(
+            game_type, rounds=1, bet=bet_amount,
+            payouts=1 if payout > 0 else 0, payout=payout
+        )
         db.session.commit()
         
         return jsonify({
             'message': 'Aposta processada com sucesso',
-            'result': result,
-            'new_balance': float(anon_session.balance),
+            'result': public_result(result),
+            'new_balance': to_reais(new_balance),
             'round_id': game_round.id
         }), 200
         
@@ -321,197 +373,254 @@ def place_bet():
         db.session.rollback()
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
-def process_game_result(game_type, bet_data, bet_amount):
-    """Processar resultado do jogo com vantagem da casa"""
-    
-    # Obter configurações de vantagem da casa
-    house_edges = {
-        'roulette': 0.027,  # 2.7%
-        'blackjack': 0.005,  # 0.5%
-        'slots': 0.05,      # 5%
-        'dice': 0.014       # 1.4%
-    }
-    
-    house_edge = house_edges.get(game_type, 0.05)
-    
-    if game_type == 'roulette':
-        return process_roulette_result(bet_data, bet_amount, house_edge)
-    elif game_type == 'blackjack':
-        return process_blackjack_result(bet_data, bet_amount, house_edge)
-    elif game_type == 'slots':
-        return process_slots_result(bet_data, bet_amount, house_edge)
-    elif game_type == 'dice':
-        return process_dice_result(bet_data, bet_amount, house_edge)
-    else:
-        return {'payout': 0, 'house_edge': house_edge, 'result': 'unknown'}
-
-def process_roulette_result(bet_data, bet_amount, house_edge):
-    """Processar resultado da roleta"""
-    # Gerar número vencedor (0-36)
-    winning_number = random.randint(0, 36)
-    
-    # Definir cor do número
-    red_numbers = [1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36]
-    winning_color = 'red' if winning_number in red_numbers else 'black' if winning_number != 0 else 'green'
-    
-    payout = 0
-    bet_type = bet_data.get('type')
-    bet_value = bet_data.get('value')
-    
-    # Calcular pagamento baseado no tipo de aposta
-    if bet_type == 'number' and bet_value == winning_number:
-        payout = bet_amount * 35  # 35:1
-    elif bet_type == 'color' and bet_value == winning_color and winning_number != 0:
-        payout = bet_amount * 2  # 1:1
-    elif bet_type == 'even_odd':
-        if bet_value == 'even' and winning_number % 2 == 0 and winning_number != 0:
-            payout = bet_amount * 2
-        elif bet_value == 'odd' and winning_number % 2 == 1:
-            payout = bet_amount * 2
-    elif bet_type == 'high_low':
-        if bet_value == 'low' and 1 <= winning_number <= 18:
-            payout = bet_amount * 2
-        elif bet_value == 'high' and 19 <= winning_number <= 36:
-            payout = bet_amount * 2
-    
-    # Aplicar vantagem da casa
-    if payout > bet_amount:
-        house_cut = (payout - bet_amount) * house_edge
-        payout -= house_cut
-    
-    return {
-        'payout': round(payout, 2),
-        'house_edge': house_edge,
-        'result': {
-            'winning_number': winning_number,
-            'winning_color': winning_color,
-            'bet_type': bet_type,
-            'bet_value': bet_value,
-            'won': payout > 0
-        }
-    }
+@casino_bp.route('/bets/batch', methods=['POST'])
+def place_bets_batch():
+    """Processar várias apostas de uma sessão em uma única transação"""
+    try:
+        data = request.get_json()
+        
+        # Validar dados de entrada
+        if not data:
+            return jsonify({'error': 'Dados não fornecidos'}), 400
+        
+        anon_id = data.get('anon_id')
+        if not anon_id:
+            return jsonify({'error': 'ID da sessão anônima é obrigatório'}), 400
+        
+        bets = data.get('bets')
+        if not isinstance(bets, list) or not bets:
+            return jsonify({'error': 'Lista de apostas é obrigatória'}), 400
+        
+        if len(bets) > MAX_BATCH_BETS:
+            return jsonify({'error': f'Máximo de {MAX_BATCH_BETS} apostas por lote'}), 400
+        
+        # Validar todas as apostas antes de jogar qualquer uma
+        bet_limits = Config.get_bet_limits()
+        parsed_bets = []
+        for index, bet in enumerate(bets):
+            if not isinstance(bet, dict):
+                return jsonify({'error': 'Aposta inválida', 'index': index}), 400
+            
+            game_type = bet.get('game_type')
+            if not game_type:
+                return jsonify({'error': 'Tipo de jogo é obrigatório', 'index': index}), 400
+            
+            try:
+                bet_amount = to_cents(bet.get('bet_amount', 0))
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Valor da aposta deve ser um número válido', 'index': index}), 400
+            
+            if bet_amount <= 0:
+                return jsonify({'error': 'Valor de aposta inválido', 'index': index}), 400
+            
+            min_bet = bet_limits.get(game_type, DEFAULT_MIN_BET)
+            if bet_amount < min_bet:
+                return jsonify({'error': f'Aposta mínima para {game_type} é R$ {format_money(min_bet)}', 'index': index}), 400
+            
+            parsed_bets.append((game_type, bet_amount, bet.get('bet_data', {})))
+        
+        # Limite diário de perda para o lote inteiro
+        limit_error = check_daily_limits(anon_id, bet=sum(bet_amount for _, bet_amount, _ in parsed_bets))
+        if limit_error:
+            db.session.rollback()
+            return jsonify({'error': limit_error}), 400
+        
+        # Buscar sessão anônima uma única vez
+        anon_session = AnonymousSession.query.filter_by(anon_id=anon_id).first()
+        if not anon_session:
+            return jsonify({'error': 'Sessão anônima não encontrada'}), 404
+        
+        initial_balance = anon_session.balance_cents
+        running_balance = initial_balance
+        # Maior valor que o saldo inicial precisa cobrir ao longo do lote
+        required_balance = 0
+        
+        # Sortear todos os resultados de uma vez (vetorizado por jogo)
+        game_results = process_game_results_batch(parsed_bets)
+        
+        game_sessions = {}
+        game_stats = {}
+        results = []
+        rounds = []
+        transactions = []
+        stop_reason = None
+        now = datetime.utcnow()
+        
+        for index, (game_type, bet_amount, bet_data) in enumerate(parsed_bets):
+            if bet_amount > running_balance:
+                stop_reason = 'insufficient_funds'
+                break
+            
+            # Sessão de jogo ativa (uma consulta por tipo de jogo no lote)
+            game_session = game_sessions.get(game_type)
+            if game_session is None:
+                game_stats[game_type] = {'sessions': 0, 'rounds': 0, 'bet': 0, 'payouts': 0, 'payout': 0}
+                game_session = GameSession.query.filter_by(
+                    anon_id=anon_id,
+                    game_type=game_type,
+                    status='active'
+                ).first()
+                if not game_session:
+                    game_session = GameSession(
+                        anon_id=anon_id,
+                        game_type=game_type,
+                        status='active',
+                        initial_balance_cents=running_balance,
+                        current_balance_cents=running_balance,
+                        rounds_played=0
+                    )
+                    db.session.add(game_session)
+                    db.session.flush()
+                    game_stats[game_type]['sessions'] += 1
+                game_sessions[game_type] = game_session
+            
+            # Jogar contra o saldo em memória
+            running_balance -= bet_amount
+            required_balance = max(required_balance, initial_balance - running_balance)
+            balance_after_bet = running_balance
+            
+            result = game_results[index]
+            payout = result['payout_cents']
+            running_balance += payout
+            
+            stats = game_stats[game_type]
+            stats['rounds'] += 1
+            stats['bet'] += bet_amount
+            if payout > 0:
+                stats['payouts'] += 1
+                stats['payout'] += payout
+            
+            game_session.rounds_played = (game_session.rounds_played or 0) + 1
+            game_session.current_balance_cents = running_balance
+            
+            result = public_result(result)
+            rounds.append({
+                'session_id': game_session.id,
+                'user_id': anon_id,
+                'round_number': game_session.rounds_played,
+                'bet_amount_cents': bet_amount,
+                'win_amount_cents': payout,
+                'bet_type': bet_data.get('type'),
+                'game_result': result,
+                'started_at': now,
+                'completed_at': now
+            })
+            transactions.append({
+                'anon_id': anon_id,
+                'transaction_type': 'bet',
+                'amount_cents': bet_amount,
+                'balance_after_cents': balance_after_bet,
+                'description': f'Aposta em {game_type}',
+                'game_session_id': game_session.id,
+                'game_type': game_type
+            })
+            if payout > 0:
+                transactions.append({
+                    'anon_id': anon_id,
+                    'transaction_type': 'win',
+                    'amount_cents': payout,
+                    'balance_after_cents': running_balance,
+                    'description': f'Ganho em {game_type}',
+                    'game_session_id': game_session.id,
+                    'game_type': game_type
+                })
+            
+            results.append({
+                'index': index,
+                'game_type': game_type,
+                'bet_amount': to_reais(bet_amount),
+                'result': result,
+                'balance': running_balance
+            })
+        
+        if not results:
+            db.session.rollback()
+            return jsonify({'error': 'Saldo insuficiente'}), 400
+        
+        # Aplicar o lote num único UPDATE condicional, um lançamento por transação
+        new_balance = AnonymousSession.post_entries(
+            anon_id,
+            [(t['transaction_type'], t['amount_cents'] if t['transaction_type'] == 'win' else -t['amount_cents'])
+             for t in transactions],
+            min_balance=required_balance
+        )
+        if new_balance is None:
+            db.session.rollback()
+            return jsonify({'error': 'Saldo alterado durante o processamento do lote. Tente novamente.'}), 409
+        
+        # Saldos calculados a partir da leitura inicial, ajustados a créditos
+        # concorrentes entre a leitura e o UPDATE (mesmos saldos do ledger)
+        offset = new_balance - running_balance
+        if offset:
+            for transaction in transactions:
+                transaction['balance_after_cents'] += offset
+            for game_session in game_sessions.values():
+                game_session.current_balance_cents += offset
+        
+        # Inserir rodadas e transações em lote
+        round_ids = db.session.scalars(
+            insert(GameRound).returning(GameRound.id, sort_by_parameter_order=True),
+            rounds
+        ).all()
+        record_transactions(transactions)
+        for game_type, stats in game_stats.items():
+            record_game_stats(game_type, **stats)
+        
+        db.session.commit()
+        
+        for bet_result, round_id in zip(results, round_ids):
+            bet_result['round_id'] = round_id
+            bet_result['balance'] = to_reais(bet_result['balance'] + offset)
+        
+        return jsonify({
+            'message': 'Apostas processadas com sucesso',
+            'results': results,
+            'processed': len(results),
+            'requested': len(parsed_bets),
+            'stopped_early': stop_reason is not None,
+            'stop_reason': stop_reason,
+            'new_balance': to_reais(new_balance)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Erro interno do servidor'}), 500
 
-def process_blackjack_result(bet_data, bet_amount, house_edge):
-    """Processar resultado do blackjack"""
-    # Simular jogo de blackjack
-    player_cards = bet_data.get('player_cards', [])
-    dealer_cards = bet_data.get('dealer_cards', [])
-    
-    player_total = sum(card['value'] for card in player_cards)
-    dealer_total = sum(card['value'] for card in dealer_cards)
-    
-    payout = 0
-    result_type = 'lose'
-    
-    if player_total > 21:
-        result_type = 'bust'
-    elif dealer_total > 21:
-        result_type = 'dealer_bust'
-        payout = bet_amount * 2
-    elif player_total == 21 and len(player_cards) == 2:
-        result_type = 'blackjack'
-        payout = bet_amount * 2.5
-    elif player_total > dealer_total:
-        result_type = 'win'
-        payout = bet_amount * 2
-    elif player_total == dealer_total:
-        result_type = 'push'
-        payout = bet_amount
-    
-    # Aplicar vantagem da casa
-    if payout > bet_amount:
-        house_cut = (payout - bet_amount) * house_edge
-        payout -= house_cut
-    
-    return {
-        'payout': round(payout, 2),
-        'house_edge': house_edge,
-        'result': {
-            'player_total': player_total,
-            'dealer_total': dealer_total,
-            'result_type': result_type,
-            'won': payout > bet_amount
-        }
-    }
+def process_game_result(game_type, bet_data, bet_amount, rng=None):
+    """Processar resultado do jogo com vantagem da casa (aposta e pagamento em centavos)"""
+    engine = get_engine(game_type)
+    if engine is None:
+        return {'payout_cents': 0, 'house_edge': DEFAULT_HOUSE_EDGE, 'result': 'unknown'}
+    return engine.play(bet_data, bet_amount, rng)
 
-def process_slots_result(bet_data, bet_amount, house_edge):
-    """Processar resultado do caça-níqueis"""
-    symbols = ['🍒', '🍋', '🍊', '🍇', '⭐', '💎', '7️⃣']
-    
-    # Gerar resultado dos 3 rolos
-    reels = [random.choice(symbols) for _ in range(3)]
-    
-    payout = 0
-    
-    # Verificar combinações vencedoras
-    if reels[0] == reels[1] == reels[2]:
-        # Três símbolos iguais
-        multipliers = {
-            '🍒': 5, '🍋': 8, '🍊': 10, '🍇': 15,
-            '⭐': 25, '💎': 50, '7️⃣': 100
-        }
-        payout = bet_amount * multipliers.get(reels[0], 5)
-    elif reels[0] == reels[1] or reels[1] == reels[2] or reels[0] == reels[2]:
-        # Dois símbolos iguais
-        payout = bet_amount * 2
-    
-    # Aplicar vantagem da casa
-    if payout > bet_amount:
-        house_cut = (payout - bet_amount) * house_edge
-        payout -= house_cut
-    
-    return {
-        'payout': round(payout, 2),
-        'house_edge': house_edge,
-        'result': {
-            'reels': reels,
-            'won': payout > 0
-        }
-    }
+def public_result(result):
+    """Resultado do motor no formato do JSON (payout em reais)"""
+    public = {key: value for key, value in result.items() if key != 'payout_cents'}
+    public['payout'] = to_reais(result['payout_cents'])
+    return public
 
-def process_dice_result(bet_data, bet_amount, house_edge):
-    """Processar resultado dos dados"""
-    dice1 = random.randint(1, 6)
-    dice2 = random.randint(1, 6)
-    total = dice1 + dice2
-    
-    bet_type = bet_data.get('type')
-    bet_value = bet_data.get('value')
-    
-    payout = 0
-    
-    if bet_type == 'total' and bet_value == total:
-        # Aposta no total exato
-        multipliers = {7: 4, 6: 6, 8: 6, 5: 8, 9: 8, 4: 10, 10: 10, 3: 15, 11: 15, 2: 30, 12: 30}
-        payout = bet_amount * multipliers.get(total, 1)
-    elif bet_type == 'high_low':
-        if bet_value == 'low' and total <= 6:
-            payout = bet_amount * 2
-        elif bet_value == 'high' and total >= 8:
-            payout = bet_amount * 2
-    elif bet_type == 'even_odd':
-        if bet_value == 'even' and total % 2 == 0:
-            payout = bet_amount * 2
-        elif bet_value == 'odd' and total % 2 == 1:
-            payout = bet_amount * 2
+def process_game_results_batch(bets, rng=None):
+    """
+    Processar uma lista de apostas (game_type, bet_amount, bet_data)
+    As apostas são agrupadas por jogo e cada grupo é jogado em lote pelo motor
+    """
+    results = [None] * len(bets)
+    by_game = {}
+    for index, (game_type, bet_amount, bet_data) in enumerate(bets):
+        if get_engine(game_type) is None:
+            results[index] = process_game_result(game_type, bet_data, bet_amount, rng)
+        else:
+            by_game.setdefault(game_type, []).append(index)
     
-    # Aplicar vantagem da casa
-    if payout > bet_amount:
-        house_cut = (payout - bet_amount) * house_edge
-        payout -= house_cut
+    for game_type, indexes in by_game.items():
+        game_results = get_engine(game_type).play_batch(
+            [(bets[i][2], bets[i][1]) for i in indexes],
+            rng
+        )
+        for index, result in zip(indexes, game_results):
+            results[index] = result
     
-    return {
-        'payout': round(payout, 2),
-        'house_edge': house_edge,
-        'result': {
-            'dice1': dice1,
-            'dice2': dice2,
-            'total': total,
-            'bet_type': bet_type,
-            'bet_value': bet_value,
-            'won': payout > 0
-        }
-    }
+    return results
 
 @casino_bp.route('/balance', methods=['GET'])
 def get_balance():
@@ -521,24 +630,77 @@ def get_balance():
         if not anon_id:
             return jsonify({'error': 'ID da sessão anônima é obrigatório'}), 400
         
-        # Buscar sessão anônima
-        anon_session = AnonymousSession.query.filter_by(anon_id=anon_id).first()
-        if not anon_session:
+        # Saldo histórico: snapshot anterior ao instante + lançamentos até ele
+        at = request.args.get('at')
+        if at:
+            try:
+                when = datetime.fromisoformat(at)
+            except ValueError:
+                return jsonify({'error': 'Data inválida (use ISO 8601)'}), 400
+            # O ledger grava UTC sem fuso: converter instantes com fuso (Z, +00:00, -03:00)
+            if when.tzinfo is not None:
+                when = when.astimezone(timezone.utc).replace(tzinfo=None)
+            if not AnonymousSession.query.filter_by(anon_id=anon_id).first():
+                return jsonify({'error': 'Sessão anônima não encontrada'}), 404
+            balance, seq = balance_at(anon_id, when)
+            return jsonify({'balance': to_reais(balance), 'ledger_seq': seq, 'at': when.isoformat()})
+        
+        # Buscar saldo e agregados materializados numa única consulta
+        row = db.session.query(AnonymousSession.balance_cents, AnonymousSession.ledger_seq, SessionTotals)\
+            .outerjoin(SessionTotals, SessionTotals.anon_id == AnonymousSession.anon_id)\
+            .filter(AnonymousSession.anon_id == anon_id)\
+            .first()
+        if not row:
             return jsonify({'error': 'Sessão anônima não encontrada'}), 404
         
-        # Calcular estatísticas das transações
-        transactions = Transaction.query.filter_by(anon_id=anon_id).all()
-        total_deposited = sum(t.amount for t in transactions if t.transaction_type == 'deposit')
-        total_withdrawn = sum(t.amount for t in transactions if t.transaction_type == 'withdraw')
-        total_bet = sum(t.amount for t in transactions if t.transaction_type == 'bet')
-        total_won = sum(t.amount for t in transactions if t.transaction_type == 'win')
+        balance, ledger_seq, totals = row
+        totals = totals.to_dict() if totals else get_session_totals(anon_id)
         
         return jsonify({
-            'balance': float(anon_session.balance),
-            'total_deposited': float(total_deposited),
-            'total_withdrawn': float(total_withdrawn),
-            'total_bet': float(total_bet),
-            'total_won': float(total_won)
+            'balance': to_reais(balance),
+            'ledger_seq': ledger_seq,
+            'total_deposited': to_reais(totals['total_deposited_cents']),
+            'total_withdrawn': to_reais(totals['total_withdrawn_cents']),
+            'total_bet': to_reais(totals['total_bet_cents']),
+            'total_won': to_reais(totals['total_won_cents']),
+            'counts': {
+                'deposits': totals['deposit_count'],
+                'withdrawals': totals['withdraw_count'],
+                'bets': totals['bet_count'],
+                'wins': totals['win_count']
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@casino_bp.route('/daily-stats', methods=['GET'])
+def get_daily_stats():
+    """Resumo diário da sessão anônima (lido do agregado diário) e limites restantes"""
+    try:
+        anon_id = request.args.get('anon_id')
+        if not anon_id:
+            return jsonify({'error': 'ID da sessão anônima é obrigatório'}), 400
+
+        days = request.args.get('days', 7, type=int)
+        days = min(max(days, 1), 90)
+
+        today = datetime.utcnow().date()
+        daily = get_daily_totals(anon_id, today - timedelta(days=days - 1), today)
+        today_stats = daily[-1] if daily and daily[-1]['date'] == today.isoformat() else None
+
+        # Limites restantes calculados em centavos
+        limits = Config.get_daily_limits()
+        deposited = to_cents(today_stats['deposits']) if today_stats else 0
+        loss = -to_cents(today_stats['net_result']) if today_stats else 0
+
+        return jsonify({
+            'days': daily,
+            'limits': {
+                'daily_deposit_limit': to_reais(limits['deposit']),
+                'daily_loss_limit': to_reais(limits['loss']),
+                'deposit_remaining': to_reais(max(limits['deposit'] - deposited, 0)) if limits['deposit'] else None,
+                'loss_remaining': to_reais(max(limits['loss'] - loss, 0)) if limits['loss'] else None
+            }
         }), 200
     except Exception as e:
         return jsonify({'error': 'Erro interno do servidor'}), 500
@@ -564,18 +726,47 @@ def get_transactions():
             per_page = 20
         
         # Limitar per_page para evitar sobrecarga
-        per_page = min(per_page, 100)
-        
-        transactions = Transaction.query.filter_by(anon_id=anon_id)\
-            .order_by(Transaction.created_at.desc())\
-            .paginate(page=page, per_page=per_page, error_out=False)
+        per_page = min(max(per_page, 1), 100)
+        
+        query = Transaction.query.filter_by(anon_id=anon_id)
+        
+        # Modo cursor: sem OFFSET e sem COUNT(*), salvo se pedido
+        # Inclui os meses arquivados, abertos só quando a página chega neles
+        if 'cursor' in request.args:
+            try:
+                since = request.args.get('since')
+                since = datetime.fromisoformat(since) if since else None
+                items, next_cursor = paginate_transactions(
+                    query, Transaction.anon_id == anon_id,
+                    cursor=request.args.get('cursor'), per_page=per_page, since=since
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            response = {
+                'transactions': [t.to_dict() for t in items],
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+            if wants_total(request.args):
+                response['total'] = count_transactions(query, Transaction.anon_id == anon_id)
+            return jsonify(response), 200
+        
+        # Modo por número de página (compatibilidade), também com os meses arquivados
+        include_total = wants_total(request.args, default=True)
+        items, total = page_transactions(
+            query, Transaction.anon_id == anon_id,
+            page=page, per_page=per_page, include_total=include_total
+        )
         
-        return jsonify({
-            'transactions': [t.to_dict() for t in transactions.items],
-            'total': transactions.total,
-            'pages': transactions.pages,
+        response = {
+            'transactions': [t.to_dict() for t in items],
             'current_page': page
-        }), 200
+        }
+        if include_total:
+            response['total'] = total
+            response['pages'] = (total + per_page - 1) // per_page
+        return jsonify(response), 200
     except Exception as e:
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
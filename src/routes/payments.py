@@ -8,11 +8,19 @@ from src.database import db
 from src.models.casino import Transaction
 from src.models.anon_session import AnonymousSession
 from src.payment_gateways import payment_manager
+from src.services.ledger import record_transaction, check_daily_limits
+from src.services.money import to_cents, to_reais
+from src.services.payment_queue import enqueue_payment, get_job_for_transaction, notify_workers
+from src.services.status_cache import gateway_status_cache
+from src.services.webhook_inbox import STATUS_MAP, append_event, apply_transitions, notify_consumer
 from datetime import datetime
 import uuid
 
 payments_bp = Blueprint('payments', __name__)
 
+# Dados do cartão em claro: recusados (PCI), o navegador envia só o card_hash
+CARD_SECRET_FIELDS = ('number', 'cvv', 'expiration_date')
+
 @payments_bp.route('/process', methods=['POST'])
 def process_payment():
     """Processar pagamento real através do gateway"""
@@ -34,7 +42,7 @@ def process_payment():
         
         # Validar amount
         try:
-            amount = float(data.get('amount', 0))
+            amount = to_cents(data.get('amount', 0))
         except (ValueError, TypeError):
             return jsonify({'error': 'Valor deve ser um número válido'}), 400
         
@@ -46,7 +54,7 @@ def process_payment():
         # Preparar dados para o gateway
         payment_data = {
             'method': payment_method,
-            'amount': amount,
+            'amount_cents': amount,
             'customer': {
                 'session_id': anon_id,
                 'name': data.get('customer_name', 'Cliente Anônimo'),
@@ -55,77 +63,69 @@ def process_payment():
             }
         }
         
-        # Adicionar dados do cartão se necessário
+        # Cartão só como card_hash (criptografado no navegador pelo pagarme.js):
+        # número e CVV nunca chegam ao banco nem à fila
         if payment_method in ['credit_card', 'debit_card']:
-            card_data = data.get('card', {})
-            if not all(key in card_data for key in ['number', 'holder_name', 'expiration_date', 'cvv']):
-                return jsonify({'error': 'Dados do cartão incompletos'}), 400
-            payment_data['card'] = card_data
+            card_data = data.get('card') or {}
+            if any(key in card_data for key in CARD_SECRET_FIELDS):
+                return jsonify({'error': 'Envie apenas o card_hash gerado pelo pagarme.js, não os dados do cartão'}), 400
+            if not card_data.get('card_hash'):
+                return jsonify({'error': 'card_hash do cartão é obrigatório'}), 400
+            payment_data['card'] = {'card_hash': card_data['card_hash']}
+        
+        # Limite diário de depósitos, contando os pendentes; a linha do dia fica
+        # travada até o commit da transação pendente abaixo
+        limit_error = check_daily_limits(anon_id, deposit=amount)
+        if limit_error:
+            db.session.rollback()
+            return jsonify({'error': limit_error}), 400
         
-        # Criar transação pendente no banco
-        transaction = Transaction(
-            anon_id=anon_id,
-            transaction_type='deposit',
-            amount=amount,
+        # Criar transação pendente no banco (sem o cartão)
+        transaction = record_transaction(
+            anon_id,
+            'deposit',
+            amount,
+            balance_after=anon_session.balance_cents,
             status='pending',
             payment_method=payment_method,
             description=f'Depósito via {payment_method}',
-            extra_data={'gateway_request': payment_data}
+            extra_data={'gateway_request': {key: value for key, value in payment_data.items() if key != 'card'}}
         )
         
-        db.session.add(transaction)
-        db.session.commit()
+        db.session.flush()
         
-        # Processar pagamento através do gateway
-        result = payment_manager.process_payment(payment_data)
+        # A chamada ao gateway roda em background; o cliente acompanha pelo status
+        job = enqueue_payment(transaction, payment_data)
+        db.session.commit()
+        notify_workers()
         
-        # Atualizar transação com resultado do gateway
-        if result.get('success'):
-            transaction.status = 'processing'
-            transaction.external_transaction_id = result.get('transaction_id')
-            transaction.extra_data.update({
-                'gateway_response': result,
-                'processed_at': datetime.utcnow().isoformat()
-            })
-            
-            # Se o pagamento foi aprovado imediatamente (cartão), atualizar saldo
-            if result.get('status') == 'paid':
-                transaction.status = 'completed'
-                anon_session.balance += amount
-                anon_session.last_activity = datetime.utcnow()
-            
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'transaction_id': transaction.id,
-                'gateway_transaction_id': result.get('transaction_id'),
-                'status': result.get('status'),
-                'amount': amount,
-                'payment_method': payment_method,
-                'pix_qr_code': result.get('pix_qr_code'),
-                'pix_expiration_date': result.get('pix_expiration_date'),
-                'message': result.get('message', 'Pagamento processado com sucesso'),
-                'new_balance': float(anon_session.balance)
-            })
-        else:
-            # Erro no processamento
-            transaction.status = 'failed'
-            transaction.extra_data.update({
-                'gateway_error': result,
-                'failed_at': datetime.utcnow().isoformat()
-            })
-            db.session.commit()
-            
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Erro no processamento do pagamento'),
-                'details': result.get('details')
-            }), 400
+        return jsonify({
+            'success': True,
+            'transaction_id': transaction.id,
+            'job_id': job.id,
+            'status': transaction.status,
+            'amount': to_reais(amount),
+            'payment_method': payment_method,
+            'status_url': f'/api/payments/status/{transaction.id}',
+            'message': 'Pagamento em processamento'
+        }), 202
             
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
+def payment_progress(transaction):
+    """Andamento do job do gateway e dados de pagamento já devolvidos por ele"""
+    job = get_job_for_transaction(transaction.id)
+    gateway_response = (transaction.extra_data or {}).get('gateway_response') or {}
+    gateway_error = (transaction.extra_data or {}).get('gateway_error') or {}
+    return {
+        'job': job.to_dict() if job else None,
+        'pix_qr_code': gateway_response.get('pix_qr_code'),
+        'pix_expiration_date': gateway_response.get('pix_expiration_date'),
+        'error': gateway_error.get('error')
+    }
+
 @payments_bp.route('/status/<int:transaction_id>', methods=['GET'])
 def get_payment_status(transaction_id):
     """Obter status de um pagamento"""
@@ -141,50 +141,49 @@ def get_payment_status(transaction_id):
                 'success': True,
                 'transaction_id': transaction.id,
                 'status': transaction.status,
-                'amount': float(transaction.amount),
+                'amount': to_reais(transaction.amount_cents),
                 'payment_method': transaction.payment_method,
                 'created_at': transaction.created_at.isoformat(),
-                'updated_at': transaction.updated_at.isoformat()
+                'updated_at': transaction.updated_at.isoformat(),
+                **payment_progress(transaction)
             })
         
-        # Se está pendente ou processando, consultar gateway
+        # Se está pendente ou processando, consultar gateway (cache curto + single-flight)
         if transaction.external_transaction_id:
-            gateway_result = payment_manager.get_payment_status(
-                transaction.external_transaction_id
+            gateway_result, shared = gateway_status_cache.lookup(
+                transaction.external_transaction_id,
+                payment_manager.get_payment_status
             )
             
             if gateway_result.get('success'):
-                gateway_status = gateway_result.get('status')
+                target = STATUS_MAP.get(gateway_result.get('status'))
                 
-                # Atualizar status local baseado no gateway
-                if gateway_status == 'paid':
-                    transaction.status = 'completed'
-                    # Atualizar saldo se ainda não foi atualizado
-                    anon_session = AnonymousSession.query.filter_by(
-                        anon_id=transaction.anon_id
-                    ).first()
-                    if anon_session and transaction.status != 'completed':
-                        anon_session.balance += transaction.amount
-                        anon_session.last_activity = datetime.utcnow()
-                elif gateway_status in ['refused', 'failed']:
-                    transaction.status = 'failed'
+                # Atualizar status local com o mesmo UPDATE condicional do consumidor
+                # de webhooks: o saldo só é creditado por quem efetuar a transição
+                changed = False
+                if target in ('completed', 'failed'):
+                    changed = bool(apply_transitions({transaction.id: target}))
+                    db.session.refresh(transaction)
                 
-                transaction.extra_data.update({
-                    'gateway_status_check': gateway_result,
-                    'status_checked_at': datetime.utcnow().isoformat()
-                })
-                
-                db.session.commit()
+                # Respostas vindas do cache só são gravadas se mudarem o status
+                if not shared or changed:
+                    transaction.extra_data = {
+                        **(transaction.extra_data or {}),
+                        'gateway_status_check': gateway_result,
+                        'status_checked_at': datetime.utcnow().isoformat()
+                    }
+                    db.session.commit()
         
         return jsonify({
             'success': True,
             'transaction_id': transaction.id,
             'gateway_transaction_id': transaction.external_transaction_id,
             'status': transaction.status,
-            'amount': float(transaction.amount),
+            'amount': to_reais(transaction.amount_cents),
             'payment_method': transaction.payment_method,
             'created_at': transaction.created_at.isoformat(),
-            'updated_at': transaction.updated_at.isoformat()
+            'updated_at': transaction.updated_at.isoformat(),
+            **payment_progress(transaction)
         })
         
     except Exception as e:
@@ -194,6 +193,11 @@ def get_payment_status(transaction_id):
 def pagarme_webhook():
     """Webhook para receber notificações do Pagar.me"""
     try:
+        # Isento do rate limit por IP: autenticado pela assinatura do gateway
+        if not payment_manager.verify_postback(request.get_data(), request.headers.get('X-Hub-Signature'),
+                                               gateway='pagarme'):
+            return jsonify({'error': 'Assinatura inválida'}), 401
+        
         data = request.get_json()
         
         if not data:
@@ -208,40 +212,20 @@ def pagarme_webhook():
         if not transaction_id:
             return jsonify({'error': 'ID da transação não fornecido'}), 400
         
-        # Buscar transação no banco pelo external_transaction_id
-        transaction = Transaction.query.filter_by(
-            external_transaction_id=str(transaction_id)
-        ).first()
+        # Gravar na inbox e responder; o consumidor aplica o evento em lote
+        event, duplicate = append_event('pagarme', transaction_id, event_type, status, data)
+        if not duplicate:
+            notify_consumer()
         
-        if not transaction:
-            return jsonify({'error': 'Transação não encontrada'}), 404
-        
-        # Atualizar status baseado no webhook
-        if status == 'paid':
-            transaction.status = 'completed'
-            # Atualizar saldo da sessão anônima
-            anon_session = AnonymousSession.query.filter_by(
-                anon_id=transaction.anon_id
-            ).first()
-            if anon_session:
-                anon_session.balance += transaction.amount
-                anon_session.last_activity = datetime.utcnow()
-        elif status in ['refused', 'failed']:
-            transaction.status = 'failed'
-        elif status == 'waiting_payment':
-            transaction.status = 'processing'
-        
-        # Salvar dados do webhook
-        transaction.extra_data.update({
-            'webhook_data': data,
-            'webhook_received_at': datetime.utcnow().isoformat()
+        return jsonify({
+            'success': True,
+            'event_id': event.id if event else None,
+            'duplicate': duplicate,
+            'message': 'Webhook recebido'
         })
         
-        db.session.commit()
-        
-        return jsonify({'success': True, 'message': 'Webhook processado com sucesso'})
-        
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Erro no webhook: {str(e)}'}), 500
 
 @payments_bp.route('/methods', methods=['GET'])
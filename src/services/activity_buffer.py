@@ -0,0 +1,132 @@
+"""
+Buffer write-behind de last_activity
+As rotas de leitura só registram o acesso em memória; uma thread grava os
+acessos acumulados a cada ACTIVITY_FLUSH_SECONDS com um UPDATE em lote. Os
+horários são arredondados para ACTIVITY_RESOLUTION_SECONDS, então vários
+acessos da mesma sessão no intervalo viram uma única linha no UPDATE.
+"""
+
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+
+# Sessões por UPDATE (limite de parâmetros do SQLite)
+FLUSH_CHUNK_SIZE = 500
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class ActivityBuffer:
+    """Últimos acessos por anon_id aguardando gravação"""
+
+    def __init__(self, flush_interval=None, resolution=None):
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            float(os.getenv('ACTIVITY_FLUSH_SECONDS', 30))
+        self.resolution = resolution if resolution is not None else \
+            int(os.getenv('ACTIVITY_RESOLUTION_SECONDS', 60))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'touches': 0, 'deduplicated': 0, 'flushes': 0, 'rows_updated': 0, 'errors': 0}
+
+    def _truncate(self, when):
+        if self.resolution <= 1:
+            return when.replace(microsecond=0)
+        seconds = int((when - _EPOCH).total_seconds()) // self.resolution * self.resolution
+        return _EPOCH + timedelta(seconds=seconds)
+
+    def touch(self, anon_id, when=None):
+        """Registrar acesso da sessão; retorna o horário registrado"""
+        when = self._truncate(when or datetime.utcnow())
+        with self._lock:
+            self._stats['touches'] += 1
+            current = self._pending.get(anon_id)
+            if current is not None:
+                self._stats['deduplicated'] += 1
+                if current >= when:
+                    return current
+            self._pending[anon_id] = when
+        return when
+
+    def flush(self):
+        """Gravar os acessos pendentes; retorna quantas linhas foram atualizadas"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            # Um UPDATE por horário (normalmente um só por intervalo), em blocos
+            by_time = {}
+            for anon_id, when in pending.items():
+                by_time.setdefault(when, []).append(anon_id)
+
+            updated = 0
+            try:
+                for when, anon_ids in by_time.items():
+                    for start in range(0, len(anon_ids), FLUSH_CHUNK_SIZE):
+                        chunk = anon_ids[start:start + FLUSH_CHUNK_SIZE]
+                        result = db.session.execute(
+                            update(AnonymousSession)
+                            .where(
+                                AnonymousSession.anon_id.in_(chunk),
+                                or_(AnonymousSession.last_activity.is_(None),
+                                    AnonymousSession.last_activity < when)
+                            )
+                            .values(last_activity=when)
+                            .execution_options(synchronize_session=False)
+                        )
+                        updated += result.rowcount
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # Devolver ao buffer para a próxima tentativa
+                with self._lock:
+                    for anon_id, when in pending.items():
+                        if self._pending.get(anon_id) is None or self._pending[anon_id] < when:
+                            self._pending[anon_id] = when
+                    self._stats['errors'] += 1
+                raise
+
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['rows_updated'] += updated
+            return updated
+
+    def start(self, app):
+        """Iniciar a thread de gravação periódica (e gravar o restante ao sair)"""
+        if self._thread is not None or self.flush_interval <= 0:
+            return self
+
+        def flush_in_context():
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f'Erro ao gravar last_activity: {e}')
+                finally:
+                    db.session.remove()
+
+        def loop():
+            while not self._stop.wait(self.flush_interval):
+                flush_in_context()
+
+        self._thread = threading.Thread(target=loop, name='activity-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(flush_in_context)
+        return self
+
+    def get_stats(self):
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending), 'flush_interval': self.flush_interval}
+
+
+activity_buffer = ActivityBuffer()
@@ -0,0 +1,130 @@
+"""
+Ledger de saldo append-only
+Toda alteração de saldo passa por AnonymousSession.post_entries: um único
+UPDATE soma o saldo e reserva os seqs na linha da sessão (a cabeça do ledger)
+e os lançamentos são inseridos em ledger_entries com o saldo corrente de cada
+um. A cada SNAPSHOT_INTERVAL lançamentos grava-se um snapshot, de modo que:
+
+- saldo atual = snapshot mais recente + cauda (< SNAPSHOT_INTERVAL lançamentos)
+- saldo num instante T = snapshot anterior a T + lançamentos até T, limitados
+  ao intervalo entre dois snapshots, qualquer que seja o tamanho do histórico
+
+Sessões com saldo anterior ao ledger recebem um lançamento de abertura
+(open_ledgers, chamado nas migrações).
+
+Configuração por ambiente: BALANCE_SNAPSHOT_INTERVAL, LEDGER_OPEN_CHUNK_SIZE
+"""
+
+import os
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.balance_ledger import SNAPSHOT_INTERVAL, BalanceSnapshot, LedgerEntry
+
+OPEN_CHUNK_SIZE = int(os.getenv('LEDGER_OPEN_CHUNK_SIZE', 1000))
+
+
+def _latest_snapshot(anon_id, when=None):
+    query = BalanceSnapshot.query.filter(BalanceSnapshot.anon_id == anon_id)
+    if when is not None:
+        query = query.filter(BalanceSnapshot.created_at <= when)\
+            .order_by(BalanceSnapshot.created_at.desc(), BalanceSnapshot.seq.desc())
+    else:
+        query = query.order_by(BalanceSnapshot.seq.desc())
+    return query.first()
+
+
+def ledger_balance(anon_id):
+    """Saldo reconstruído do ledger: (saldo, seq) do snapshot mais recente mais a cauda"""
+    snapshot = _latest_snapshot(anon_id)
+    base_seq, balance = (snapshot.seq, snapshot.balance_cents) if snapshot else (0, 0)
+    tail, last_seq = db.session.query(
+        func.coalesce(func.sum(LedgerEntry.amount_cents), 0), func.max(LedgerEntry.seq)
+    ).filter(LedgerEntry.anon_id == anon_id, LedgerEntry.seq > base_seq).one()
+    return balance + int(tail), int(last_seq or base_seq)
+
+
+def balance_at(anon_id, when):
+    """
+    Saldo (centavos) da sessão no instante `when` e o seq do último lançamento
+    até lá; lê no máximo os lançamentos entre dois snapshots
+    """
+    snapshot = _latest_snapshot(anon_id, when)
+    base_seq, balance = (snapshot.seq, snapshot.balance_cents) if snapshot else (0, 0)
+
+    # O próximo snapshot limita o intervalo de seqs a percorrer
+    upper = db.session.query(func.min(BalanceSnapshot.seq)).filter(
+        BalanceSnapshot.anon_id == anon_id, BalanceSnapshot.seq > base_seq
+    ).scalar()
+    query = LedgerEntry.query.filter(
+        LedgerEntry.anon_id == anon_id, LedgerEntry.seq > base_seq, LedgerEntry.created_at <= when
+    )
+    if upper is not None:
+        query = query.filter(LedgerEntry.seq <= upper)
+    entry = query.order_by(LedgerEntry.seq.desc()).first()
+    if entry is None:
+        return balance, base_seq
+    return entry.balance_cents, entry.seq
+
+
+def get_entries(anon_id, after_seq=0, limit=100):
+    """Lançamentos da sessão a partir de um seq (paginação por seq)"""
+    return LedgerEntry.query.filter(LedgerEntry.anon_id == anon_id, LedgerEntry.seq > after_seq)\
+        .order_by(LedgerEntry.seq).limit(limit).all()
+
+
+def open_ledgers(chunk_size=None):
+    """
+    Lançamento de abertura (seq 1) para sessões com saldo e sem ledger, em
+    lotes com um commit cada; retorna quantas sessões foram abertas
+    """
+    chunk_size = chunk_size or OPEN_CHUNK_SIZE
+    opened = 0
+    while True:
+        try:
+            rows = db.session.execute(
+                update(AnonymousSession)
+                .where(AnonymousSession.id.in_(
+                    select(AnonymousSession.id).where(
+                        AnonymousSession.ledger_seq == 0,
+                        AnonymousSession.balance_cents.isnot(None),
+                        AnonymousSession.balance_cents != 0
+                    ).limit(chunk_size).scalar_subquery()
+                ), AnonymousSession.ledger_seq == 0)
+                .values(ledger_seq=1)
+                .returning(AnonymousSession.anon_id, AnonymousSession.balance_cents)
+                .execution_options(synchronize_session=False)
+            ).all()
+            now = datetime.utcnow()
+            for anon_id, balance in rows:
+                LedgerEntry.append(anon_id, [('opening', int(balance))], int(balance), 1, now=now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if not rows:
+            return opened
+        opened += len(rows)
+
+
+def verify_ledger(anon_ids=None):
+    """
+    Conferir a cabeça de cada sessão (saldo e seq) contra snapshot + cauda
+    Retorna a lista de divergências [{anon_id, balance, ledger_balance, seq, ledger_seq}]
+    """
+    query = db.session.query(AnonymousSession.anon_id, AnonymousSession.balance_cents, AnonymousSession.ledger_seq)
+    if anon_ids is not None:
+        query = query.filter(AnonymousSession.anon_id.in_(anon_ids))
+    mismatches = []
+    for anon_id, balance, seq in query.all():
+        rebuilt, rebuilt_seq = ledger_balance(anon_id)
+        if rebuilt != (balance or 0) or rebuilt_seq != seq:
+            mismatches.append({
+                'anon_id': anon_id, 'balance': balance, 'ledger_balance': rebuilt,
+                'seq': seq, 'ledger_seq': rebuilt_seq
+            })
+    return mismatches
+
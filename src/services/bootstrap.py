@@ -0,0 +1,177 @@
+"""
+Inicialização do banco por deploy, não por worker
+db.create_all(), as migrações e os dados padrão rodam uma vez (`flask init-db`
+no deploy, ou pelo primeiro processo que encontrar o banco desatualizado) e
+gravam em schema_versions a impressão digital do que foi aplicado. No boot de
+cada worker basta um SELECT nessa tabela: se as versões batem, nada mais roda.
+
+Configuração por ambiente:
+DB_AUTO_INIT (padrão true: inicializa no boot se estiver desatualizado),
+STARTUP_BUDGET_MS (tempo máximo esperado da verificação no boot)
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from src.config import Config, DEFAULT_SETTINGS
+from src.database import db, upsert_insert
+from src.migrations import ADDED_COLUMNS, run_migrations
+from src.models.payment_methods import SystemPaymentMethod
+from src.models.schema_version import SchemaVersion
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', 250))
+
+# Resultado do último boot (exposto em /api/admin/stats)
+startup_stats = {}
+
+
+def _fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def schema_fingerprint():
+    """Impressão digital das tabelas, colunas e índices declarados nos modelos"""
+    tables = []
+    for table in db.metadata.sorted_tables:
+        tables.append([
+            table.name,
+            [[column.name, str(column.type), column.nullable] for column in table.columns],
+            sorted(index.name for index in table.indexes)
+        ])
+    return _fingerprint([tables, ADDED_COLUMNS])
+
+
+def seed_fingerprint():
+    """Impressão digital dos dados padrão (configurações e métodos de pagamento)"""
+    return _fingerprint([DEFAULT_SETTINGS, SystemPaymentMethod.DEFAULT_METHODS])
+
+
+def expected_versions():
+    return {'schema': schema_fingerprint(), 'seed': seed_fingerprint()}
+
+
+def read_versions():
+    """Versões gravadas no banco ({} se a tabela ainda não existir)"""
+    try:
+        return dict(db.session.execute(select(SchemaVersion.component, SchemaVersion.version)).all())
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return {}
+
+
+def stamp_versions(versions):
+    """Gravar as versões aplicadas (sem commit)"""
+    now = datetime.utcnow()
+    rows = [{'component': component, 'version': version, 'applied_at': now}
+            for component, version in versions.items()]
+    stmt = upsert_insert(SchemaVersion)
+    if stmt is not None:
+        stmt = stmt.values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['component'],
+            set_={'version': stmt.excluded.version, 'applied_at': stmt.excluded.applied_at}
+        ))
+        return
+    for row in rows:
+        db.session.merge(SchemaVersion(**row))
+
+
+def initialize_database():
+    """Criar tabelas, aplicar migrações e dados padrão; retorna o tempo de cada etapa (ms)"""
+    timings = {}
+
+    def step(name, function):
+        started = time.perf_counter()
+        result = function()
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    step('create_all', db.create_all)
+    step('migrations', run_migrations)
+    if not step('settings', Config.initialize_default_settings):
+        raise RuntimeError('Falha ao gravar as configurações padrão')
+    if not step('payment_methods', SystemPaymentMethod.initialize_default_methods):
+        raise RuntimeError('Falha ao gravar os métodos de pagamento padrão')
+
+    stamp_versions(expected_versions())
+    db.session.commit()
+    return timings
+
+
+@contextmanager
+def _init_lock():
+    """Trava de arquivo para um único processo inicializar o banco por vez"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    with open(os.path.join(current_app.instance_path, 'init-db.lock'), 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def ensure_database(auto_init=None, budget_ms=None):
+    """
+    Verificar as versões no boot e inicializar só se estiverem desatualizadas
+    Retorna o estado: current, initialized ou stale (desatualizado com DB_AUTO_INIT=false)
+    """
+    if auto_init is None:
+        auto_init = os.getenv('DB_AUTO_INIT', 'true').lower() == 'true'
+    budget_ms = STARTUP_BUDGET_MS if budget_ms is None else budget_ms
+
+    queries = []
+    listener = lambda conn, cursor, statement, *args: queries.append(statement)
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', listener)
+    started = time.perf_counter()
+    timings = {}
+    try:
+        expected = expected_versions()
+        state = 'current'
+        if read_versions() != expected:
+            state = 'stale'
+            if auto_init:
+                with _init_lock():
+                    # Outro processo pode ter inicializado enquanto esperávamos
+                    if read_versions() != expected:
+                        timings = initialize_database()
+                        print('Banco de dados inicializado com configurações padrão')
+                state = 'initialized'
+            else:
+                print('Banco de dados desatualizado: execute `flask init-db`')
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    startup_stats.clear()
+    startup_stats.update({
+        'state': state,
+        'queries': len(queries),
+        'duration_ms': duration_ms,
+        'budget_ms': budget_ms,
+        'over_budget': state == 'current' and duration_ms > budget_ms,
+        'timings': timings
+    })
+    if startup_stats['over_budget']:
+        print(f'Aviso: verificação do banco no boot levou {duration_ms} ms (orçamento {budget_ms} ms)')
+    return state
+
+
+def get_startup_stats():
+    return dict(startup_stats)
@@ -0,0 +1,140 @@
+"""
+Perfis de engine do banco de dados
+Opções de pool e PRAGMAs aplicados na conexão, escolhidos por DB_ENGINE_PROFILE:
+
+- sqlite: WAL, synchronous=NORMAL, busy_timeout, mmap e cache maiores em
+  cada conexão nova (escritores concorrentes esperam em vez de falhar com
+  "database is locked")
+- server: pool dimensionado, pre-ping e reciclagem para PostgreSQL/MySQL
+- default: opções padrão do SQLAlchemy (comportamento anterior)
+- auto (padrão): sqlite ou server conforme o dialeto da URI
+
+Configuração por ambiente:
+SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB,
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('auto', 'sqlite', 'server', 'default')
+
+# Perfil aplicado no processo (exposto em /api/admin/stats)
+profile_stats = {}
+
+
+def sqlite_pragmas():
+    """PRAGMAs do perfil sqlite, na ordem em que são aplicados"""
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Negativo: tamanho em KiB em vez de páginas
+        'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+        'temp_store': 'MEMORY'
+    }
+
+
+def server_pool_options():
+    """Opções de pool do perfil server"""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': True
+    }
+
+
+def _is_memory(url):
+    return url.database in (None, '', ':memory:') or 'mode=memory' in str(url)
+
+
+def resolve_profile(uri, profile=None):
+    """Nome do perfil efetivo para a URI (auto -> sqlite ou server)"""
+    profile = (profile or os.getenv('DB_ENGINE_PROFILE', 'auto')).lower()
+    if profile not in PROFILES:
+        raise ValueError(f'DB_ENGINE_PROFILE inválido: {profile} (use {", ".join(PROFILES)})')
+    backend = make_url(uri).get_backend_name()
+    if profile == 'auto':
+        return 'sqlite' if backend == 'sqlite' else 'server'
+    if profile == 'sqlite' and backend != 'sqlite':
+        raise ValueError(f'Perfil sqlite não se aplica ao banco {backend}')
+    if profile == 'server' and backend == 'sqlite':
+        raise ValueError('Perfil server não se aplica ao SQLite')
+    return profile
+
+
+def engine_options(uri, profile=None):
+    """Argumentos de create_engine (SQLALCHEMY_ENGINE_OPTIONS) do perfil"""
+    profile = resolve_profile(uri, profile)
+    if profile == 'server':
+        return server_pool_options()
+    if profile == 'sqlite':
+        # Timeout do driver igual ao busy_timeout (em segundos)
+        return {'connect_args': {'timeout': sqlite_pragmas()['busy_timeout'] / 1000}}
+    return {}
+
+
+def install_profile(engine, profile=None):
+    """Registrar os PRAGMAs do perfil nas conexões novas da engine; retorna o perfil"""
+    profile = resolve_profile(engine.url, profile)
+    if profile != 'sqlite':
+        return profile
+
+    pragmas = sqlite_pragmas()
+    if _is_memory(engine.url):
+        # Banco em memória não tem arquivo de WAL nem mmap
+        pragmas = {key: value for key, value in pragmas.items() if key not in ('journal_mode', 'mmap_size')}
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    return profile
+
+
+def read_pragmas(connection):
+    """Valores efetivos dos PRAGMAs do perfil sqlite numa conexão"""
+    return {
+        name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        for name in sqlite_pragmas()
+    }
+
+
+def init_engine_profile(app, db, profile=None):
+    """
+    Configurar o perfil antes do primeiro uso do banco: opções de create_engine
+    em SQLALCHEMY_ENGINE_OPTIONS e, depois do init_app, os hooks de conexão
+    Uso: chamar no lugar de db.init_app(app)
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    name = resolve_profile(uri, profile)
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.update(engine_options(uri, name))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    db.init_app(app)
+
+    with app.app_context():
+        install_profile(db.engine, name)
+
+    profile_stats.clear()
+    profile_stats.update({
+        'profile': name,
+        'dialect': make_url(uri).get_backend_name(),
+        'pool': {key: value for key, value in options.items() if key.startswith('pool') or key == 'max_overflow'},
+        'pragmas': sqlite_pragmas() if name == 'sqlite' else {}
+    })
+    return name
+
+
+def get_profile_stats():
+    return dict(profile_stats)
@@ -0,0 +1,247 @@
+"""
+Registro de motores de jogo
+Cada jogo é um objeto criado uma única vez na importação, com suas tabelas
+de consulta (cores da roleta, tabelas de totais dos dados, tabela de
+pagamentos dos slots) pré-calculadas e imutáveis. Jogos novos se registram
+com @register_engine em vez de crescer uma cadeia de if/elif.
+
+Apostas e pagamentos em centavos inteiros (src.services.money).
+"""
+
+from types import MappingProxyType
+
+from src.services import outcome_engine
+from src.services.outcome_engine import house_cut, house_edge_bps, uniform
+
+# Vantagem da casa para jogos sem motor registrado
+DEFAULT_HOUSE_EDGE = 0.05
+
+_engines = {}
+
+
+def register_engine(engine_class):
+    """Registrar (e instanciar uma única vez) um motor de jogo"""
+    engine = engine_class()
+    _engines[engine.game_type] = engine
+    return engine_class
+
+
+def get_engine(game_type):
+    """Obter o motor registrado para o jogo (ou None)"""
+    return _engines.get(game_type)
+
+
+def registered_games():
+    """Jogos registrados"""
+    return tuple(_engines)
+
+
+def house_edges():
+    """Vantagem da casa de cada jogo registrado"""
+    return MappingProxyType({game_type: engine.house_edge for game_type, engine in _engines.items()})
+
+
+class GameEngine:
+    """Classe base dos motores de jogo"""
+
+    game_type = None
+    house_edge = DEFAULT_HOUSE_EDGE
+    # Jogos com implementação em outcome_engine.play_batch
+    vectorized = False
+
+    def play(self, bet_data, bet_amount, rng=None):
+        """Jogar uma rodada (aposta em centavos); retorna {'payout_cents', 'house_edge', 'result'}"""
+        raise NotImplementedError
+
+    def play_batch(self, bets, rng=None):
+        """Jogar uma lista de (bet_data, bet_amount)"""
+        if self.vectorized:
+            return outcome_engine.play_batch(self.game_type, bets, self.house_edge, rng)
+        return [self.play(bet_data, bet_amount, rng) for bet_data, bet_amount in bets]
+
+    def settle(self, payout, bet_amount):
+        """Aplicar vantagem da casa sobre o lucro (centavos)"""
+        if payout > bet_amount:
+            payout -= house_cut(payout - bet_amount, house_edge_bps(self.house_edge))
+        return payout
+
+
+@register_engine
+class RouletteEngine(GameEngine):
+    """Roleta europeia (0-36)"""
+
+    game_type = 'roulette'
+    house_edge = 0.027
+    vectorized = True
+
+    NUMBERS = outcome_engine.ROULETTE_NUMBERS
+    # Tabelas indexadas pelo número sorteado
+    COLORS = tuple(outcome_engine.COLOR_NAMES[c] for c in outcome_engine.ROULETTE_COLORS)
+    PARITY = (None,) + tuple('even' if n % 2 == 0 else 'odd' for n in range(1, NUMBERS))
+    HALVES = (None,) + tuple('low' if n <= 18 else 'high' for n in range(1, NUMBERS))
+    # Tabela por tipo de aposta: número sorteado -> valor vencedor
+    WINNING_VALUES = MappingProxyType({
+        'color': tuple(c if c != 'green' else None for c in COLORS),
+        'even_odd': PARITY,
+        'high_low': HALVES,
+    })
+
+    def play(self, bet_data, bet_amount, rng=None):
+        # Gerar número vencedor (0-36)
+        winning_number = int(uniform(rng) * self.NUMBERS)
+        winning_color = self.COLORS[winning_number]
+
+        bet_type = bet_data.get('type')
+        bet_value = bet_data.get('value')
+
+        payout = 0
+        if bet_type == 'number':
+            if bet_value == winning_number:
+                payout = bet_amount * 35  # 35:1
+        elif bet_type in self.WINNING_VALUES:
+            winning_value = self.WINNING_VALUES[bet_type][winning_number]
+            if winning_value is not None and bet_value == winning_value:
+                payout = bet_amount * 2  # 1:1
+
+        payout = self.settle(payout, bet_amount)
+        return {
+            'payout_cents': payout,
+            'house_edge': self.house_edge,
+            'result': {
+                'winning_number': winning_number,
+                'winning_color': winning_color,
+                'bet_type': bet_type,
+                'bet_value': bet_value,
+                'won': payout > 0
+            }
+        }
+
+
+@register_engine
+class DiceEngine(GameEngine):
+    """Dois dados de seis faces"""
+
+    game_type = 'dice'
+    house_edge = 0.014
+    vectorized = True
+
+    # Tabelas indexadas pelo total (2-12)
+    TOTAL_MULTIPLIERS = tuple(int(m) for m in outcome_engine.DICE_TOTAL_MULTIPLIERS)
+    HALVES = tuple('low' if t <= 6 else 'high' if t >= 8 else None for t in range(13))
+    PARITY = tuple('even' if t % 2 == 0 else 'odd' for t in range(13))
+    WINNING_VALUES = MappingProxyType({
+        'high_low': HALVES,
+        'even_odd': PARITY,
+    })
+
+    def play(self, bet_data, bet_amount, rng=None):
+        dice1 = int(uniform(rng) * 6) + 1
+        dice2 = int(uniform(rng) * 6) + 1
+        total = dice1 + dice2
+
+        bet_type = bet_data.get('type')
+        bet_value = bet_data.get('value')
+
+        payout = 0
+        if bet_type == 'total':
+            # Aposta no total exato
+            if bet_value == total:
+                payout = bet_amount * self.TOTAL_MULTIPLIERS[total]
+        elif bet_type in self.WINNING_VALUES:
+            winning_value = self.WINNING_VALUES[bet_type][total]
+            if winning_value is not None and bet_value == winning_value:
+                payout = bet_amount * 2
+
+        payout = self.settle(payout, bet_amount)
+        return {
+            'payout_cents': payout,
+            'house_edge': self.house_edge,
+            'result': {
+                'dice1': dice1,
+                'dice2': dice2,
+                'total': total,
+                'bet_type': bet_type,
+                'bet_value': bet_value,
+                'won': payout > 0
+            }
+        }
+
+
+@register_engine
+class SlotsEngine(GameEngine):
+    """Caça-níqueis de 3 rolos"""
+
+    game_type = 'slots'
+    house_edge = 0.05
+    vectorized = True
+
+    SYMBOLS = outcome_engine.SLOT_SYMBOLS
+    # Multiplicador para três símbolos iguais
+    PAYTABLE = MappingProxyType(dict(zip(SYMBOLS, (int(m) for m in outcome_engine.SLOT_MULTIPLIERS))))
+    PAIR_MULTIPLIER = 2
+
+    def play(self, bet_data, bet_amount, rng=None):
+        symbols = self.SYMBOLS
+        reels = [symbols[int(uniform(rng) * len(symbols))] for _ in range(3)]
+        first, second, third = reels
+
+        payout = 0
+        if first == second == third:
+            payout = bet_amount * self.PAYTABLE[first]
+        elif first == second or second == third or first == third:
+            payout = bet_amount * self.PAIR_MULTIPLIER
+
+        payout = self.settle(payout, bet_amount)
+        return {
+            'payout_cents': payout,
+            'house_edge': self.house_edge,
+            'result': {
+                'reels': reels,
+                'won': payout > 0
+            }
+        }
+
+
+@register_engine
+class BlackjackEngine(GameEngine):
+    """Blackjack com as cartas enviadas pelo cliente"""
+
+    game_type = 'blackjack'
+    house_edge = 0.005
+
+    def play(self, bet_data, bet_amount, rng=None):
+        player_cards = bet_data.get('player_cards', [])
+        dealer_cards = bet_data.get('dealer_cards', [])
+
+        player_total = sum(card['value'] for card in player_cards)
+        dealer_total = sum(card['value'] for card in dealer_cards)
+
+        payout = 0
+        result_type = 'lose'
+
+        if player_total > 21:
+            result_type = 'bust'
+        elif dealer_total > 21:
+            result_type = 'dealer_bust'
+            payout = bet_amount * 2
+        elif player_total == 21 and len(player_cards) == 2:
+            result_type = 'blackjack'
+            payout = (bet_amount * 5 + 1) // 2  # 3:2
+        elif player_total > dealer_total:
+            result_type = 'win'
+            payout = bet_amount * 2
+        elif player_total == dealer_total:
+            result_type = 'push'
+            payout = bet_amount
+
+        payout = self.settle(payout, bet_amount)
+        return {
+            'payout_cents': payout,
+            'house_edge': self.house_edge,
+            'result': {
+                'player_total': player_total,
+                'dealer_total': dealer_total,
+                'result_type': result_type,
+                'won': payout > bet_amount
+            }
+        }
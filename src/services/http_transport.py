@@ -0,0 +1,147 @@
+"""
+Transporte HTTP com pool de conexões keep-alive, timeouts e histogramas de latência
+Uma sessão requests por processo (recriada depois de fork) reaproveita as
+conexões TLS entre chamadas. Cada chamada é medida e classificada como
+conexão nova ou reaproveitada, para mostrar o custo do handshake.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Limites superiores dos buckets em milissegundos
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets fixos (memória constante)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, elapsed_ms)] += 1
+            self.count += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction):
+        """Limite superior do bucket que contém o percentil"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        with self._lock:
+            labels = [f'<={bucket}ms' for bucket in self.buckets] + [f'>{self.buckets[-1]}ms']
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+                'p50_ms': self.percentile(0.5),
+                'p95_ms': self.percentile(0.95),
+                'p99_ms': self.percentile(0.99),
+                'max_ms': round(self.max_ms, 2),
+                'buckets': {label: count for label, count in zip(labels, self.counts) if count}
+            }
+
+
+class PooledHTTPTransport:
+    """Cliente HTTP compartilhado por processo para uma API"""
+
+    def __init__(self, base_url, auth=None, pool_size=10, connect_timeout=3.05, read_timeout=20,
+                 connect_retries=2):
+        self.base_url = base_url.rstrip('/')
+        self.auth = auth
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.connect_retries = connect_retries
+        self.histograms = {}
+        self._histograms_lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Sessão do processo atual (conexões não são compartilhadas entre processos)"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    self._session = self._create_session()
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _create_session(self):
+        session = requests.Session()
+        # Só repete falhas de conexão: a requisição não chegou ao servidor,
+        # então é seguro mesmo para POST
+        retry = Retry(total=self.connect_retries, connect=self.connect_retries, read=0, status=0,
+                      other=0, backoff_factor=0.2, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry,
+                              pool_block=False)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Connection': 'keep-alive', 'Accept': 'application/json'})
+        if self.auth:
+            session.auth = self.auth
+        return session
+
+    def _connections_opened(self, url):
+        """
+        Conexões já abertas pelos pools do adaptador (para detectar handshakes)
+        Com chamadas concorrentes a atribuição é aproximada
+        """
+        pools = self.session.get_adapter(url).poolmanager.pools
+        return sum(pool.num_connections for pool in map(pools.get, pools.keys()) if pool is not None)
+
+    def _observe(self, name, elapsed_ms):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._histograms_lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        histogram.observe(elapsed_ms)
+
+    def request(self, method, path, operation=None, **kwargs):
+        """Executar requisição medindo a latência por operação e tipo de conexão"""
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        operation = operation or f'{method.upper()} {path}'
+        kwargs.setdefault('timeout', self.timeout)
+
+        opened_before = self._connections_opened(url)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._observe(f'{operation} [error]', (time.perf_counter() - started) * 1000)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        connection = 'new_connection' if self._connections_opened(url) > opened_before else 'reused'
+        self._observe(operation, elapsed_ms)
+        self._observe(f'{operation} [{connection}]', elapsed_ms)
+        return response
+
+    def get_metrics(self):
+        return {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
@@ -0,0 +1,347 @@
+"""
+Escrita no ledger de transações
+Centraliza a gravação de Transaction e a manutenção dos agregados por sessão
+(session_totals) e por jogador/dia/jogo (player_daily_totals) na mesma
+transação do banco
+"""
+
+from datetime import datetime, time
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select
+
+from src.config import Config
+from src.database import db, upsert_insert
+from src.models.casino import GameSession, PlayerDailyTotals, Transaction, SessionTotals
+from src.services.money import format_money
+from src.services.stats_rollup import increment_stats, transaction_increments
+from src.services.transaction_archive import PENDING_DEPOSIT_STATUSES, aggregate_archives, archived_until
+
+# Status que não movimentam saldo
+VOID_STATUSES = ('failed', 'cancelled')
+
+
+def counts_toward_totals(transaction_type, status):
+    """Verificar se a transação entra nos agregados da sessão"""
+    if transaction_type not in SessionTotals.COLUMNS:
+        return False
+    # Depósitos só contam depois de creditados
+    if transaction_type == 'deposit':
+        return status == 'completed'
+    return status not in VOID_STATUSES
+
+
+def add_to_session_totals(anon_id, transaction_type, amount, count=1, game_type=None):
+    """Somar transações (amount em centavos) aos agregados da sessão e do dia (sem commit)"""
+    total_column, count_column = SessionTotals.COLUMNS[transaction_type]
+    now = datetime.utcnow()
+    row = {column: 0 for pair in SessionTotals.COLUMNS.values() for column in pair}
+    row.update({'anon_id': anon_id, total_column: amount, count_column: count, 'updated_at': now})
+
+    # Upsert: duas primeiras escritas concorrentes da sessão não colidem na chave
+    stmt = upsert_insert(SessionTotals)
+    if stmt is not None:
+        stmt = stmt.values(row)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['anon_id'],
+            set_={
+                total_column: getattr(SessionTotals, total_column) + stmt.excluded[total_column],
+                count_column: getattr(SessionTotals, count_column) + stmt.excluded[count_column],
+                'updated_at': stmt.excluded.updated_at
+            }
+        ))
+    else:
+        # Outros bancos: UPDATE e, se não houver linha, INSERT
+        updated = SessionTotals.query.filter_by(anon_id=anon_id).update({
+            total_column: getattr(SessionTotals, total_column) + amount,
+            count_column: getattr(SessionTotals, count_column) + count,
+            'updated_at': now
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(SessionTotals(**row))
+
+    add_to_daily_totals(anon_id, transaction_type, amount, count=count, game_type=game_type)
+
+
+def add_to_daily_totals(player_id, transaction_type, amount, count=1, game_type=None, day=None):
+    """Somar transações ao agregado do jogador no dia e jogo (sem commit)"""
+    total_column, count_column = PlayerDailyTotals.COLUMNS[transaction_type]
+    now = datetime.utcnow()
+    row = {column: 0 for pair in PlayerDailyTotals.COLUMNS.values() for column in pair}
+    row.update({
+        'player_id': player_id,
+        'day': day or now.date(),
+        'game_type': game_type or '',
+        total_column: amount,
+        count_column: count,
+        'updated_at': now
+    })
+
+    stmt = upsert_insert(PlayerDailyTotals)
+    if stmt is not None:
+        stmt = stmt.values(row)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['player_id', 'day', 'game_type'],
+            set_={
+                total_column: getattr(PlayerDailyTotals, total_column) + stmt.excluded[total_column],
+                count_column: getattr(PlayerDailyTotals, count_column) + stmt.excluded[count_column],
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    # Outros bancos: UPDATE e, se não houver linha, INSERT
+    updated = PlayerDailyTotals.query.filter_by(
+        player_id=player_id, day=row['day'], game_type=row['game_type']
+    ).update({
+        total_column: getattr(PlayerDailyTotals, total_column) + amount,
+        count_column: getattr(PlayerDailyTotals, count_column) + count,
+        'updated_at': now
+    }, synchronize_session=False)
+    if not updated:
+        db.session.add(PlayerDailyTotals(**row))
+
+
+def record_transaction(anon_id, transaction_type, amount, balance_after, status='completed', game_type=None, **fields):
+    """Registrar transação no ledger e atualizar agregados (valores em centavos, sem commit)"""
+    transaction = Transaction(
+        anon_id=anon_id,
+        transaction_type=transaction_type,
+        amount_cents=amount,
+        balance_after_cents=balance_after,
+        status=status,
+        **fields
+    )
+    db.session.add(transaction)
+
+    if counts_toward_totals(transaction_type, status):
+        add_to_session_totals(anon_id, transaction_type, amount, game_type=game_type)
+    increment_stats(transaction_increments([(transaction_type, amount)]))
+
+    return transaction
+
+
+def record_transactions(rows):
+    """
+    Registrar várias transações com um INSERT em lote e atualizar os
+    agregados com um UPDATE por (sessão, tipo) (sem commit)
+    Cada linha é um dict com as colunas de Transaction (amount_cents,
+    balance_after_cents, ...; e opcionalmente
+    game_type, usado só nos agregados diários); retorna os IDs na ordem
+    """
+    if not rows:
+        return []
+
+    now = datetime.utcnow()
+    grouped = {}
+    for row in rows:
+        row.setdefault('status', 'completed')
+        row.setdefault('created_at', now)
+        game_type = row.pop('game_type', None)
+        if counts_toward_totals(row['transaction_type'], row['status']):
+            key = (row['anon_id'], row['transaction_type'], game_type)
+            amount, count = grouped.get(key, (0, 0))
+            grouped[key] = (amount + row['amount_cents'], count + 1)
+
+    ids = db.session.scalars(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+        rows
+    ).all()
+
+    for (anon_id, transaction_type, game_type), (amount, count) in grouped.items():
+        add_to_session_totals(anon_id, transaction_type, amount, count=count, game_type=game_type)
+    increment_stats(transaction_increments(
+        [(row['transaction_type'], row['amount_cents']) for row in rows], day=now.date()
+    ))
+
+    return ids
+
+
+def complete_transaction(transaction, balance_after=None):
+    """Marcar transação pendente como concluída e somá-la aos agregados (sem commit)"""
+    was_counted = counts_toward_totals(transaction.transaction_type, transaction.status)
+
+    transaction.status = 'completed'
+    transaction.processed_at = datetime.utcnow()
+    if balance_after is not None:
+        transaction.balance_after_cents = balance_after
+
+    if not was_counted and counts_toward_totals(transaction.transaction_type, 'completed'):
+        add_to_session_totals(transaction.anon_id, transaction.transaction_type, transaction.amount_cents)
+
+
+def get_session_totals(anon_id):
+    """Obter agregados da sessão (zerados se ainda não houver registro)"""
+    totals = db.session.get(SessionTotals, anon_id)
+    if totals:
+        return totals.to_dict()
+    return {column: 0 for pair in SessionTotals.COLUMNS.values() for column in pair}
+
+
+def get_daily_totals(player_id, start, end=None):
+    """Resumo diário do jogador entre start e end (uma linha por dia com movimento)"""
+    end = end or start
+    totals = PlayerDailyTotals.totals_by_day(player_id, start, end)
+    return [PlayerDailyTotals.daily_summary(day, day_totals) for day, day_totals in totals.items()]
+
+
+def check_daily_limits(player_id, deposit=0, bet=0, limits=None):
+    """
+    Verificar se o depósito ou a aposta (centavos) cabe nos limites diários
+    do jogador. Retorna a mensagem de erro ou None se estiver dentro dos limites
+    Chamar na mesma transação da escrita: a linha do dia fica travada até o
+    commit (ou rollback), então verificações concorrentes do mesmo jogador
+    esperam e já enxergam o depósito ou a aposta anterior
+    """
+    limits = limits or Config.get_daily_limits()
+    deposit_limit = limits.get('deposit') or 0
+    loss_limit = limits.get('loss') or 0
+    if not (deposit and deposit_limit) and not (bet and loss_limit):
+        return None
+
+    today = datetime.utcnow().date()
+    # Somar zero à linha de depósitos do dia cria/trava a linha antes da leitura
+    add_to_daily_totals(player_id, 'deposit', 0, count=0, day=today)
+    totals = PlayerDailyTotals.totals_by_day(player_id, today, today).get(today, {})
+
+    if deposit and deposit_limit:
+        # Depósitos aguardando o gateway também contam
+        deposited = totals.get('total_deposited_cents', 0) + pending_deposits(player_id, today)
+        if deposited + deposit > deposit_limit:
+            return f'Limite diário de depósito de R$ {format_money(deposit_limit)} atingido'
+
+    # A aposta inteira pode virar perda
+    loss = totals.get('total_bet_cents', 0) - totals.get('total_won_cents', 0)
+    if bet and loss_limit and loss + bet > loss_limit:
+        return f'Limite diário de perda de R$ {format_money(loss_limit)} atingido'
+
+    return None
+
+
+def pending_deposits(player_id, day):
+    """Soma (centavos) dos depósitos do dia ainda pendentes ou em processamento"""
+    return db.session.query(func.coalesce(func.sum(Transaction.amount_cents), 0)).filter(
+        Transaction.anon_id == player_id,
+        Transaction.created_at >= datetime.combine(day, time.min),
+        Transaction.transaction_type == 'deposit',
+        Transaction.status.in_(PENDING_DEPOSIT_STATUSES)
+    ).scalar()
+
+
+def _counted_condition():
+    """Versão SQL de counts_toward_totals"""
+    return or_(
+        and_(Transaction.transaction_type == 'deposit', Transaction.status == 'completed'),
+        and_(Transaction.transaction_type.in_(['withdraw', 'bet', 'win']),
+             Transaction.status.notin_(VOID_STATUSES))
+    )
+
+
+def _merge_session_totals(rows):
+    """Somar linhas agregadas (anon_id, totais, contagens) ao session_totals (sem commit)"""
+    summed = [column for pair in SessionTotals.COLUMNS.values() for column in pair]
+    for row in rows:
+        stmt = upsert_insert(SessionTotals)
+        if stmt is not None:
+            stmt = stmt.values(row)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['anon_id'],
+                set_={column: getattr(SessionTotals, column) + stmt.excluded[column] for column in summed}
+            ))
+            continue
+        updated = SessionTotals.query.filter_by(anon_id=row['anon_id']).update(
+            {column: getattr(SessionTotals, column) + row[column] for column in summed},
+            synchronize_session=False
+        )
+        if not updated:
+            db.session.add(SessionTotals(**row))
+
+
+def rebuild_session_totals():
+    """Recalcular session_totals a partir de todas as transações (inclusive as arquivadas)"""
+    counted = _counted_condition()
+
+    columns = ['anon_id']
+    aggregates = [Transaction.anon_id]
+    for transaction_type, (total_column, count_column) in SessionTotals.COLUMNS.items():
+        is_type = Transaction.transaction_type == transaction_type
+        columns += [total_column, count_column]
+        aggregates += [
+            func.coalesce(func.sum(case((is_type, Transaction.amount_cents), else_=0)), 0),
+            func.sum(case((is_type, 1), else_=0))
+        ]
+    columns.append('updated_at')
+    aggregates.append(func.max(Transaction.created_at))
+
+    query = select(*aggregates).where(
+        Transaction.anon_id.isnot(None),
+        counted
+    ).group_by(Transaction.anon_id)
+
+    # Meses arquivados entram somando o mesmo agregado de cada arquivo
+    archived = aggregate_archives(query)
+
+    try:
+        db.session.execute(delete(SessionTotals))
+        db.session.execute(insert(SessionTotals).from_select(columns, query))
+        _merge_session_totals([dict(zip(columns, row)) for row in archived])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return db.session.query(func.count(SessionTotals.anon_id)).scalar()
+
+
+def rebuild_player_daily_totals():
+    """
+    Recalcular player_daily_totals a partir das transações
+    Dias de meses já arquivados são mantidos como estão
+    """
+    player_id = func.coalesce(Transaction.anon_id, Transaction.user_id)
+    # Depósitos pendentes contam no dia em que foram concluídos
+    counted_at = func.coalesce(Transaction.processed_at, Transaction.created_at)
+    day = func.date(counted_at)
+    game_type = func.coalesce(GameSession.game_type, '')
+
+    columns = ['player_id', 'day', 'game_type']
+    aggregates = [player_id, day, game_type]
+    for transaction_type, (total_column, count_column) in PlayerDailyTotals.COLUMNS.items():
+        is_type = Transaction.transaction_type == transaction_type
+        columns += [total_column, count_column]
+        aggregates += [
+            func.coalesce(func.sum(case((is_type, Transaction.amount_cents), else_=0)), 0),
+            func.sum(case((is_type, 1), else_=0))
+        ]
+    columns.append('updated_at')
+    aggregates.append(func.max(Transaction.created_at))
+
+    query = select(*aggregates)\
+        .outerjoin(GameSession, GameSession.id == Transaction.game_session_id)\
+        .where(player_id.isnot(None), Transaction.created_at.isnot(None), _counted_condition())\
+        .group_by(player_id, day, game_type)
+    rebuilt = delete(PlayerDailyTotals)
+
+    boundary = archived_until()
+    if boundary is not None:
+        query = query.where(counted_at >= boundary)
+        rebuilt = rebuilt.where(PlayerDailyTotals.day >= boundary.date())
+
+    try:
+        db.session.execute(rebuilt)
+        db.session.execute(insert(PlayerDailyTotals).from_select(columns, query))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return db.session.query(func.count()).select_from(PlayerDailyTotals).scalar()
+
+
+def backfill_player_daily_totals():
+    """Preencher player_daily_totals na primeira execução em um banco com transações"""
+    if db.session.query(PlayerDailyTotals.player_id).first() is not None:
+        return 0
+    if db.session.query(Transaction.id).first() is None:
+        return 0
+    return rebuild_player_daily_totals()
@@ -0,0 +1,54 @@
+"""
+Valores monetários em centavos
+Saldos, apostas, pagamentos, taxas e agregados são inteiros de 64 bits em
+centavos (colunas *_cents) do motor de jogo até o banco; somas no SQL são
+exatas e vetorizáveis em arrays int64. A conversão para reais só acontece
+na borda: entrada das rotas (to_cents) e JSON de saída (to_reais).
+Percentuais (taxas, vantagem da casa) usam pontos-base (1% = 100 bps).
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTS = 100
+BPS = 10_000
+
+
+def _decimal(value):
+    if isinstance(value, bool) or value is None:
+        raise ValueError(f'Valor inválido: {value!r}')
+    try:
+        number = Decimal(value.strip() if isinstance(value, str) else str(value))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Valor inválido: {value!r}')
+    if not number.is_finite():
+        raise ValueError(f'Valor inválido: {value!r}')
+    return number
+
+
+def to_cents(value):
+    """Reais (número ou texto) -> centavos; meio centavo arredonda para cima"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * CENTS
+    return int((_decimal(value) * CENTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_reais(cents):
+    """Centavos -> reais para o JSON"""
+    return None if cents is None else cents / CENTS
+
+
+def to_bps(percentage):
+    """Percentual (3.5) -> pontos-base (350)"""
+    return int((_decimal(percentage) * CENTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def percent_of(cents, bps):
+    """Parcela de bps pontos-base sobre um valor em centavos, arredondada para cima no meio centavo"""
+    return (cents * bps + BPS // 2) // BPS
+
+
+def format_money(cents):
+    """Centavos -> '1234.50' (mensagens de erro)"""
+    sign = '-' if cents < 0 else ''
+    units, rest = divmod(abs(int(cents)), CENTS)
+    return f'{sign}{units}.{rest:02d}'
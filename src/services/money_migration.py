@@ -0,0 +1,186 @@
+"""
+Migração dos valores monetários de reais (Float) para centavos (BigInteger)
+Feita em três fases, todas idempotentes e retomáveis:
+
+1. expand: adiciona as colunas *_cents / *_bps (anuláveis) ao lado das antigas
+2. backfill: copia ROUND(antiga * 100) em lotes por chave primária, cada lote
+   na sua própria transação; linhas gravadas pela versão anterior durante a
+   migração são corrigidas na passada seguinte
+3. contract: remove as colunas antigas (ALTER TABLE ... DROP COLUMN)
+
+Para bancos grandes, rodar antes do deploy com a versão atual no ar:
+    DB_AUTO_INIT=false flask migrate-money --no-contract
+e deixar o boot da nova versão (run_migrations) fazer a última passada e o
+contract, que só tocam as linhas gravadas desde então.
+
+Configuração por ambiente: MONEY_MIGRATION_CHUNK_SIZE
+"""
+
+import os
+
+from sqlalchemy import BigInteger, and_, cast, column, func, inspect, or_, select, table, text, tuple_, update
+
+from src.services.money import CENTS
+
+CHUNK_SIZE = int(os.getenv('MONEY_MIGRATION_CHUNK_SIZE', 5000))
+
+# (tabela, coluna antiga em reais ou percentual, coluna nova) — escala 100 em todas
+MONEY_COLUMNS = [
+    ('anonymous_sessions', 'balance', 'balance_cents'),
+    ('casino_users', 'balance', 'balance_cents'),
+    ('casino_users', 'total_deposited', 'total_deposited_cents'),
+    ('casino_users', 'total_withdrawn', 'total_withdrawn_cents'),
+    ('casino_users', 'total_bet', 'total_bet_cents'),
+    ('casino_users', 'total_won', 'total_won_cents'),
+    ('casino_users', 'daily_deposit_limit', 'daily_deposit_limit_cents'),
+    ('casino_users', 'daily_loss_limit', 'daily_loss_limit_cents'),
+    ('transactions', 'amount', 'amount_cents'),
+    ('transactions', 'balance_after', 'balance_after_cents'),
+    ('session_totals', 'total_deposited', 'total_deposited_cents'),
+    ('session_totals', 'total_withdrawn', 'total_withdrawn_cents'),
+    ('session_totals', 'total_bet', 'total_bet_cents'),
+    ('session_totals', 'total_won', 'total_won_cents'),
+    ('player_daily_totals', 'total_deposited', 'total_deposited_cents'),
+    ('player_daily_totals', 'total_withdrawn', 'total_withdrawn_cents'),
+    ('player_daily_totals', 'total_bet', 'total_bet_cents'),
+    ('player_daily_totals', 'total_won', 'total_won_cents'),
+    ('stats_rollups', 'total', 'total_cents'),
+    ('game_sessions', 'initial_balance', 'initial_balance_cents'),
+    ('game_sessions', 'current_balance', 'current_balance_cents'),
+    ('game_sessions', 'total_bet', 'total_bet_cents'),
+    ('game_sessions', 'total_won', 'total_won_cents'),
+    ('game_sessions', 'biggest_win', 'biggest_win_cents'),
+    ('game_sessions', 'max_loss_limit', 'max_loss_limit_cents'),
+    ('game_sessions', 'max_win_target', 'max_win_target_cents'),
+    ('game_rounds', 'bet_amount', 'bet_amount_cents'),
+    ('game_rounds', 'win_amount', 'win_amount_cents'),
+    ('payment_methods', 'daily_limit', 'daily_limit_cents'),
+    ('payment_methods', 'monthly_limit', 'monthly_limit_cents'),
+    ('system_payment_methods', 'min_deposit', 'min_deposit_cents'),
+    ('system_payment_methods', 'max_deposit', 'max_deposit_cents'),
+    ('system_payment_methods', 'min_withdrawal', 'min_withdrawal_cents'),
+    ('system_payment_methods', 'max_withdrawal', 'max_withdrawal_cents'),
+    ('system_payment_methods', 'deposit_fee_percentage', 'deposit_fee_bps'),
+    ('system_payment_methods', 'deposit_fee_fixed', 'deposit_fee_fixed_cents'),
+    ('system_payment_methods', 'withdrawal_fee_percentage', 'withdrawal_fee_bps'),
+    ('system_payment_methods', 'withdrawal_fee_fixed', 'withdrawal_fee_fixed_cents'),
+    ('transaction_archives', 'total_amount', 'total_amount_cents'),
+]
+
+
+def _pending(engine, tables=None):
+    """{tabela: [(antiga, nova, nova já existe)]} das colunas antigas ainda presentes no banco"""
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    columns = {}
+    pending = {}
+    for table_name, legacy, target in MONEY_COLUMNS:
+        if table_name not in existing or (tables and table_name not in tables):
+            continue
+        if table_name not in columns:
+            columns[table_name] = {c['name'] for c in inspector.get_columns(table_name)}
+        if legacy in columns[table_name]:
+            pending.setdefault(table_name, []).append((legacy, target, target in columns[table_name]))
+    return pending, inspector
+
+
+def expand(engine, tables=None):
+    """Fase 1: adicionar as colunas novas que faltam; retorna as adicionadas"""
+    pending, _ = _pending(engine, tables)
+    added = []
+    with engine.begin() as conn:
+        for table_name, pairs in pending.items():
+            for legacy, target, exists in pairs:
+                if not exists:
+                    column_type = 'INTEGER' if target.endswith('_bps') else 'BIGINT'
+                    conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {target} {column_type}'))
+                    added.append(f'{table_name}.{target}')
+    return added
+
+
+def _scaled(legacy):
+    return cast(func.round(legacy * CENTS), BigInteger)
+
+
+def _stale(pairs):
+    """Linhas com alguma coluna nova faltando ou diferente da antiga"""
+    conditions = []
+    for legacy, target in pairs:
+        conditions.append(and_(legacy.isnot(None), or_(target.is_(None), target != _scaled(legacy))))
+    return or_(*conditions)
+
+
+def backfill(engine, tables=None, chunk_size=None):
+    """
+    Fase 2: copiar os valores antigos para as colunas novas em lotes pela
+    chave primária (um commit por lote); retorna {tabela: linhas atualizadas}
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    pending, inspector = _pending(engine, tables)
+    updated = {}
+    for table_name, pairs in pending.items():
+        pairs = [pair for pair in pairs if pair[2]]
+        if not pairs:
+            continue
+        key_names = inspector.get_pk_constraint(table_name)['constrained_columns']
+        names = [name for pair in pairs for name in pair[:2]]
+        target_table = table(table_name, *[column(name) for name in set(key_names + names)])
+        key = [target_table.c[name] for name in key_names]
+        key_expr = key[0] if len(key) == 1 else tuple_(*key)
+        column_pairs = [(target_table.c[legacy], target_table.c[target]) for legacy, target, _ in pairs]
+        stale = _stale(column_pairs)
+
+        count = 0
+        last_key = None
+        while True:
+            # Keyset pela chave primária: cada lote continua depois do anterior
+            # em vez de reler do início as linhas já convertidas
+            query = select(*key).where(stale)
+            if last_key is not None:
+                query = query.where(key_expr > last_key)
+            with engine.begin() as conn:
+                keys = conn.execute(query.order_by(*key).limit(chunk_size)).all()
+                if not keys:
+                    break
+                values = [tuple(row) for row in keys] if len(key) > 1 else [row[0] for row in keys]
+                conn.execute(
+                    update(target_table).where(key_expr.in_(values))
+                    .values({target.name: _scaled(legacy) for legacy, target in column_pairs})
+                )
+            last_key = values[-1] if len(key) == 1 else tuple_(*values[-1])
+            count += len(keys)
+        updated[table_name] = count
+    return updated
+
+
+def contract(engine, tables=None):
+    """
+    Fase 3: remover as colunas antigas; retorna as removidas. As linhas
+    gravadas depois do backfill são corrigidas na mesma transação do DROP
+    """
+    pending, _ = _pending(engine, tables)
+    dropped = []
+    for table_name, pairs in pending.items():
+        if not all(exists for _, _, exists in pairs):
+            continue
+        target_table = table(table_name, *[column(name) for pair in pairs for name in pair[:2]])
+        column_pairs = [(target_table.c[legacy], target_table.c[target]) for legacy, target, _ in pairs]
+        with engine.begin() as conn:
+            conn.execute(
+                update(target_table).where(_stale(column_pairs))
+                .values({target.name: _scaled(legacy) for legacy, target in column_pairs})
+            )
+            for legacy, _, _ in pairs:
+                conn.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {legacy}'))
+                dropped.append(f'{table_name}.{legacy}')
+    return dropped
+
+
+def migrate_money(engine, tables=None, chunk_size=None, contract_columns=True):
+    """Executar as três fases; retorna o que cada uma fez"""
+    result = {
+        'added': expand(engine, tables),
+        'backfilled': backfill(engine, tables, chunk_size)
+    }
+    result['dropped'] = contract(engine, tables) if contract_columns else []
+    return result
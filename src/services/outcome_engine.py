@@ -0,0 +1,208 @@
+"""
+Motor vetorizado de resultados (NumPy) para roleta, dados e caça-níqueis
+Gera os resultados e calcula os pagamentos de um vetor inteiro de apostas
+numa única chamada. Cada resultado consome exatamente um double do gerador,
+na mesma ordem das funções escalares de src.routes.casino, então o mesmo
+seed produz os mesmos resultados nos dois caminhos.
+
+Apostas e pagamentos são centavos em arrays int64 (src.services.money).
+"""
+
+import numpy as np
+
+from src.services.money import BPS
+
+# Gerador padrão do processo (as funções escalares também o usam)
+default_rng = np.random.default_rng()
+
+# Roleta
+ROULETTE_NUMBERS = 37
+RED_NUMBERS = (1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36)
+COLOR_NAMES = ('red', 'black', 'green')
+ROULETTE_COLORS = np.array(
+    [2] + [0 if n in RED_NUMBERS else 1 for n in range(1, ROULETTE_NUMBERS)],
+    dtype=np.int8
+)
+
+# Dados
+DICE_TOTAL_MULTIPLIERS = np.zeros(13, dtype=np.int64)
+for _total, _multiplier in {7: 4, 6: 6, 8: 6, 5: 8, 9: 8, 4: 10, 10: 10,
+                            3: 15, 11: 15, 2: 30, 12: 30}.items():
+    DICE_TOTAL_MULTIPLIERS[_total] = _multiplier
+
+# Caça-níqueis
+SLOT_SYMBOLS = ('🍒', '🍋', '🍊', '🍇', '⭐', '💎', '7️⃣')
+SLOT_MULTIPLIERS = np.array([5, 8, 10, 15, 25, 50, 100], dtype=np.int64)
+
+# Códigos dos tipos de aposta
+BET_NONE, BET_NUMBER, BET_COLOR, BET_EVEN_ODD, BET_HIGH_LOW, BET_TOTAL = range(6)
+_BET_KINDS = {
+    'number': BET_NUMBER,
+    'color': BET_COLOR,
+    'even_odd': BET_EVEN_ODD,
+    'high_low': BET_HIGH_LOW,
+    'total': BET_TOTAL,
+}
+_BET_TARGETS = {
+    BET_COLOR: {'red': 0, 'black': 1, 'green': 2},
+    BET_EVEN_ODD: {'even': 0, 'odd': 1},
+    BET_HIGH_LOW: {'low': 0, 'high': 1},
+}
+
+
+def uniform(rng=None, size=None):
+    """Sortear doubles uniformes em [0, 1) do gerador informado (ou do padrão)"""
+    return (rng or default_rng).random(size)
+
+
+def encode_bets(bet_types, bet_values):
+    """
+    Converter (tipo, valor) das apostas em vetores de códigos inteiros
+    Apostas desconhecidas ficam com alvo -1 e nunca pagam
+    """
+    kinds = np.empty(len(bet_types), dtype=np.int8)
+    targets = np.empty(len(bet_types), dtype=np.int64)
+    for i, (bet_type, bet_value) in enumerate(zip(bet_types, bet_values)):
+        kind = _BET_KINDS.get(bet_type, BET_NONE)
+        kinds[i] = kind
+        if kind in (BET_NUMBER, BET_TOTAL):
+            is_number = isinstance(bet_value, (int, float)) and abs(bet_value) < 2 ** 31
+            targets[i] = bet_value if is_number and float(bet_value).is_integer() else -1
+        elif kind in _BET_TARGETS:
+            targets[i] = _BET_TARGETS[kind].get(bet_value, -1) if isinstance(bet_value, str) else -1
+        else:
+            targets[i] = -1
+    return kinds, targets
+
+
+def house_edge_bps(house_edge):
+    """Vantagem da casa (0.027) em pontos-base (270)"""
+    return round(house_edge * BPS)
+
+
+def house_cut(profit, edge_bps):
+    """Parte da casa sobre o lucro em centavos (meio centavo arredonda para cima)"""
+    return (profit * edge_bps + BPS // 2) // BPS
+
+
+def apply_house_edge(payouts, bet_amounts, house_edge):
+    """Descontar a vantagem da casa do lucro, em centavos inteiros"""
+    profit = np.maximum(payouts - bet_amounts, 0)
+    return payouts - house_cut(profit, house_edge_bps(house_edge))
+
+
+def roulette_outcomes(n, rng=None):
+    """Sortear n números vencedores"""
+    return (uniform(rng, n) * ROULETTE_NUMBERS).astype(np.int64)
+
+
+def roulette_payouts(numbers, kinds, targets, bet_amounts, house_edge):
+    """Calcular pagamentos da roleta para vetores de resultados e apostas"""
+    colors = ROULETTE_COLORS[numbers]
+    parity = numbers % 2
+    nonzero = numbers != 0
+
+    multipliers = np.zeros(len(numbers), dtype=np.int64)
+    multipliers[(kinds == BET_NUMBER) & (targets == numbers)] = 35
+    multipliers[(kinds == BET_COLOR) & (targets == colors) & nonzero] = 2
+    multipliers[(kinds == BET_EVEN_ODD) & (
+        ((targets == 0) & (parity == 0) & nonzero) | ((targets == 1) & (parity == 1))
+    )] = 2
+    multipliers[(kinds == BET_HIGH_LOW) & (
+        ((targets == 0) & (numbers >= 1) & (numbers <= 18)) | ((targets == 1) & (numbers >= 19))
+    )] = 2
+
+    return apply_house_edge(bet_amounts * multipliers, bet_amounts, house_edge)
+
+
+def dice_outcomes(n, rng=None):
+    """Sortear n pares de dados (matriz n x 2)"""
+    return (uniform(rng, (n, 2)) * 6).astype(np.int64) + 1
+
+
+def dice_payouts(dice, kinds, targets, bet_amounts, house_edge):
+    """Calcular pagamentos dos dados para vetores de resultados e apostas"""
+    totals = dice.sum(axis=1)
+    parity = totals % 2
+
+    multipliers = np.zeros(len(totals), dtype=np.int64)
+    exact = (kinds == BET_TOTAL) & (targets == totals)
+    multipliers[exact] = DICE_TOTAL_MULTIPLIERS[totals[exact]]
+    multipliers[(kinds == BET_HIGH_LOW) & (
+        ((targets == 0) & (totals <= 6)) | ((targets == 1) & (totals >= 8))
+    )] = 2
+    multipliers[(kinds == BET_EVEN_ODD) & (targets == parity)] = 2
+
+    return apply_house_edge(bet_amounts * multipliers, bet_amounts, house_edge)
+
+
+def slots_outcomes(n, rng=None):
+    """Sortear n resultados de 3 rolos (índices em SLOT_SYMBOLS, matriz n x 3)"""
+    return (uniform(rng, (n, 3)) * len(SLOT_SYMBOLS)).astype(np.int64)
+
+
+def slots_payouts(reels, bet_amounts, house_edge):
+    """Calcular pagamentos do caça-níqueis para vetores de resultados e apostas"""
+    first, second, third = reels[:, 0], reels[:, 1], reels[:, 2]
+    three = (first == second) & (second == third)
+    two = ~three & ((first == second) | (second == third) | (first == third))
+
+    multipliers = np.where(three, SLOT_MULTIPLIERS[first], np.where(two, 2, 0))
+    return apply_house_edge(bet_amounts * multipliers, bet_amounts, house_edge)
+
+
+def play_batch(game_type, bets, house_edge, rng=None):
+    """
+    Jogar um vetor de apostas de um mesmo jogo
+    bets: lista de (bet_data, bet_amount em centavos); retorna a lista de resultados
+    no mesmo formato das funções escalares ({'payout_cents', 'house_edge', 'result'})
+    """
+    n = len(bets)
+    bet_amounts = np.array([amount for _, amount in bets], dtype=np.int64)
+    bet_types = [bet_data.get('type') for bet_data, _ in bets]
+    bet_values = [bet_data.get('value') for bet_data, _ in bets]
+
+    if game_type == 'roulette':
+        numbers = roulette_outcomes(n, rng)
+        payouts = roulette_payouts(numbers, *encode_bets(bet_types, bet_values), bet_amounts, house_edge)
+        return [{
+            'payout_cents': int(payout),
+            'house_edge': house_edge,
+            'result': {
+                'winning_number': int(number),
+                'winning_color': COLOR_NAMES[ROULETTE_COLORS[number]],
+                'bet_type': bet_type,
+                'bet_value': bet_value,
+                'won': bool(payout > 0)
+            }
+        } for number, payout, bet_type, bet_value in zip(numbers, payouts, bet_types, bet_values)]
+
+    if game_type == 'dice':
+        dice = dice_outcomes(n, rng)
+        payouts = dice_payouts(dice, *encode_bets(bet_types, bet_values), bet_amounts, house_edge)
+        return [{
+            'payout_cents': int(payout),
+            'house_edge': house_edge,
+            'result': {
+                'dice1': int(pair[0]),
+                'dice2': int(pair[1]),
+                'total': int(pair[0] + pair[1]),
+                'bet_type': bet_type,
+                'bet_value': bet_value,
+                'won': bool(payout > 0)
+            }
+        } for pair, payout, bet_type, bet_value in zip(dice, payouts, bet_types, bet_values)]
+
+    if game_type == 'slots':
+        reels = slots_outcomes(n, rng)
+        payouts = slots_payouts(reels, bet_amounts, house_edge)
+        return [{
+            'payout_cents': int(payout),
+            'house_edge': house_edge,
+            'result': {
+                'reels': [SLOT_SYMBOLS[i] for i in row],
+                'won': bool(payout > 0)
+            }
+        } for row, payout in zip(reels, payouts)]
+
+    raise ValueError(f'Jogo sem motor vetorizado: {game_type}')
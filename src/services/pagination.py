@@ -0,0 +1,60 @@
+"""
+Paginação por cursor (keyset) para históricos
+O cursor codifica (created_at, id) do último item da página; a próxima página
+começa estritamente depois dele, sem OFFSET nem COUNT(*)
+"""
+
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, row_id):
+    """Gerar cursor opaco a partir de (created_at, id)"""
+    raw = f'{created_at.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodificar cursor; levanta ValueError se for inválido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def wants_total(args, default=False):
+    """Verificar se o cliente pediu a contagem total (include_total=true)"""
+    value = args.get('include_total')
+    if value is None:
+        return default
+    return value.lower() in ('true', '1', 'yes')
+
+
+def keyset_paginate(query, created_column, id_column, cursor=None, per_page=20):
+    """
+    Obter uma página em ordem decrescente de (created_at, id)
+    Retorna (itens, next_cursor); next_cursor é None na última página
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+
+    rows = query.order_by(created_column.desc(), id_column.desc())\
+        .limit(per_page + 1)\
+        .all()
+
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+    return items, next_cursor
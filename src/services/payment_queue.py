@@ -0,0 +1,307 @@
+"""
+Fila durável de chamadas ao gateway de pagamento
+A rota /api/payments/process só grava a transação pendente e um PaymentJob;
+um pool de workers executa a chamada ao gateway fora da requisição, com
+novas tentativas e backoff exponencial para falhas de comunicação.
+
+Cada transação vai ao gateway com uma reference_key única (payment_reference).
+Só falhas em que a conexão nem foi estabelecida são postadas de novo; depois
+de uma resposta ambígua (5xx, timeout de leitura) o job passa a reconciliar:
+consulta a transação pela reference_key e nunca posta outra vez.
+
+Configuração por ambiente:
+PAYMENT_WORKERS (threads por processo, 0 desliga), PAYMENT_JOB_MAX_ATTEMPTS,
+PAYMENT_JOB_BACKOFF_SECONDS, PAYMENT_JOB_BACKOFF_MAX_SECONDS,
+PAYMENT_WORKER_POLL_SECONDS, PAYMENT_JOB_LEASE_SECONDS, PAYMENT_REFERENCE_PREFIX
+"""
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, cast, or_, select, update
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.models.payment_job import PaymentJob
+from src.models.webhook_event import WebhookEvent
+from src.payment_gateways import is_retryable, needs_reconciliation, payment_manager
+from src.services.ledger import complete_transaction
+
+MAX_ATTEMPTS = int(os.getenv('PAYMENT_JOB_MAX_ATTEMPTS', 5))
+BACKOFF_SECONDS = float(os.getenv('PAYMENT_JOB_BACKOFF_SECONDS', 2))
+BACKOFF_MAX_SECONDS = float(os.getenv('PAYMENT_JOB_BACKOFF_MAX_SECONDS', 300))
+# Job em execução há mais tempo que isso é considerado abandonado (worker morreu)
+LEASE_SECONDS = float(os.getenv('PAYMENT_JOB_LEASE_SECONDS', 120))
+# Prefixo da reference_key (única por conta no gateway, então por ambiente)
+REFERENCE_PREFIX = os.getenv('PAYMENT_REFERENCE_PREFIX', 'casino')
+
+
+def payment_reference(transaction_id):
+    """Chave de idempotência da transação local no gateway"""
+    return f'{REFERENCE_PREFIX}-{transaction_id}'
+
+
+def enqueue_payment(transaction, payment_data):
+    """Enfileirar a chamada ao gateway de uma transação pendente (sem commit)"""
+    job = PaymentJob(
+        transaction_id=transaction.id,
+        status='queued',
+        max_attempts=MAX_ATTEMPTS,
+        next_run_at=datetime.utcnow(),
+        payload=payment_data
+    )
+    db.session.add(job)
+    return job
+
+
+def scrub_card_data(chunk_size=1000):
+    """
+    Remover o cartão gravado por versões anteriores em payment_jobs.payload e
+    transactions.extra_data (número e CVV em claro); fica só o card_hash na
+    fila. Em lotes por id, um commit cada; retorna quantas linhas mudaram
+    """
+    scrubbed = 0
+    for model, column in ((PaymentJob, PaymentJob.payload), (Transaction, Transaction.extra_data)):
+        last_id = 0
+        while True:
+            rows = db.session.query(model).filter(
+                model.id > last_id, cast(column, db.Text).like('%"card"%')
+            ).order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                break
+            for row in rows:
+                if model is PaymentJob:
+                    payload = dict(row.payload)
+                    card = payload.pop('card', None) or {}
+                    if card.get('card_hash'):
+                        payload['card'] = {'card_hash': card['card_hash']}
+                    changed = payload != row.payload
+                    row.payload = payload
+                else:
+                    extra_data = dict(row.extra_data)
+                    request_data = dict(extra_data.get('gateway_request') or {})
+                    changed = request_data.pop('card', None) is not None
+                    if changed:
+                        extra_data['gateway_request'] = request_data
+                        row.extra_data = extra_data
+                scrubbed += changed
+            last_id = rows[-1].id
+            db.session.commit()
+    return scrubbed
+
+
+def get_job_for_transaction(transaction_id):
+    """Job mais recente de uma transação (ou None)"""
+    return PaymentJob.query.filter_by(transaction_id=transaction_id)\
+        .order_by(PaymentJob.id.desc()).first()
+
+
+def backoff_delay(attempts):
+    """Espera antes da próxima tentativa: base * 2^(tentativas-1), com teto"""
+    return min(BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+
+
+def claim_next_job(worker_id, now=None):
+    """
+    Reservar o próximo job pronto com um UPDATE condicional
+    Dois workers nunca reservam o mesmo job: o UPDATE repete a condição de
+    status, então só um deles altera a linha. Retorna o id ou None
+    """
+    now = now or datetime.utcnow()
+    ready = or_(
+        and_(PaymentJob.status == 'queued', PaymentJob.next_run_at <= now),
+        and_(PaymentJob.status == 'running', PaymentJob.locked_at < now - timedelta(seconds=LEASE_SECONDS))
+    )
+    candidate = select(PaymentJob.id).where(ready)\
+        .order_by(PaymentJob.next_run_at, PaymentJob.id).limit(1).scalar_subquery()
+
+    stmt = update(PaymentJob)\
+        .where(PaymentJob.id == candidate, ready)\
+        .values(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=PaymentJob.attempts + 1,
+            updated_at=now
+        )\
+        .returning(PaymentJob.id)\
+        .execution_options(synchronize_session=False)
+    try:
+        job_id = db.session.execute(stmt).scalar()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return job_id
+
+
+def apply_gateway_result(transaction, result):
+    """Atualizar a transação com a resposta do gateway (sem commit)"""
+    now = datetime.utcnow().isoformat()
+    extra_data = dict(transaction.extra_data or {})
+
+    if result.get('success'):
+        transaction.status = 'processing'
+        transaction.external_transaction_id = result.get('transaction_id')
+        # Webhook que chegou antes deste commit volta a ser processado já
+        WebhookEvent.query.filter(
+            WebhookEvent.external_transaction_id == str(result.get('transaction_id')),
+            WebhookEvent.processed_at.is_(None)
+        ).update({'next_attempt_at': None}, synchronize_session=False)
+        extra_data.update({'gateway_response': result, 'processed_at': now})
+        transaction.extra_data = extra_data
+
+        # Pagamento aprovado imediatamente (cartão): creditar saldo
+        if result.get('status') == 'paid':
+            new_balance = AnonymousSession.credit(transaction.anon_id, transaction.amount_cents, entry_type='deposit')
+            if new_balance is not None:
+                complete_transaction(transaction, balance_after=new_balance)
+    else:
+        transaction.status = 'failed'
+        extra_data.update({'gateway_error': result, 'failed_at': now})
+        transaction.extra_data = extra_data
+
+
+def run_job(job_id):
+    """Executar um job já reservado e gravar o resultado"""
+    job = db.session.get(PaymentJob, job_id)
+    transaction = db.session.get(Transaction, job.transaction_id)
+    now = datetime.utcnow()
+
+    if transaction is None or transaction.status != 'pending':
+        # Transação removida ou já resolvida por outro caminho (webhook)
+        job.status = 'succeeded' if transaction is not None else 'failed'
+        job.payload = None
+        job.finished_at = now
+        db.session.commit()
+        return job
+
+    reference_key = payment_reference(transaction.id)
+    try:
+        result = None
+        if job.reconcile or job.attempts > 1:
+            # Tentativa anterior pode ter criado a transação: resposta ambígua
+            # ou worker que morreu (lease expirado) antes de gravar o resultado
+            result = payment_manager.find_payment(reference_key)
+            if result.get('found') is False:
+                result['reconcile'] = job.reconcile
+                if not job.reconcile:
+                    result = None
+        if result is None:
+            result = payment_manager.process_payment({**job.payload, 'reference_key': reference_key})
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e),
+            'retryable': is_retryable(e),
+            'reconcile': needs_reconciliation(e)
+        }
+
+    try:
+        pending = result.get('retryable') or result.get('reconcile')
+        if not result.get('success') and pending and job.attempts < job.max_attempts:
+            # Falha temporária ou resultado desconhecido: reagendar com backoff
+            job.status = 'queued'
+            job.reconcile = job.reconcile or bool(result.get('reconcile'))
+            job.next_run_at = now + timedelta(seconds=backoff_delay(job.attempts))
+            job.last_error = result.get('error')
+            job.locked_by = None
+            job.locked_at = None
+        else:
+            apply_gateway_result(transaction, result)
+            job.status = 'succeeded' if result.get('success') else 'failed'
+            job.last_error = None if result.get('success') else result.get('error')
+            job.payload = None
+            job.finished_at = now
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return job
+
+
+def run_pending_jobs(worker_id=None, limit=None):
+    """Executar jobs prontos até a fila esvaziar (ou até `limit`); retorna quantos rodaram"""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:sync'
+    processed = 0
+    while limit is None or processed < limit:
+        job_id = claim_next_job(worker_id)
+        if job_id is None:
+            break
+        run_job(job_id)
+        processed += 1
+    return processed
+
+
+class PaymentWorkerPool:
+    """Threads que consomem a fila de pagamentos dentro do contexto da aplicação"""
+
+    def __init__(self, app, concurrency=None, poll_interval=None):
+        self.app = app
+        self.concurrency = concurrency if concurrency is not None else int(os.getenv('PAYMENT_WORKERS', 4))
+        self.poll_interval = poll_interval if poll_interval is not None else \
+            float(os.getenv('PAYMENT_WORKER_POLL_SECONDS', 1))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Iniciar as threads (idempotente)"""
+        if self._threads:
+            return self
+        self._stop.clear()
+        for index in range(self.concurrency):
+            worker_id = f'{socket.gethostname()}:{os.getpid()}:{index}'
+            thread = threading.Thread(target=self._loop, args=(worker_id,), name=f'payment-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        """Parar as threads depois do job em andamento"""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Acordar os workers (novo job enfileirado)"""
+        self._wake.set()
+
+    def _loop(self, worker_id):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    job_id = claim_next_job(worker_id)
+                    if job_id is not None:
+                        run_job(job_id)
+                except Exception as e:
+                    print(f'Erro no worker de pagamentos {worker_id}: {e}')
+                    job_id = None
+                finally:
+                    db.session.remove()
+            if job_id is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+payment_workers = None
+
+
+def init_payment_workers(app):
+    """Iniciar o pool de workers do processo (PAYMENT_WORKERS=0 desliga)"""
+    global payment_workers
+    pool = PaymentWorkerPool(app)
+    if pool.concurrency > 0:
+        payment_workers = pool.start()
+    return payment_workers
+
+
+def notify_workers():
+    """Avisar o pool local de que há job novo"""
+    if payment_workers is not None:
+        payment_workers.notify()
@@ -0,0 +1,234 @@
+"""
+Rate limiting por janela deslizante aproximada (sliding window counter)
+Cada chave guarda só três inteiros (janela atual, contagem atual e contagem
+da janela anterior), então a memória por chave é O(1). O backend é plugável:
+- memory: dicionário LRU por processo, com limite de chaves
+- sqlite: arquivo SQLite compartilhado por todos os workers da máquina
+
+A chave é request.remote_addr. X-Forwarded-For só vale atrás de proxy
+reverso configurado (TRUSTED_PROXY_COUNT, aplicado com ProxyFix em main.py);
+sem isso qualquer cliente escolheria a própria chave.
+
+Configuração por ambiente:
+RATE_LIMIT_BACKEND (memory|sqlite), RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+# Prefixo das rotas protegidas pelo middleware global e rotas isentas
+# (o webhook do gateway é autenticado pela assinatura, não limitado por IP)
+PROTECTED_PREFIX = '/api/'
+EXEMPT_PATHS = ('/api/health', '/api/payments/webhook/pagarme')
+
+
+def _slide(state, window_id):
+    """Avançar o estado (janela, atual, anterior) até a janela informada"""
+    if state is None:
+        return [window_id, 0, 0]
+    stored_window, count, previous = state
+    if window_id == stored_window:
+        return [stored_window, count, previous]
+    if window_id == stored_window + 1:
+        return [window_id, 0, count]
+    return [window_id, 0, 0]
+
+
+def _estimate(state, now, window):
+    """Requisições estimadas nos últimos `window` segundos"""
+    window_id, count, previous = state
+    elapsed = (now - window_id * window) / window
+    return previous * (1 - elapsed) + count
+
+
+def _evaluate(states, rules, now):
+    """
+    Avaliar todas as regras (chave, limite, janela) sobre os estados atuais
+    Retorna (permitido, novos estados, segundos até liberar)
+    """
+    updated = {}
+    retry_after = 0
+    for key, limit, window in rules:
+        state = _slide(states.get(key), int(now // window))
+        if _estimate(state, now, window) + 1 > limit:
+            # Tempo até a contagem da janela anterior decair o suficiente
+            retry_after = max(retry_after, math.ceil((state[0] + 1) * window - now))
+        updated[key] = state
+    if retry_after:
+        return False, updated, retry_after
+    for state in updated.values():
+        state[1] += 1
+    return True, updated, 0
+
+
+class MemoryBackend:
+    """Contadores no próprio processo, com despejo LRU das chaves ociosas"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, rules, now):
+        with self._lock:
+            states = {key: self._states.get(key) for key, _, _ in rules}
+            allowed, updated, retry_after = _evaluate(states, rules, now)
+            for key, state in updated.items():
+                self._states[key] = state
+                self._states.move_to_end(key)
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+            return allowed, retry_after
+
+    def __len__(self):
+        return len(self._states)
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+
+
+class SQLiteBackend:
+    """Contadores num arquivo SQLite compartilhado entre processos"""
+
+    # Limpeza das chaves ociosas a cada N consumos
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, max_keys=10000, idle_seconds=7200):
+        self.path = path
+        self.max_keys = max_keys
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                'key TEXT PRIMARY KEY, window_id INTEGER NOT NULL, '
+                'count INTEGER NOT NULL, previous INTEGER NOT NULL, touched REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_rate_limits_touched ON rate_limits (touched)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def consume(self, rules, now):
+        connection = self._connect()
+        keys = [key for key, _, _ in rules]
+        # BEGIN IMMEDIATE serializa leitura e escrita entre os workers
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                f"SELECT key, window_id, count, previous FROM rate_limits "
+                f"WHERE key IN ({','.join('?' * len(keys))})",
+                keys
+            ).fetchall()
+            states = {row[0]: list(row[1:]) for row in rows}
+            allowed, updated, retry_after = _evaluate(states, rules, now)
+            connection.executemany(
+                'INSERT INTO rate_limits (key, window_id, count, previous, touched) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET window_id = excluded.window_id, count = excluded.count, '
+                'previous = excluded.previous, touched = excluded.touched',
+                [(key, *state, now) for key, state in updated.items()]
+            )
+            self._calls += 1
+            if self._calls % self.PURGE_EVERY == 0:
+                self._purge(connection, now)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def _purge(self, connection, now):
+        """Remover chaves ociosas e, acima do limite, as menos usadas"""
+        connection.execute('DELETE FROM rate_limits WHERE touched < ?', (now - self.idle_seconds,))
+        excess = connection.execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0] - self.max_keys
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM rate_limits WHERE key IN '
+                '(SELECT key FROM rate_limits ORDER BY touched LIMIT ?)',
+                (excess,)
+            )
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+    def reset(self):
+        self._connect().execute('DELETE FROM rate_limits')
+
+
+class RateLimiter:
+    """Fachada sobre o backend escolhido"""
+
+    def __init__(self, backend, clock=time.time):
+        self.backend = backend
+        self.clock = clock
+
+    def hit(self, key, limit, window):
+        """Registrar uma requisição; retorna True se estiver dentro do limite"""
+        allowed, _ = self.backend.consume([(key, limit, window)], self.clock())
+        return allowed
+
+    def hit_many(self, rules):
+        """Registrar uma requisição em várias regras (tudo ou nada); retorna (permitido, retry_after)"""
+        return self.backend.consume(rules, self.clock())
+
+
+def create_backend():
+    """Criar o backend configurado por variáveis de ambiente"""
+    max_keys = int(os.getenv('RATE_LIMIT_MAX_KEYS', 10000))
+    if os.getenv('RATE_LIMIT_BACKEND', 'memory').lower() == 'sqlite':
+        path = os.getenv('RATE_LIMIT_SQLITE_PATH', os.path.join(os.getcwd(), 'instance', 'rate_limits.db'))
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return SQLiteBackend(path, max_keys=max_keys)
+    return MemoryBackend(max_keys=max_keys)
+
+
+rate_limiter = RateLimiter(create_backend())
+
+
+def client_ip():
+    """IP do cliente: remote_addr, já corrigido pelo ProxyFix quando há proxy confiável"""
+    return request.remote_addr or 'unknown'
+
+
+def init_rate_limiting(app, limiter=None):
+    """Aplicar os limites por minuto/hora de Config.get_rate_limit_config() a todas as rotas /api/"""
+    from src.config import Config
+
+    limiter = limiter or rate_limiter
+
+    @app.before_request
+    def enforce_rate_limit():
+        path = request.path
+        if not path.startswith(PROTECTED_PREFIX) or path in EXEMPT_PATHS or request.method == 'OPTIONS':
+            return None
+
+        config = Config.get_rate_limit_config()
+        if not config['enabled']:
+            return None
+
+        ip = client_ip()
+        allowed, retry_after = limiter.hit_many([
+            (f'{ip}:minute', int(config['requests_per_minute']), 60),
+            (f'{ip}:hour', int(config['requests_per_hour']), 3600),
+        ])
+        if not allowed:
+            response = jsonify({'error': 'Limite de requisições excedido. Tente novamente mais tarde.'})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+        return None
+
+    return limiter
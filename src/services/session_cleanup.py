@@ -0,0 +1,194 @@
+"""
+Limpeza de sessões anônimas inativas em lotes
+Cada lote é um DELETE ... WHERE id IN (SELECT id ... LIMIT n) com commit
+próprio e uma pausa curta em seguida, para não segurar o lock do SQLite.
+Depois das sessões, remove as linhas que ficaram órfãs (rodadas, transações,
+sessões de jogo, agregados e jobs de pagamento já encerrados). O ledger de
+saldo (ledger_entries, balance_snapshots) é append-only e nunca é removido.
+
+Sessões com saldo positivo ou com pagamento em andamento nunca são removidas.
+
+Configuração por ambiente:
+SESSION_CLEANUP_DAYS, SESSION_CLEANUP_CHUNK_SIZE, SESSION_CLEANUP_PAUSE_SECONDS,
+SESSION_CLEANUP_INTERVAL_SECONDS (0 desliga o agendamento)
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, exists, or_, select
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import GameRound, GameSession, SessionTotals, Transaction
+from src.models.payment_job import PaymentJob
+
+INACTIVE_DAYS = int(os.getenv('SESSION_CLEANUP_DAYS', 30))
+CHUNK_SIZE = int(os.getenv('SESSION_CLEANUP_CHUNK_SIZE', 1000))
+PAUSE_SECONDS = float(os.getenv('SESSION_CLEANUP_PAUSE_SECONDS', 0.05))
+
+# Pagamentos que ainda podem creditar a sessão
+OPEN_PAYMENT_STATUSES = ('pending', 'processing')
+
+
+def _session_alive(anon_id_column):
+    return exists().where(AnonymousSession.anon_id == anon_id_column)
+
+
+def _orphan(anon_id_column):
+    """Linha de uma sessão anônima que não existe mais"""
+    return and_(anon_id_column.isnot(None), ~_session_alive(anon_id_column))
+
+
+def stale_sessions_condition(cutoff):
+    """Sessões inativas, sem saldo e sem pagamento em andamento"""
+    return and_(
+        AnonymousSession.last_activity < cutoff,
+        or_(AnonymousSession.balance_cents.is_(None), AnonymousSession.balance_cents <= 0),
+        ~exists().where(
+            Transaction.anon_id == AnonymousSession.anon_id,
+            Transaction.status.in_(OPEN_PAYMENT_STATUSES)
+        )
+    )
+
+
+def cleanup_phases(cutoff):
+    """Fases da limpeza, em ordem: (nome, modelo, coluna id, condição)"""
+    orphan_game_sessions = select(GameSession.id).where(_orphan(GameSession.anon_id))
+    return [
+        ('sessions', AnonymousSession, AnonymousSession.id, stale_sessions_condition(cutoff)),
+        ('game_rounds', GameRound, GameRound.id, or_(
+            GameRound.session_id.in_(orphan_game_sessions),
+            ~exists().where(GameSession.id == GameRound.session_id)
+        )),
+        ('payment_jobs', PaymentJob, PaymentJob.id, and_(
+            PaymentJob.status.in_(('succeeded', 'failed')),
+            PaymentJob.transaction_id.in_(select(Transaction.id).where(_orphan(Transaction.anon_id)))
+        )),
+        ('transactions', Transaction, Transaction.id, _orphan(Transaction.anon_id)),
+        ('game_sessions', GameSession, GameSession.id, _orphan(GameSession.anon_id)),
+        ('session_totals', SessionTotals, SessionTotals.anon_id, ~_session_alive(SessionTotals.anon_id)),
+    ]
+
+
+def delete_chunk(model, id_column, condition, chunk_size):
+    """Remover até chunk_size linhas com um único DELETE e commit; retorna quantas"""
+    ids = select(id_column).where(condition).limit(chunk_size).scalar_subquery()
+    try:
+        result = db.session.execute(
+            delete(model).where(id_column.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result.rowcount
+
+
+class SessionSweeper:
+    """Executa a limpeza e guarda o progresso para /api/admin/stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+        self.progress = {
+            'state': 'idle',
+            'phase': None,
+            'deleted': {},
+            'chunks': 0,
+            'started_at': None,
+            'finished_at': None,
+            'duration_seconds': None,
+            'runs': 0,
+            'last_error': None
+        }
+
+    @property
+    def running(self):
+        return self._running
+
+    def run(self, days=None, chunk_size=None, pause=None):
+        """Executar uma limpeza completa; retorna o total removido por tabela (ou None se já estiver rodando)"""
+        with self._lock:
+            if self._running:
+                return None
+            self._running = True
+
+        days = INACTIVE_DAYS if days is None else days
+        chunk_size = chunk_size or CHUNK_SIZE
+        pause = PAUSE_SECONDS if pause is None else pause
+        started = time.perf_counter()
+        deleted = {}
+        self.progress.update({
+            'state': 'running', 'phase': None, 'deleted': deleted, 'chunks': 0,
+            'started_at': datetime.utcnow().isoformat(), 'finished_at': None,
+            'duration_seconds': None, 'last_error': None
+        })
+
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            for phase, model, id_column, condition in cleanup_phases(cutoff):
+                self.progress['phase'] = phase
+                deleted[phase] = 0
+                while True:
+                    count = delete_chunk(model, id_column, condition, chunk_size)
+                    deleted[phase] += count
+                    self.progress['chunks'] += 1
+                    if count < chunk_size:
+                        break
+                    # Liberar o banco para as requisições entre um lote e outro
+                    time.sleep(pause)
+            self.progress['state'] = 'idle'
+            return dict(deleted)
+        except Exception as e:
+            self.progress.update({'state': 'failed', 'last_error': str(e)})
+            raise
+        finally:
+            self.progress.update({
+                'phase': None,
+                'finished_at': datetime.utcnow().isoformat(),
+                'duration_seconds': round(time.perf_counter() - started, 3),
+                'runs': self.progress['runs'] + 1
+            })
+            self._running = False
+
+    def start_background(self, app, **kwargs):
+        """Executar uma limpeza numa thread; retorna False se já houver uma em andamento"""
+        if self._running:
+            return False
+
+        def target():
+            with app.app_context():
+                try:
+                    self.run(**kwargs)
+                except Exception as e:
+                    print(f'Erro na limpeza de sessões: {e}')
+                finally:
+                    db.session.remove()
+
+        threading.Thread(target=target, name='session-cleanup', daemon=True).start()
+        return True
+
+    def get_stats(self):
+        return {**self.progress, 'deleted': dict(self.progress['deleted'])}
+
+
+session_sweeper = SessionSweeper()
+
+
+def schedule_session_cleanup(app, interval=None):
+    """Agendar a limpeza periódica (SESSION_CLEANUP_INTERVAL_SECONDS=0 desliga)"""
+    interval = interval if interval is not None else float(os.getenv('SESSION_CLEANUP_INTERVAL_SECONDS', 6 * 3600))
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            session_sweeper.start_background(app)
+
+    thread = threading.Thread(target=loop, name='session-cleanup-scheduler', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,193 @@
+"""
+Cache em memória das configurações do cassino
+Mantém um snapshot tipado de casino_settings por processo e o revalida
+através de uma linha de versão, incrementada a cada Config.set_setting
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional, Tuple
+
+from src.database import db, upsert_insert
+from src.models.casino import CasinoSettings
+
+# Linha especial em casino_settings que guarda a versão das configurações
+SETTINGS_VERSION_KEY = '_settings_version'
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Snapshot imutável das configurações já convertidas para o tipo certo"""
+    version: int
+    values: Mapping[str, Any]
+    loaded_at: float
+    # Subconjunto com is_public (exposto em /api/config)
+    public: Mapping[str, Any] = field(default_factory=dict)
+
+
+def read_settings_version() -> int:
+    """Ler a versão atual das configurações (consulta pelo índice único)"""
+    value = db.session.query(CasinoSettings.setting_value).filter_by(
+        setting_key=SETTINGS_VERSION_KEY
+    ).scalar()
+    try:
+        return int(value or 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def bump_settings_version():
+    """
+    Incrementar a versão das configurações na transação corrente
+    Upsert pela chave única: as primeiras alterações concorrentes não colidem
+    """
+    row = {
+        'setting_key': SETTINGS_VERSION_KEY,
+        'setting_value': '1',
+        'setting_type': 'number',
+        'description': 'Versão das configurações (controle de cache)',
+        'category': 'system'
+    }
+    next_version = db.cast(db.cast(CasinoSettings.setting_value, db.Integer) + 1, db.Text)
+
+    stmt = upsert_insert(CasinoSettings)
+    if stmt is not None:
+        db.session.execute(stmt.values(row).on_conflict_do_update(
+            index_elements=['setting_key'],
+            set_={'setting_value': next_version}
+        ))
+        return
+
+    # Outros bancos: UPDATE e, se não houver linha, INSERT
+    updated = CasinoSettings.query.filter_by(setting_key=SETTINGS_VERSION_KEY).update(
+        {CasinoSettings.setting_value: next_version},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.add(CasinoSettings(**row))
+
+
+class SettingsCache:
+    """Snapshot de configurações com verificação de versão em intervalo limitado"""
+
+    def __init__(self, check_interval: Optional[float] = None):
+        if check_interval is None:
+            check_interval = float(os.getenv('SETTINGS_CACHE_CHECK_INTERVAL', 5))
+        # Atraso máximo para enxergar alterações feitas por outros workers
+        self.check_interval = check_interval
+        self._snapshot: Optional[SettingsSnapshot] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        # (snapshot, corpo JSON, ETag) do último payload serializado
+        self._serialized = None
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.version_checks = 0
+        self.serializations = 0
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        """Obter (encontrado, valor) do snapshot, recarregando se necessário"""
+        snapshot = self._current_snapshot()
+        if key in snapshot.values:
+            self.hits += 1
+            return True, snapshot.values[key]
+        self.misses += 1
+        return False, None
+
+    def snapshot(self) -> SettingsSnapshot:
+        """Obter o snapshot atual"""
+        return self._current_snapshot()
+
+    def serialized(self, build: Callable[[SettingsSnapshot], Any]) -> Tuple[bytes, str]:
+        """
+        Obter (corpo JSON, ETag forte) de build(snapshot); o JSON só é gerado
+        de novo quando o snapshot muda (versão das configurações incrementada)
+        """
+        snapshot = self._current_snapshot()
+        cached = self._serialized
+        if cached is not None and cached[0] is snapshot:
+            return cached[1], cached[2]
+
+        body = json.dumps(build(snapshot), sort_keys=True, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        self._serialized = (snapshot, body, etag)
+        self.serializations += 1
+        return body, etag
+
+    def invalidate(self):
+        """Descartar o snapshot local (próxima leitura recarrega do banco)"""
+        with self._lock:
+            self._snapshot = None
+            self._next_check = 0.0
+
+    def get_stats(self) -> dict:
+        """Obter contadores do cache"""
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'version_checks': self.version_checks,
+            'db_reads': self.refreshes + self.version_checks,
+            'serializations': self.serializations,
+            'version': snapshot.version if snapshot else None,
+            'size': len(snapshot.values) if snapshot else 0,
+            'check_interval': self.check_interval
+        }
+
+    def _current_snapshot(self) -> SettingsSnapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now < self._next_check:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now < self._next_check:
+                return snapshot
+
+            if snapshot is not None:
+                # Verificação barata: só recarrega se a versão mudou
+                self.version_checks += 1
+                if read_settings_version() == snapshot.version:
+                    self._next_check = now + self.check_interval
+                    return snapshot
+
+            snapshot = self._load()
+            self._snapshot = snapshot
+            self._next_check = now + self.check_interval
+            return snapshot
+
+    def _load(self) -> SettingsSnapshot:
+        self.refreshes += 1
+        values = {}
+        public = {}
+        version = 0
+        for setting in CasinoSettings.query.all():
+            if setting.setting_key == SETTINGS_VERSION_KEY:
+                try:
+                    version = int(setting.setting_value or 0)
+                except (ValueError, TypeError):
+                    version = 0
+                continue
+            values[setting.setting_key] = setting.get_value()
+            if setting.is_public:
+                public[setting.setting_key] = values[setting.setting_key]
+        return SettingsSnapshot(
+            version=version,
+            values=MappingProxyType(values),
+            loaded_at=time.time(),
+            public=MappingProxyType(public)
+        )
+
+
+# Instância global (uma por processo/worker)
+settings_cache = SettingsCache()
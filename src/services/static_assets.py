@@ -0,0 +1,183 @@
+"""
+Manifesto dos arquivos estáticos
+Montado uma vez no boot: para cada arquivo de src/static guarda tamanho, hash
+do conteúdo e as variantes gzip/brotli já comprimidas. Uma requisição vira
+uma consulta no dicionário, com ETag forte, 304 e a codificação escolhida
+pelo Accept-Encoding.
+
+O index.html é servido com os links de src/static/ reescritos para URLs com
+hash (css/style.<hash>.css), que podem ser cacheadas como immutable.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só há variante gzip
+    brotli = None
+
+STATIC_PREFIX = 'src/static/'
+
+# Tipos que valem a pena comprimir
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+                      'image/vnd.microsoft.icon')
+MIN_COMPRESS_SIZE = 512
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+_STATIC_LINK = re.compile(r'((?:src|href)=")(' + re.escape(STATIC_PREFIX) + r'[^"?#]+)(")')
+
+
+@dataclass
+class Asset:
+    """Arquivo pronto para servir: conteúdo original e variantes comprimidas"""
+    content_type: str
+    body: bytes
+    digest: str
+    variants: Dict[str, bytes] = field(default_factory=dict)
+    immutable: bool = False
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    @property
+    def etag(self):
+        return self.digest[:20]
+
+
+def _content_type(path):
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type == 'application/javascript':
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _build_asset(path, body, immutable=False):
+    content_type = _content_type(path)
+    asset = Asset(content_type, body, hashlib.sha256(body).hexdigest(), immutable=immutable)
+    if len(body) >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES):
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            asset.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                asset.variants['br'] = compressed
+    return asset
+
+
+def hashed_name(relative_path, digest):
+    """css/style.css -> css/style.<hash>.css"""
+    base, extension = os.path.splitext(relative_path)
+    return f'{base}.{digest[:10]}{extension}'
+
+
+def parse_accept_encoding(header):
+    """Codificações aceitas com q > 0"""
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class AssetManifest:
+    """URL -> Asset para src/static e index.html"""
+
+    def __init__(self, static_folder, index_path=None):
+        self.static_folder = static_folder
+        self.index_path = index_path
+        self.assets: Dict[str, Asset] = {}
+        self.index: Optional[Asset] = None
+
+    def build(self):
+        """Ler e comprimir todos os arquivos; retorna o próprio manifesto"""
+        assets = {}
+        hashed_urls = {}
+        for directory, _, files in os.walk(self.static_folder):
+            for filename in files:
+                full_path = os.path.join(directory, filename)
+                relative = os.path.relpath(full_path, self.static_folder).replace(os.sep, '/')
+                with open(full_path, 'rb') as handle:
+                    body = handle.read()
+                asset = _build_asset(relative, body)
+                # Mesmo arquivo por src/static/..., pela raiz e pela URL com hash
+                assets[STATIC_PREFIX + relative] = asset
+                assets[relative] = asset
+                hashed = hashed_name(relative, asset.digest)
+                assets[STATIC_PREFIX + hashed] = replace(asset, immutable=True)
+                hashed_urls[STATIC_PREFIX + relative] = STATIC_PREFIX + hashed
+
+        index = None
+        if self.index_path and os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as handle:
+                html = handle.read().decode('utf-8')
+            html = _STATIC_LINK.sub(lambda m: m.group(1) + hashed_urls.get(m.group(2), m.group(2)) + m.group(3), html)
+            index = _build_asset('index.html', html.encode('utf-8'))
+
+        self.assets, self.index = assets, index
+        return self
+
+    def lookup(self, path):
+        """Asset da URL (None se não existir); '' e index.html retornam o index"""
+        if path in ('', 'index.html'):
+            return self.index
+        return self.assets.get(path)
+
+    def respond(self, asset, request):
+        """Resposta com ETag/304, Cache-Control e a melhor codificação aceita"""
+        cache_control = IMMUTABLE if asset.immutable else REVALIDATE
+        tags = {f'"{asset.etag}"', f'"{asset.etag}-gz"', f'"{asset.etag}-br"', f'W/"{asset.etag}"'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match.strip() == '*' or tags & {tag.strip() for tag in if_none_match.split(',')}:
+            response = Response(status=304)
+            response.headers['ETag'] = f'"{asset.etag}"'
+            response.headers['Cache-Control'] = cache_control
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+
+        accepted = parse_accept_encoding(request.headers.get('Accept-Encoding'))
+        body, encoding, etag = asset.body, None, asset.etag
+        if 'br' in asset.variants and 'br' in accepted:
+            body, encoding, etag = asset.variants['br'], 'br', f'{asset.etag}-br'
+        elif 'gzip' in asset.variants and 'gzip' in accepted:
+            body, encoding, etag = asset.variants['gzip'], 'gzip', f'{asset.etag}-gz'
+
+        response = Response(body, content_type=asset.content_type)
+        response.headers['ETag'] = f'"{etag}"'
+        response.headers['Cache-Control'] = cache_control
+        if asset.variants:
+            response.headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def get_stats(self):
+        unique = {id(asset): asset for asset in self.assets.values()}.values()
+        return {
+            'urls': len(self.assets),
+            'files': len({asset.digest for asset in unique}),
+            'bytes': sum(asset.size for asset in unique if not asset.immutable),
+            'gzip_bytes': sum(len(asset.variants.get('gzip', asset.body)) for asset in unique if not asset.immutable),
+            'brotli': brotli is not None
+        }
@@ -0,0 +1,223 @@
+"""
+Contadores diários das estatísticas do admin (stats_rollups)
+As escritas do ledger e das rodadas somam seus valores aqui na mesma
+transação do banco, com um upsert por (dia, dimensão, chave). A leitura soma
+apenas as linhas do rollup (dias x chaves), sem varrer o ledger.
+Somas em centavos; get_admin_stats responde em reais.
+
+Dimensões:
+- transaction: por tipo de transação (contagem e soma de amount_cents)
+- game_session: sessões de jogo criadas por tipo de jogo
+- game_round: rodadas por tipo de jogo (contagem e soma das apostas)
+- game_payout: rodadas com pagamento por tipo de jogo (contagem e soma)
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, or_, select
+
+from src.database import db, upsert_insert
+from src.models.casino import GameRound, GameSession, StatsRollup, Transaction
+from src.services.money import to_reais
+from src.services.transaction_archive import archived_until
+
+# Respostas de get_admin_stats ficam em cache por alguns segundos
+CACHE_SECONDS = float(os.getenv('STATS_CACHE_SECONDS', 5))
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Fora do volume total: a taxa de depósito já está no valor bruto do depósito
+VOLUME_EXCLUDED_TYPES = ('fee',)
+
+
+def increment_stats(increments):
+    """
+    Somar {(dia, dimensão, chave): (contagem, total em centavos)} ao rollup (sem commit)
+    Usa INSERT ... ON CONFLICT DO UPDATE quando o banco suporta
+    """
+    if not increments:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {'day': day, 'dimension': dimension, 'key': key, 'count': count, 'total_cents': total, 'updated_at': now}
+        for (day, dimension, key), (count, total) in increments.items()
+    ]
+
+    stmt = upsert_insert(StatsRollup)
+    if stmt is not None:
+        stmt = stmt.values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'dimension', 'key'],
+            set_={
+                'count': StatsRollup.count + stmt.excluded.count,
+                'total_cents': StatsRollup.total_cents + stmt.excluded.total_cents,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    # Outros bancos: UPDATE e, se não houver linha, INSERT
+    for row in rows:
+        updated = StatsRollup.query.filter_by(day=row['day'], dimension=row['dimension'], key=row['key']).update({
+            StatsRollup.count: StatsRollup.count + row['count'],
+            StatsRollup.total_cents: StatsRollup.total_cents + row['total_cents'],
+            StatsRollup.updated_at: now
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(StatsRollup(**row))
+
+
+def transaction_increments(rows, day=None):
+    """Incrementos da dimensão transaction para linhas (tipo, centavos)"""
+    day = day or datetime.utcnow().date()
+    increments = {}
+    for transaction_type, amount in rows:
+        key = (day, 'transaction', transaction_type)
+        count, total = increments.get(key, (0, 0))
+        increments[key] = (count + 1, total + amount)
+    return increments
+
+
+def record_game_stats(game_type, sessions=0, rounds=0, bet=0, payouts=0, payout=0, day=None):
+    """Somar sessões, rodadas e pagamentos (centavos) de um jogo ao rollup (sem commit)"""
+    day = day or datetime.utcnow().date()
+    increments = {}
+    if sessions:
+        increments[(day, 'game_session', game_type)] = (sessions, 0)
+    if rounds:
+        increments[(day, 'game_round', game_type)] = (rounds, bet)
+    if payouts:
+        increments[(day, 'game_payout', game_type)] = (payouts, payout)
+    increment_stats(increments)
+
+
+def rebuild_stats_rollups():
+    """Recalcular stats_rollups a partir do ledger e das rodadas (exceto meses arquivados do ledger)"""
+    columns = ['day', 'dimension', 'key', 'count', 'total_cents', 'updated_at']
+    now = datetime.utcnow()
+    round_day = func.date(func.coalesce(GameRound.completed_at, GameRound.started_at))
+
+    queries = [
+        select(func.date(Transaction.created_at), db.literal('transaction'), Transaction.transaction_type,
+               func.count(), func.coalesce(func.sum(Transaction.amount_cents), 0), db.literal(now))
+        .where(Transaction.created_at.isnot(None))
+        .group_by(func.date(Transaction.created_at), Transaction.transaction_type),
+
+        select(func.date(GameSession.start_time), db.literal('game_session'), GameSession.game_type,
+               func.count(), db.literal(0), db.literal(now))
+        .where(GameSession.start_time.isnot(None))
+        .group_by(func.date(GameSession.start_time), GameSession.game_type),
+
+        select(round_day, db.literal('game_round'), GameSession.game_type,
+               func.count(), func.coalesce(func.sum(GameRound.bet_amount_cents), 0), db.literal(now))
+        .join(GameSession, GameSession.id == GameRound.session_id)
+        .where(round_day.isnot(None))
+        .group_by(round_day, GameSession.game_type),
+
+        select(round_day, db.literal('game_payout'), GameSession.game_type,
+               func.count(), func.coalesce(func.sum(GameRound.win_amount_cents), 0), db.literal(now))
+        .join(GameSession, GameSession.id == GameRound.session_id)
+        .where(round_day.isnot(None), GameRound.win_amount_cents > 0)
+        .group_by(round_day, GameSession.game_type),
+    ]
+
+    rebuilt = delete(StatsRollup)
+    # Dias de meses arquivados mantêm a dimensão transaction como está
+    boundary = archived_until()
+    if boundary is not None:
+        queries[0] = queries[0].where(Transaction.created_at >= boundary)
+        rebuilt = rebuilt.where(or_(StatsRollup.dimension != 'transaction', StatsRollup.day >= boundary.date()))
+
+    try:
+        db.session.execute(rebuilt)
+        for query in queries:
+            db.session.execute(insert(StatsRollup).from_select(columns, query))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_cache()
+    return db.session.query(func.count()).select_from(StatsRollup).scalar()
+
+
+def backfill_stats_rollups():
+    """Preencher o rollup na primeira execução em um banco que já tem transações"""
+    if db.session.query(StatsRollup.day).first() is not None:
+        return 0
+    if db.session.query(Transaction.id).first() is None and db.session.query(GameSession.id).first() is None:
+        return 0
+    return rebuild_stats_rollups()
+
+
+def invalidate_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _day_key(day):
+    return day.isoformat() if hasattr(day, 'isoformat') else str(day)
+
+
+def get_admin_stats(days=30):
+    """Totais gerais, por tipo de transação, por jogo e por dia (últimos `days` dias)"""
+    with _cache_lock:
+        cached = _cache.get(days)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+    totals = db.session.query(
+        StatsRollup.dimension, StatsRollup.key,
+        func.sum(StatsRollup.count), func.sum(StatsRollup.total_cents)
+    ).group_by(StatsRollup.dimension, StatsRollup.key).all()
+
+    by_transaction_type = {}
+    by_game_type = {}
+    game_fields = {
+        'game_session': ('sessions', None),
+        'game_round': ('rounds', 'total_bet'),
+        'game_payout': ('winning_rounds', 'total_payout'),
+    }
+    for dimension, key, count, total in totals:
+        if dimension == 'transaction':
+            by_transaction_type[key] = {'count': int(count or 0), 'total': to_reais(int(total or 0))}
+        elif dimension in game_fields:
+            count_field, total_field = game_fields[dimension]
+            game = by_game_type.setdefault(key, {
+                'sessions': 0, 'rounds': 0, 'total_bet': 0.0, 'winning_rounds': 0, 'total_payout': 0.0
+            })
+            game[count_field] = int(count or 0)
+            if total_field:
+                game[total_field] = to_reais(int(total or 0))
+
+    by_day = {}
+    since = datetime.utcnow().date() - timedelta(days=max(days - 1, 0))
+    daily = StatsRollup.query.filter(StatsRollup.day >= since)\
+        .order_by(StatsRollup.day.desc(), StatsRollup.dimension, StatsRollup.key).all()
+    for row in daily:
+        day = by_day.setdefault(_day_key(row.day), {'transactions': {}, 'games': {}})
+        if row.dimension == 'transaction':
+            day['transactions'][row.key] = {'count': row.count, 'total': to_reais(row.total_cents)}
+        else:
+            day['games'].setdefault(row.key, {})[row.dimension] = {'count': row.count, 'total': to_reais(row.total_cents)}
+
+    stats = {
+        'total_transactions': sum(t['count'] for t in by_transaction_type.values()),
+        'total_volume': to_reais(sum(
+            int(total or 0) for dimension, key, _, total in totals
+            if dimension == 'transaction' and key not in VOLUME_EXCLUDED_TYPES
+        )),
+        'total_game_sessions': sum(g['sessions'] for g in by_game_type.values()),
+        'by_transaction_type': by_transaction_type,
+        'by_game_type': by_game_type,
+        'by_day': [{'day': day, **values} for day, values in by_day.items()]
+    }
+
+    with _cache_lock:
+        _cache[days] = (time.monotonic() + CACHE_SECONDS, stats)
+    return stats
@@ -0,0 +1,108 @@
+"""
+Cache curto do status de pagamentos no gateway, com single-flight
+O frontend consulta /api/payments/status a cada poucos segundos enquanto o
+QR Code PIX está aberto. As respostas do gateway ficam em cache por
+external_transaction_id durante PAYMENT_STATUS_CACHE_TTL segundos e consultas
+simultâneas do mesmo ID esperam uma única chamada em andamento.
+
+O webhook invalida a entrada do processo que o recebe; nos demais processos
+a transação já aparece concluída no banco, e a rota nem consulta o cache.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """Chamada ao gateway em andamento para um ID"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.stale = False
+
+
+class GatewayStatusCache:
+    """Cache LRU com TTL e coalescência de chamadas concorrentes"""
+
+    def __init__(self, ttl=None, error_ttl=None, max_entries=10000, wait_timeout=30, clock=time.monotonic):
+        self.ttl = ttl if ttl is not None else float(os.getenv('PAYMENT_STATUS_CACHE_TTL', 5))
+        # Falhas ficam pouco tempo, só para não martelar um gateway fora do ar
+        self.error_ttl = error_ttl if error_ttl is not None else float(os.getenv('PAYMENT_STATUS_ERROR_TTL', 1))
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'invalidations': 0}
+
+    def lookup(self, external_id, loader):
+        """
+        Obter o status do gateway para o ID, chamando loader(external_id) no máximo
+        uma vez por vez. Retorna (resultado, compartilhado), onde compartilhado
+        indica que o resultado veio do cache ou da chamada de outra requisição
+        """
+        with self._lock:
+            entry = self._entries.get(external_id)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(external_id)
+                self._stats['hits'] += 1
+                return entry[1], True
+
+            flight = self._flights.get(external_id)
+            leader = flight is None
+            if leader:
+                flight = self._flights[external_id] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            if flight.event.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result, True
+            # A chamada líder travou: seguir sozinho
+            return loader(external_id), False
+
+        try:
+            flight.result = loader(external_id)
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and not flight.stale:
+                    ttl = self.ttl if flight.result.get('success') else self.error_ttl
+                    self._entries[external_id] = (self.clock() + ttl, flight.result)
+                    self._entries.move_to_end(external_id)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._flights[external_id]
+            flight.event.set()
+
+    def invalidate(self, external_id):
+        """Descartar o status em cache (e o da chamada em andamento, se houver)"""
+        with self._lock:
+            self._entries.pop(external_id, None)
+            flight = self._flights.get(external_id)
+            if flight is not None:
+                flight.stale = True
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'in_flight': len(self._flights), 'ttl': self.ttl}
+
+
+# Instância global do processo
+gateway_status_cache = GatewayStatusCache()
@@ -0,0 +1,376 @@
+"""
+Particionamento mensal do ledger com arquivo frio
+A tabela transactions guarda só os meses recentes (partição quente, onde
+todas as escritas acontecem). Meses fechados são copiados para um SQLite
+próprio por mês, comprimido com gzip (transactions_AAAA_MM.db.gz), registrados
+em transaction_archives e removidos da tabela quente em lotes.
+
+Leituras de histórico só abrem os arquivos dos meses dentro do intervalo
+pedido; saldos e estatísticas já vêm dos agregados (session_totals,
+player_daily_totals, stats_rollups) e não dependem das linhas arquivadas.
+
+Configuração por ambiente:
+TRANSACTION_ARCHIVE_DIR (padrão: instance/archive), TRANSACTION_HOT_MONTHS,
+TRANSACTION_ARCHIVE_CHUNK_SIZE
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, create_engine, delete, func, or_, select
+
+from src.database import db
+from src.models.casino import Transaction
+from src.models.payment_job import PaymentJob
+from src.models.transaction_archive import TransactionArchive
+from src.services.money_migration import migrate_money
+from src.services.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+# Meses mantidos na tabela quente, contando o atual
+HOT_MONTHS = int(os.getenv('TRANSACTION_HOT_MONTHS', 3))
+CHUNK_SIZE = int(os.getenv('TRANSACTION_ARCHIVE_CHUNK_SIZE', 1000))
+
+# Depósitos enviados ao gateway e ainda sem resposta final: só eles mudam de
+# status depois de gravados (saques pendentes não têm transição e não seguram o mês)
+PENDING_DEPOSIT_STATUSES = ('pending', 'processing')
+
+_engines = {}
+_engines_lock = threading.Lock()
+# Cópias descomprimidas já conferidas quanto às colunas em centavos
+_upgraded = set()
+
+
+def archive_dir():
+    path = os.getenv('TRANSACTION_ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def month_key(when):
+    return f'{when.year:04d}-{when.month:02d}'
+
+
+def month_bounds(month):
+    """Início do mês e início do mês seguinte para 'AAAA-MM'"""
+    year, number = (int(part) for part in month.split('-'))
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def hot_cutoff(now=None, hot_months=None):
+    """Primeiro instante da partição quente: meses anteriores podem ser arquivados"""
+    now = now or datetime.utcnow()
+    hot_months = HOT_MONTHS if hot_months is None else hot_months
+    index = now.year * 12 + now.month - 1 - max(hot_months - 1, 0)
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def closed_months(now=None, hot_months=None):
+    """Meses fechados com transações na tabela quente, do mais antigo ao mais recente"""
+    cutoff = hot_cutoff(now, hot_months)
+    months = []
+    oldest = db.session.query(func.min(Transaction.created_at))\
+        .filter(Transaction.created_at < cutoff).scalar()
+    while oldest is not None:
+        month = month_key(oldest)
+        months.append(month)
+        # Próximo mês com transações (pula meses vazios)
+        oldest = db.session.query(func.min(Transaction.created_at))\
+            .filter(Transaction.created_at >= month_bounds(month)[1], Transaction.created_at < cutoff).scalar()
+    return months
+
+
+def _month_condition(month):
+    start, end = month_bounds(month)
+    return and_(Transaction.created_at >= start, Transaction.created_at < end)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _copy_month(month, path, chunk_size):
+    """Copiar as transações do mês para um SQLite novo; retorna (linhas, soma em centavos, menor id, maior id)"""
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        Transaction.__table__.create(engine)
+        table = Transaction.__table__
+        rows, total, min_id, max_id, last_id = 0, 0, None, None, 0
+        while True:
+            chunk = db.session.execute(
+                select(table).where(_month_condition(month), Transaction.id > last_id)
+                .order_by(Transaction.id).limit(chunk_size)
+            ).mappings().all()
+            if not chunk:
+                break
+            with engine.begin() as conn:
+                conn.execute(table.insert(), [dict(row) for row in chunk])
+            rows += len(chunk)
+            total += sum(row['amount_cents'] for row in chunk)
+            min_id = chunk[0]['id'] if min_id is None else min_id
+            max_id = last_id = chunk[-1]['id']
+    finally:
+        engine.dispose()
+    return rows, total, min_id, max_id
+
+
+def purge_month(archive, chunk_size=None):
+    """Remover da tabela quente as linhas de um mês já arquivado, em lotes; retorna quantas"""
+    chunk_size = chunk_size or CHUNK_SIZE
+    condition = and_(_month_condition(archive.month), Transaction.id <= archive.max_id)
+    removed = 0
+    while True:
+        ids = db.session.scalars(select(Transaction.id).where(condition).limit(chunk_size)).all()
+        if not ids:
+            break
+        try:
+            db.session.execute(delete(PaymentJob).where(PaymentJob.transaction_id.in_(ids))
+                               .execution_options(synchronize_session=False))
+            db.session.execute(delete(Transaction).where(Transaction.id.in_(ids))
+                               .execution_options(synchronize_session=False))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        removed += len(ids)
+
+    archive.purged_at = datetime.utcnow()
+    db.session.commit()
+    return removed
+
+
+def archive_month(month, chunk_size=None):
+    """
+    Arquivar um mês fechado: copiar, comprimir, registrar e só então remover
+    da tabela quente. Retorna o registro do arquivo ou None se o mês ainda
+    tiver depósitos em aberto
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    archive = db.session.get(TransactionArchive, month)
+    if archive is None:
+        open_rows = db.session.query(Transaction.id).filter(
+            _month_condition(month),
+            Transaction.transaction_type == 'deposit',
+            Transaction.status.in_(PENDING_DEPOSIT_STATUSES)
+        ).first()
+        if open_rows is not None:
+            return None
+
+        filename = f'transactions_{month.replace("-", "_")}.db.gz'
+        target = os.path.join(archive_dir(), filename)
+        staging = target[:-len('.gz')] + '.tmp'
+        if os.path.exists(staging):
+            os.remove(staging)
+
+        rows, total, min_id, max_id = _copy_month(month, staging, chunk_size)
+        with open(staging, 'rb') as source, gzip.open(target + '.tmp', 'wb') as compressed:
+            shutil.copyfileobj(source, compressed)
+        os.replace(target + '.tmp', target)
+        os.remove(staging)
+
+        archive = TransactionArchive(
+            month=month, filename=filename, row_count=rows, total_amount_cents=total,
+            min_id=min_id, max_id=max_id, checksum=_file_sha256(target)
+        )
+        db.session.add(archive)
+        db.session.commit()
+
+    # Retomada: um mês registrado mas não removido termina de ser removido aqui
+    if archive.purged_at is None and archive.max_id is not None:
+        purge_month(archive, chunk_size)
+    return archive
+
+
+def archive_closed_months(now=None, hot_months=None, chunk_size=None):
+    """Arquivar todos os meses fechados; retorna {mês: linhas arquivadas ou 'open'}"""
+    result = {}
+    for month in closed_months(now, hot_months):
+        archive = archive_month(month, chunk_size)
+        result[month] = archive.row_count if archive else 'open'
+    return result
+
+
+def attach_archive(month):
+    """
+    Descomprimir o arquivo do mês (uma vez) e retornar o caminho do SQLite,
+    que pode ser aberto ou anexado (ATTACH DATABASE) para auditoria
+    Arquivos gravados antes da migração para centavos são convertidos na cópia
+    descomprimida (o .gz original e o checksum não mudam)
+    """
+    archive = db.session.get(TransactionArchive, month)
+    if archive is None:
+        raise LookupError(f'Mês {month} não está arquivado')
+
+    source = os.path.join(archive_dir(), archive.filename)
+    cache_dir = os.path.join(archive_dir(), 'attached')
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, archive.filename[:-len('.gz')])
+    if not os.path.exists(path):
+        if _file_sha256(source) != archive.checksum:
+            raise ValueError(f'Arquivo do mês {month} corrompido (checksum diferente)')
+        with gzip.open(source, 'rb') as compressed, open(path + '.tmp', 'wb') as target:
+            shutil.copyfileobj(compressed, target)
+        _upgrade_money(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        _upgraded.add(path)
+    elif path not in _upgraded:
+        # Cópia descomprimida por uma versão anterior
+        _upgrade_money(path)
+        _upgraded.add(path)
+    return path
+
+
+def _upgrade_money(path):
+    engine = create_engine(f'sqlite:///{path}')
+    try:
+        migrate_money(engine, tables=['transactions'])
+    finally:
+        engine.dispose()
+
+
+def _archive_engine(month):
+    path = attach_archive(month)
+    with _engines_lock:
+        engine = _engines.get(path)
+        if engine is None:
+            engine = _engines[path] = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true')
+        return engine
+
+
+def archived_months(start=None, end=None):
+    """Meses arquivados que cruzam [start, end), do mais recente ao mais antigo"""
+    months = [row.month for row in TransactionArchive.query.order_by(TransactionArchive.month.desc())]
+    return [
+        month for month in months
+        if (end is None or month_bounds(month)[0] < end) and (start is None or month_bounds(month)[1] > start)
+    ]
+
+
+def archived_until():
+    """Fim do mês arquivado mais recente (None se não houver arquivo)"""
+    newest = db.session.query(func.max(TransactionArchive.month)).scalar()
+    return month_bounds(newest)[1] if newest else None
+
+
+def aggregate_archives(query):
+    """Executar uma consulta agregada sobre a tabela transactions de cada mês arquivado"""
+    rows = []
+    for month in archived_months():
+        with _archive_engine(month).connect() as conn:
+            rows.extend(conn.execute(query).all())
+    return rows
+
+
+def query_archives(condition, start=None, end=None, limit=None, before=None):
+    """
+    Buscar transações arquivadas em ordem decrescente de (created_at, id),
+    abrindo só os meses dentro de [start, end); before=(created_at, id)
+    continua depois de um cursor. Retorna objetos Transaction desanexados
+    """
+    items = []
+    months_end = end
+    if before is not None:
+        # O mês do cursor também entra
+        cursor_end = before[0] + timedelta(microseconds=1)
+        months_end = min(end, cursor_end) if end else cursor_end
+
+    for month in archived_months(start, months_end):
+        query = select(Transaction.__table__).where(condition)
+        if start is not None:
+            query = query.where(Transaction.created_at >= start)
+        if end is not None:
+            query = query.where(Transaction.created_at < end)
+        if before is not None:
+            query = query.where(or_(
+                Transaction.created_at < before[0],
+                and_(Transaction.created_at == before[0], Transaction.id < before[1])
+            ))
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        if limit is not None:
+            query = query.limit(limit - len(items))
+
+        with _archive_engine(month).connect() as conn:
+            items.extend(Transaction(**dict(row)) for row in conn.execute(query).mappings())
+        if limit is not None and len(items) >= limit:
+            break
+    return items
+
+
+def paginate_transactions(query, condition, cursor=None, per_page=20, since=None):
+    """
+    Página do histórico (ordem decrescente) cobrindo a tabela quente e os meses
+    arquivados. Os arquivos só são abertos quando a página pode alcançá-los:
+    histórico recente continua sendo uma única consulta na tabela quente
+    Retorna (itens, next_cursor)
+    """
+    if since is not None:
+        query = query.filter(Transaction.created_at >= since)
+    items, next_cursor = keyset_paginate(
+        query, Transaction.created_at, Transaction.id, cursor=cursor, per_page=per_page
+    )
+
+    boundary = archived_until()
+    if boundary is None or (next_cursor and items[-1].created_at >= boundary):
+        return items, next_cursor
+    if since is not None and since >= boundary:
+        return items, next_cursor
+
+    before = decode_cursor(cursor) if cursor else None
+    archived = query_archives(condition, start=since, limit=per_page + 1, before=before)
+    merged = sorted(items + archived, key=lambda t: (t.created_at, t.id), reverse=True)
+    items = merged[:per_page]
+    if next_cursor or len(merged) > per_page:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return items, next_cursor
+
+
+def page_transactions(query, condition, page=1, per_page=20, include_total=True):
+    """
+    Página numerada do histórico (ordem decrescente) cobrindo a tabela quente
+    e os meses arquivados. Enquanto a página cabe nos meses quentes é um
+    único OFFSET na tabela quente; depois, as duas fontes são intercaladas
+    Retorna (itens, total); total é None se include_total for falso
+    """
+    offset = (max(page, 1) - 1) * per_page
+    ordered = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    items = ordered.offset(offset).limit(per_page).all()
+
+    boundary = archived_until()
+    if boundary is not None and not (len(items) == per_page and items[-1].created_at >= boundary):
+        # Os arquivos podem intercalar com meses ainda quentes (mês com depósito em aberto)
+        hot = ordered.limit(offset + per_page).all()
+        archived = query_archives(condition, limit=offset + per_page)
+        merged = sorted(hot + archived, key=lambda t: (t.created_at, t.id), reverse=True)
+        items = merged[offset:offset + per_page]
+
+    total = count_transactions(query, condition) if include_total else None
+    return items, total
+
+
+def count_transactions(query, condition):
+    """Total de transações da consulta na tabela quente mais os meses arquivados"""
+    total = query.order_by(None).count()
+    if archived_until() is not None:
+        counts = aggregate_archives(select(func.count()).select_from(Transaction.__table__).where(condition))
+        total += sum(count for count, in counts)
+    return total
+
+
+def get_archive_stats():
+    rows = TransactionArchive.query.all()
+    return {
+        'months': len(rows),
+        'rows': sum(row.row_count for row in rows),
+        'hot_months': HOT_MONTHS,
+        'hot_cutoff': hot_cutoff().isoformat()
+    }
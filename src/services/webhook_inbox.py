@@ -0,0 +1,271 @@
+"""
+Inbox de webhooks do Pagar.me
+A rota só grava o evento (com chave única, então reentregas são ignoradas)
+e responde; um consumidor processa a inbox em lotes:
+- transições de status com UPDATEs condicionais, então um 'paid' repetido ou
+  processado por dois consumidores credita uma única vez
+- um crédito de saldo por sessão por lote
+- um commit por lote
+
+Um evento cuja transação ainda não tem o id do gateway (o webhook chegou
+antes de o worker de pagamentos gravar a resposta) continua na inbox e é
+tentado de novo com backoff; só é descartado como not_found depois de
+WEBHOOK_NOT_FOUND_MAX_ATTEMPTS tentativas ou WEBHOOK_NOT_FOUND_MAX_AGE_SECONDS.
+
+Configuração por ambiente:
+WEBHOOK_BATCH_SIZE, WEBHOOK_POLL_SECONDS, WEBHOOK_CONSUMER_ENABLED,
+WEBHOOK_NOT_FOUND_MAX_ATTEMPTS, WEBHOOK_NOT_FOUND_MAX_AGE_SECONDS,
+WEBHOOK_RETRY_BACKOFF_SECONDS, WEBHOOK_RETRY_BACKOFF_MAX_SECONDS
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.models.webhook_event import WebhookEvent
+from src.services.ledger import add_to_session_totals, counts_toward_totals
+from src.services.status_cache import gateway_status_cache
+
+BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 500))
+NOT_FOUND_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_NOT_FOUND_MAX_ATTEMPTS', 12))
+NOT_FOUND_MAX_AGE_SECONDS = float(os.getenv('WEBHOOK_NOT_FOUND_MAX_AGE_SECONDS', 86400))
+RETRY_BACKOFF_SECONDS = float(os.getenv('WEBHOOK_RETRY_BACKOFF_SECONDS', 2))
+RETRY_BACKOFF_MAX_SECONDS = float(os.getenv('WEBHOOK_RETRY_BACKOFF_MAX_SECONDS', 600))
+
+# Status do gateway -> status local
+STATUS_MAP = {
+    'paid': 'completed',
+    'refused': 'failed',
+    'failed': 'failed',
+    'waiting_payment': 'processing',
+}
+# Status locais de onde cada transição pode partir
+ALLOWED_FROM = {
+    'completed': ('pending', 'processing', 'failed'),
+    'failed': ('pending', 'processing'),
+    'processing': ('pending',),
+}
+# Quando o mesmo lote traz vários eventos da transação, vale o de maior prioridade
+PRIORITY = {'processing': 0, 'failed': 1, 'completed': 2}
+
+
+def event_key(gateway, transaction_id, event_type, status):
+    """Chave de idempotência do evento: a mesma transição só entra uma vez"""
+    return f'{gateway}:{transaction_id}:{event_type or "-"}:{status or "-"}'
+
+
+def append_event(gateway, transaction_id, event_type, status, payload):
+    """
+    Gravar o evento na inbox
+    Retorna (evento, duplicado): entregas repetidas não criam nova linha
+    """
+    event = WebhookEvent(
+        gateway=gateway,
+        event_key=event_key(gateway, transaction_id, event_type, status),
+        event_type=event_type,
+        external_transaction_id=str(transaction_id),
+        gateway_status=status,
+        payload=payload
+    )
+    db.session.add(event)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return WebhookEvent.query.filter_by(event_key=event.event_key).first(), True
+    return event, False
+
+
+def _transition(transaction_ids, target, now):
+    """Aplicar a transição só às transações em status permitido; retorna as alteradas"""
+    if not transaction_ids:
+        return []
+    stmt = update(Transaction)\
+        .where(Transaction.id.in_(transaction_ids), Transaction.status.in_(ALLOWED_FROM[target]))\
+        .values(status=target, updated_at=now, **({'processed_at': now} if target == 'completed' else {}))\
+        .returning(Transaction.id, Transaction.anon_id, Transaction.transaction_type, Transaction.amount_cents)\
+        .execution_options(synchronize_session=False)
+    return db.session.execute(stmt).all()
+
+
+def _credit_completed(rows):
+    """Creditar as transações concluídas com um UPDATE de saldo por sessão"""
+    by_session = {}
+    for row in rows:
+        by_session.setdefault(row.anon_id, []).append(row)
+
+    balances = []
+    for anon_id, session_rows in by_session.items():
+        total = sum(row.amount_cents for row in session_rows)
+        new_balance = AnonymousSession.post_entries(
+            anon_id, [(row.transaction_type, row.amount_cents) for row in session_rows]
+        )
+        if new_balance is None:
+            continue
+        # Saldo após cada transação, na ordem em que foram concluídas
+        running = new_balance - total
+        for row in session_rows:
+            running += row.amount_cents
+            balances.append({'id': row.id, 'balance_after_cents': running})
+
+        by_type = {}
+        for row in session_rows:
+            if counts_toward_totals(row.transaction_type, 'completed'):
+                amount, count = by_type.get(row.transaction_type, (0, 0))
+                by_type[row.transaction_type] = (amount + row.amount_cents, count + 1)
+        for transaction_type, (amount, count) in by_type.items():
+            add_to_session_totals(anon_id, transaction_type, amount, count=count)
+
+    if balances:
+        db.session.execute(update(Transaction), balances)
+
+
+def apply_transitions(targets, now=None):
+    """
+    Aplicar transições {transaction_id: status local} com UPDATEs condicionais,
+    creditando as concluídas (sem commit); retorna os ids alterados
+    """
+    now = now or datetime.utcnow()
+    changed = set()
+    for target in ('completed', 'failed', 'processing'):
+        rows = _transition([tid for tid, t in targets.items() if t == target], target, now)
+        changed.update(row.id for row in rows)
+        if target == 'completed':
+            _credit_completed(rows)
+    return changed
+
+
+def retry_delay(attempts):
+    """Espera até a próxima tentativa de um evento sem transação: base * 2^(n-1), com teto"""
+    return min(RETRY_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), RETRY_BACKOFF_MAX_SECONDS)
+
+
+def _not_found_update(event, now):
+    """Reagendar o evento ou, esgotadas as tentativas, marcá-lo como not_found"""
+    attempts = (event.attempts or 0) + 1
+    expired = event.received_at is not None and \
+        event.received_at < now - timedelta(seconds=NOT_FOUND_MAX_AGE_SECONDS)
+    if attempts >= NOT_FOUND_MAX_ATTEMPTS or expired:
+        return {'id': event.id, 'attempts': attempts, 'processed_at': now, 'result': 'not_found'}
+    return {'id': event.id, 'attempts': attempts, 'next_attempt_at': now + timedelta(seconds=retry_delay(attempts))}
+
+
+def process_batch(batch_size=None):
+    """Processar um lote da inbox; retorna quantos eventos foram lidos"""
+    now = datetime.utcnow()
+    events = WebhookEvent.query.filter(
+        WebhookEvent.processed_at.is_(None),
+        or_(WebhookEvent.next_attempt_at.is_(None), WebhookEvent.next_attempt_at <= now)
+    ).order_by(WebhookEvent.id).limit(batch_size or BATCH_SIZE).all()
+    if not events:
+        return 0
+
+    external_ids = {event.external_transaction_id for event in events}
+    transactions = dict(
+        db.session.query(Transaction.external_transaction_id, Transaction.id)
+        .filter(Transaction.external_transaction_id.in_(external_ids)).all()
+    )
+
+    # Transição final de cada transação no lote
+    targets = {}
+    for event in events:
+        target = STATUS_MAP.get(event.gateway_status)
+        transaction_id = transactions.get(event.external_transaction_id)
+        if target and transaction_id and PRIORITY[target] >= PRIORITY.get(targets.get(transaction_id), -1):
+            targets[transaction_id] = target
+
+    try:
+        changed = apply_transitions(targets, now)
+
+        results = []
+        for event in events:
+            transaction_id = transactions.get(event.external_transaction_id)
+            if transaction_id is None:
+                results.append(_not_found_update(event, now))
+            else:
+                result = 'applied' if transaction_id in changed else 'ignored'
+                results.append({'id': event.id, 'processed_at': now, 'result': result})
+        db.session.execute(update(WebhookEvent), results)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for external_id in external_ids:
+        gateway_status_cache.invalidate(external_id)
+    return len(events)
+
+
+def drain_inbox(batch_size=None):
+    """Processar a inbox até esvaziar; retorna o total de eventos"""
+    total = 0
+    while True:
+        processed = process_batch(batch_size)
+        total += processed
+        if processed < (batch_size or BATCH_SIZE):
+            return total
+
+
+class WebhookConsumer:
+    """Thread que drena a inbox periodicamente ou quando acordada pela rota"""
+
+    def __init__(self, app, poll_interval=None, batch_size=None):
+        self.app = app
+        self.poll_interval = poll_interval if poll_interval is not None else \
+            float(os.getenv('WEBHOOK_POLL_SECONDS', 1))
+        self.batch_size = batch_size or BATCH_SIZE
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='webhook-consumer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    drain_inbox(self.batch_size)
+                except Exception as e:
+                    print(f'Erro no consumidor de webhooks: {e}')
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+webhook_consumer = None
+
+
+def init_webhook_consumer(app):
+    """Iniciar o consumidor do processo (WEBHOOK_CONSUMER_ENABLED=false desliga)"""
+    global webhook_consumer
+    if os.getenv('WEBHOOK_CONSUMER_ENABLED', 'true').lower() == 'true':
+        webhook_consumer = WebhookConsumer(app).start()
+    return webhook_consumer
+
+
+def notify_consumer():
+    """Avisar o consumidor local de que há evento novo"""
+    if webhook_consumer is not None:
+        webhook_consumer.notify()
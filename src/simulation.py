@@ -0,0 +1,217 @@
+"""
+Simulação Monte Carlo de RTP (retorno ao jogador) e benchmark dos motores de jogo
+Joga milhões de rodadas por jogo e tipo de aposta num pool de processos e
+informa RTP, variância, intervalo de confiança e rodadas por segundo por núcleo
+
+Uso: python -m src.simulation --rounds 100000000 --processes 8
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services import outcome_engine as engine
+from src.services.game_engines import house_edges
+from src.services.money import to_cents
+
+HOUSE_EDGES = house_edges()
+
+# Tipos de aposta simulados por jogo: nome -> bet_data
+BET_CATALOG = {
+    'roulette': {
+        'number': {'type': 'number', 'value': 17},
+        'color': {'type': 'color', 'value': 'red'},
+        'even_odd': {'type': 'even_odd', 'value': 'even'},
+        'high_low': {'type': 'high_low', 'value': 'high'},
+    },
+    'dice': {
+        'total_7': {'type': 'total', 'value': 7},
+        'total_2': {'type': 'total', 'value': 2},
+        'high_low': {'type': 'high_low', 'value': 'high'},
+        'even_odd': {'type': 'even_odd', 'value': 'even'},
+    },
+    'slots': {
+        'spin': {},
+    },
+}
+
+# Valor z para o intervalo de confiança de 95%
+Z_95 = 1.959963984540054
+
+
+def _payouts(game_type, bet_data, bet_amount, n, rng):
+    """Jogar n rodadas de uma aposta (reais) e devolver o vetor de pagamentos em centavos"""
+    house_edge = HOUSE_EDGES[game_type]
+    amounts = np.full(n, to_cents(bet_amount), dtype=np.int64)
+
+    if game_type == 'slots':
+        return engine.slots_payouts(engine.slots_outcomes(n, rng), amounts, house_edge)
+
+    kinds, targets = engine.encode_bets([bet_data.get('type')], [bet_data.get('value')])
+    kinds = np.broadcast_to(kinds, n)
+    targets = np.broadcast_to(targets, n)
+    if game_type == 'roulette':
+        return engine.roulette_payouts(engine.roulette_outcomes(n, rng), kinds, targets, amounts, house_edge)
+    return engine.dice_payouts(engine.dice_outcomes(n, rng), kinds, targets, amounts, house_edge)
+
+
+def exact_rtp(game_type, bet_data, bet_amount=10.0):
+    """RTP exato enumerando todos os resultados equiprováveis"""
+    house_edge = HOUSE_EDGES[game_type]
+
+    if game_type == 'roulette':
+        outcomes = np.arange(engine.ROULETTE_NUMBERS)
+    elif game_type == 'dice':
+        faces = np.arange(1, 7)
+        outcomes = np.stack(np.meshgrid(faces, faces, indexing='ij'), axis=-1).reshape(-1, 2)
+    else:
+        symbols = np.arange(len(engine.SLOT_SYMBOLS))
+        outcomes = np.stack(np.meshgrid(symbols, symbols, symbols, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    n = len(outcomes)
+    amounts = np.full(n, to_cents(bet_amount), dtype=np.int64)
+    if game_type == 'slots':
+        payouts = engine.slots_payouts(outcomes, amounts, house_edge)
+    else:
+        kinds, targets = engine.encode_bets([bet_data.get('type')], [bet_data.get('value')])
+        kinds = np.broadcast_to(kinds, n)
+        targets = np.broadcast_to(targets, n)
+        payout_function = engine.roulette_payouts if game_type == 'roulette' else engine.dice_payouts
+        payouts = payout_function(outcomes, kinds, targets, amounts, house_edge)
+
+    return int(payouts.sum()) / (n * to_cents(bet_amount))
+
+
+def simulate_chunk(task):
+    """Executar uma fatia da simulação num processo do pool"""
+    game_type, bet_data, bet_amount, rounds, chunk_size, seed = task
+    rng = np.random.default_rng(seed)
+    bet_cents = to_cents(bet_amount)
+
+    # Soma exata dos pagamentos em centavos (int64)
+    total_cents = 0
+    total_squares = 0.0
+    played = 0
+    started = time.perf_counter()
+    while played < rounds:
+        n = min(chunk_size, rounds - played)
+        payouts = _payouts(game_type, bet_data, bet_amount, n, rng)
+        total_cents += int(payouts.sum())
+        returns = payouts / bet_cents
+        total_squares += float(np.dot(returns, returns))
+        played += n
+
+    return played, total_cents / bet_cents, total_squares, time.perf_counter() - started
+
+
+def simulate(game_type, bet_name, rounds, processes=None, chunk_size=1_000_000,
+             bet_amount=10.0, seed=None, pool=None):
+    """Simular um tipo de aposta e devolver as estatísticas agregadas"""
+    bet_data = BET_CATALOG[game_type][bet_name]
+    processes = processes or os.cpu_count() or 1
+
+    # Uma tarefa por processo, com sementes independentes
+    tasks_count = max(1, min(processes, math.ceil(rounds / chunk_size)))
+    per_task, remainder = divmod(rounds, tasks_count)
+    seeds = np.random.SeedSequence(seed).spawn(tasks_count)
+    tasks = [
+        (game_type, bet_data, bet_amount, per_task + (1 if i < remainder else 0), chunk_size, seeds[i])
+        for i in range(tasks_count)
+    ]
+
+    started = time.perf_counter()
+    if pool is None and tasks_count > 1:
+        with Pool(processes) as own_pool:
+            chunks = own_pool.map(simulate_chunk, tasks)
+    elif pool is not None:
+        chunks = pool.map(simulate_chunk, tasks)
+    else:
+        chunks = [simulate_chunk(task) for task in tasks]
+    wall_time = time.perf_counter() - started
+
+    played = sum(chunk[0] for chunk in chunks)
+    total = sum(chunk[1] for chunk in chunks)
+    total_squares = sum(chunk[2] for chunk in chunks)
+    cpu_time = sum(chunk[3] for chunk in chunks)
+
+    rtp = total / played
+    variance = max(total_squares / played - rtp * rtp, 0.0)
+    margin = Z_95 * math.sqrt(variance / played)
+    expected = exact_rtp(game_type, bet_data, bet_amount)
+
+    return {
+        'game_type': game_type,
+        'bet': bet_name,
+        'rounds': played,
+        'rtp': rtp,
+        'exact_rtp': expected,
+        'house_edge_effective': 1 - expected,
+        'variance': variance,
+        'ci95_low': rtp - margin,
+        'ci95_high': rtp + margin,
+        'within_ci95': rtp - margin <= expected <= rtp + margin,
+        'wall_time': wall_time,
+        'rounds_per_second': played / wall_time if wall_time else 0.0,
+        'rounds_per_second_per_core': played / cpu_time if cpu_time else 0.0,
+        'processes': tasks_count
+    }
+
+
+def run(games=None, rounds=10_000_000, processes=None, chunk_size=1_000_000, bet_amount=10.0, seed=None):
+    """Simular todos os tipos de aposta dos jogos informados"""
+    games = games or list(BET_CATALOG)
+    processes = processes or os.cpu_count() or 1
+    reports = []
+    with Pool(processes) as pool:
+        for game_type in games:
+            for bet_name in BET_CATALOG[game_type]:
+                reports.append(simulate(
+                    game_type, bet_name, rounds,
+                    processes=processes, chunk_size=chunk_size,
+                    bet_amount=bet_amount, seed=seed, pool=pool
+                ))
+    return reports
+
+
+def format_report(reports):
+    """Formatar os resultados como tabela"""
+    header = f"{'jogo':<10}{'aposta':<11}{'rodadas':>14}{'RTP':>11}{'exato':>11}" \
+             f"{'IC 95%':>25}{'variância':>12}{'rodadas/s/núcleo':>18}"
+    lines = [header, '-' * len(header)]
+    for r in reports:
+        lines.append(
+            f"{r['game_type']:<10}{r['bet']:<11}{r['rounds']:>14,}{r['rtp']:>11.4%}{r['exact_rtp']:>11.4%}"
+            f"{'[' + format(r['ci95_low'], '.4%') + ', ' + format(r['ci95_high'], '.4%') + ']':>25}"
+            f"{r['variance']:>12.4f}{r['rounds_per_second_per_core']:>18,.0f}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulação Monte Carlo de RTP dos jogos')
+    parser.add_argument('--games', nargs='+', choices=sorted(BET_CATALOG), help='Jogos a simular (padrão: todos)')
+    parser.add_argument('--rounds', type=int, default=10_000_000, help='Rodadas por tipo de aposta')
+    parser.add_argument('--processes', type=int, default=None, help='Processos no pool (padrão: núcleos da máquina)')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help='Rodadas por vetor')
+    parser.add_argument('--bet-amount', type=float, default=10.0, help='Valor de cada aposta')
+    parser.add_argument('--seed', type=int, default=None, help='Semente para reprodutibilidade')
+    parser.add_argument('--json', action='store_true', help='Saída em JSON')
+    args = parser.parse_args(argv)
+
+    reports = run(
+        games=args.games, rounds=args.rounds, processes=args.processes,
+        chunk_size=args.chunk_size, bet_amount=args.bet_amount, seed=args.seed
+    )
+    print(json.dumps(reports, indent=2) if args.json else format_report(reports))
+
+
+if __name__ == '__main__':
+    main()
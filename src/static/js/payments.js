@@ -206,6 +206,20 @@ function formatExpirationDate(dateString) {
     return date.toLocaleString('pt-BR');
 }
 
+// Encrypt card data in the browser with pagarme.js (returns card_hash)
+async function encryptCard(card) {
+    if (!window.pagarme) {
+        throw new Error('Pagamento com cartão indisponível no momento');
+    }
+    const response = await fetch('/api/config');
+    const { config } = await response.json();
+    if (!config.pagarme_encryption_key) {
+        throw new Error('Pagamento com cartão indisponível no momento');
+    }
+    const client = await pagarme.client.connect({ encryption_key: config.pagarme_encryption_key });
+    return client.security.encrypt(card);
+}
+
 // Validate deposit form
 function validateDepositForm() {
     const amount = parseFloat(document.getElementById('deposit-amount')?.value || 0);
@@ -244,11 +258,14 @@ async function handleDepositSubmit() {
                 throw new Error('Todos os campos do cartão são obrigatórios');
             }
             
+            // O servidor só recebe o card_hash; número e CVV não saem do navegador
             additionalData.card = {
-                number: cardNumber.replace(/\s/g, ''),
-                holder_name: cardHolder,
-                expiration_date: cardExpiry.replace('/', ''),
-                cvv: cardCvv
+                card_hash: await encryptCard({
+                    card_number: cardNumber.replace(/\s/g, ''),
+                    card_holder_name: cardHolder,
+                    card_expiration_date: cardExpiry.replace('/', ''),
+                    card_cvv: cardCvv
+                })
             };
         }
         
@@ -0,0 +1,56 @@
+"""
+Rotas de leitura não gravam no banco; last_activity é gravado em lote
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.routes.anon import anon_bp
+from src.services.activity_buffer import ActivityBuffer, activity_buffer
+
+ANON_IDS = ['44444444-4444-4444-4444-44444444444%d' % i for i in range(3)]
+LONG_AGO = datetime(2020, 1, 1)
+
+
+def test_reads_do_not_write_and_flush_batches_touches(app):
+    app.register_blueprint(anon_bp, url_prefix='/api/anon')
+    for anon_id in ANON_IDS:
+        db.session.add(AnonymousSession(anon_id=anon_id, balance_cents=500, last_activity=LONG_AGO))
+    db.session.commit()
+    activity_buffer.flush()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        client = app.test_client()
+        for _ in range(5):
+            for anon_id in ANON_IDS:
+                assert client.get(f'/api/anon/session/{anon_id}/balance').status_code == 200
+                assert client.get(f'/api/anon/validate/{anon_id}').status_code == 200
+        assert not [s for s in statements if not s.lstrip().upper().startswith('SELECT')]
+
+        statements.clear()
+        assert activity_buffer.flush() == len(ANON_IDS)
+        assert len([s for s in statements if s.lstrip().upper().startswith('UPDATE')]) == 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    db.session.expire_all()
+    for (last_activity,) in db.session.query(AnonymousSession.last_activity):
+        assert datetime.utcnow() - last_activity < timedelta(minutes=2)
+
+
+def test_flush_never_moves_last_activity_backwards(app):
+    buffer = ActivityBuffer(resolution=60)
+    recent = datetime.utcnow()
+    db.session.add(AnonymousSession(anon_id=ANON_IDS[0], last_activity=recent))
+    db.session.commit()
+
+    buffer.touch(ANON_IDS[0], when=recent - timedelta(hours=1))
+    assert buffer.flush() == 0
+    db.session.expire_all()
+    assert db.session.query(AnonymousSession.last_activity).scalar() == recent
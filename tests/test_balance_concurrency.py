@@ -0,0 +1,66 @@
+"""
+Teste de estresse: débitos concorrentes nunca deixam o saldo negativo
+"""
+
+import threading
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+
+ANON_ID = '11111111-1111-1111-1111-111111111111'
+THREADS = 8
+ATTEMPTS_PER_THREAD = 25
+# Centavos
+BET = 1000
+INITIAL_BALANCE = 50000
+
+
+def test_parallel_debits_never_overdraft(app):
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=INITIAL_BALANCE))
+    db.session.commit()
+
+    accepted = []
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        with app.app_context():
+            start.wait()
+            for _ in range(ATTEMPTS_PER_THREAD):
+                try:
+                    balance = AnonymousSession.debit(ANON_ID, BET)
+                    if balance is None:
+                        db.session.rollback()
+                        continue
+                    db.session.commit()
+                    accepted.append(balance)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    db.session.expire_all()
+    final_balance = db.session.query(AnonymousSession.balance_cents).filter_by(anon_id=ANON_ID).scalar()
+
+    # Exatamente saldo / aposta débitos aceitos, nenhum saldo negativo observado
+    assert len(accepted) == INITIAL_BALANCE // BET
+    assert min(accepted) >= 0
+    assert final_balance == 0
+    assert sorted(accepted) == [BET * i for i in range(len(accepted))]
+
+
+def test_debit_rejects_insufficient_balance(app):
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=500))
+    db.session.commit()
+
+    assert AnonymousSession.debit(ANON_ID, 1000) is None
+    assert AnonymousSession.debit(ANON_ID, 500) == 0
+    assert AnonymousSession.credit(ANON_ID, 250) == 250
+    assert AnonymousSession.debit('inexistente', 100) is None
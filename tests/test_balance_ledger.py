@@ -0,0 +1,122 @@
+"""
+Ledger de saldo: lançamentos com seq sem lacunas, snapshots periódicos,
+saldo atual e histórico reconstruídos do ledger e abertura de saldos antigos
+"""
+
+from datetime import datetime, timedelta
+
+from src.database import db
+from src.models import balance_ledger
+from src.models.anon_session import AnonymousSession
+from src.models.balance_ledger import BalanceSnapshot, LedgerEntry
+from src.models.casino import Transaction
+from src.models.payment_methods import SystemPaymentMethod
+from src.routes.casino import casino_bp
+from src.services.balance_ledger import balance_at, ledger_balance, open_ledgers, verify_ledger
+
+ANON_ID = '99999999-9999-9999-9999-999999999999'
+
+
+def test_every_balance_change_is_a_sequenced_entry(app, monkeypatch):
+    monkeypatch.setattr(balance_ledger, 'SNAPSHOT_INTERVAL', 5)
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(SystemPaymentMethod(method_name='pix', display_name='PIX', deposit_fee_bps=100,
+                                       deposit_fee_fixed_cents=0, min_deposit_cents=100, max_deposit_cents=500000,
+                                       min_withdrawal_cents=100, max_withdrawal_cents=500000))
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+
+    client = app.test_client()
+    assert client.post('/api/casino/deposit', json={'anon_id': ANON_ID, 'amount': 100, 'payment_method': 'pix'}).status_code == 200
+    bets = [{'game_type': 'dice', 'bet_amount': 5, 'bet_data': {'type': 'high_low', 'value': 'high'}}] * 6
+    assert client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': bets}).status_code == 200
+    assert client.post('/api/casino/withdraw', json={'anon_id': ANON_ID, 'amount': 20, 'payment_method': 'pix',
+                                                         'paypal_email': 'a@b.c'}).status_code == 200
+
+    entries = LedgerEntry.query.filter_by(anon_id=ANON_ID).order_by(LedgerEntry.seq).all()
+    session = AnonymousSession.query.filter_by(anon_id=ANON_ID).one()
+    assert [e.seq for e in entries] == list(range(1, len(entries) + 1))
+    assert [(e.entry_type, e.amount_cents) for e in entries[:2]] == [('deposit', 10000), ('fee', -100)]
+    assert entries[-1].entry_type == 'withdraw'
+    assert entries[-1].balance_cents == session.balance_cents
+    assert session.ledger_seq == len(entries)
+
+    # Um snapshot a cada 5 lançamentos, com o saldo corrente daquele seq
+    snapshots = BalanceSnapshot.query.filter_by(anon_id=ANON_ID).order_by(BalanceSnapshot.seq).all()
+    assert [s.seq for s in snapshots] == list(range(5, len(entries) + 1, 5))
+    assert all(s.balance_cents == entries[s.seq - 1].balance_cents for s in snapshots)
+
+    assert ledger_balance(ANON_ID) == (session.balance_cents, session.ledger_seq)
+    assert verify_ledger() == []
+
+    balance = client.get(f'/api/casino/balance?anon_id={ANON_ID}').get_json()
+    assert balance['ledger_seq'] == session.ledger_seq
+
+
+def test_deposit_to_vanished_session_returns_404(app, monkeypatch):
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(SystemPaymentMethod(method_name='pix', display_name='PIX', deposit_fee_bps=100,
+                                       deposit_fee_fixed_cents=0, min_deposit_cents=100, max_deposit_cents=500000))
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+    # Sessão removida entre a leitura da rota e o UPDATE do saldo
+    monkeypatch.setattr(AnonymousSession, 'post_entries', staticmethod(lambda anon_id, entries, min_balance=None: None))
+
+    response = app.test_client().post('/api/casino/deposit', json={'anon_id': ANON_ID, 'amount': 100, 'payment_method': 'pix'})
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'Sessão anônima não encontrada'
+    assert Transaction.query.count() == 0
+
+
+def test_balance_at_reads_between_snapshots(app, monkeypatch):
+    monkeypatch.setattr(balance_ledger, 'SNAPSHOT_INTERVAL', 3)
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+
+    start = datetime(2024, 1, 1)
+    for i in range(10):
+        balance = AnonymousSession.credit(ANON_ID, 100 * (i + 1), entry_type='deposit')
+        db.session.commit()
+        # Instantes distintos por lançamento
+        LedgerEntry.query.filter_by(anon_id=ANON_ID, seq=i + 1).update({'created_at': start + timedelta(hours=i)})
+        BalanceSnapshot.query.filter_by(anon_id=ANON_ID, seq=i + 1).update({'created_at': start + timedelta(hours=i)})
+        db.session.commit()
+    assert balance == 5500
+
+    assert balance_at(ANON_ID, start - timedelta(hours=1)) == (0, 0)
+    assert balance_at(ANON_ID, start) == (100, 1)
+    assert balance_at(ANON_ID, start + timedelta(hours=4, minutes=30)) == (1500, 5)
+    assert balance_at(ANON_ID, start + timedelta(hours=8)) == (4500, 9)
+    assert balance_at(ANON_ID, start + timedelta(days=1)) == (5500, 10)
+
+    client = app.test_client()
+    response = client.get(f'/api/casino/balance?anon_id={ANON_ID}&at=2024-01-01T05:00:00')
+    assert response.get_json()['balance'] == 21.0
+    assert response.get_json()['ledger_seq'] == 6
+    assert client.get(f'/api/casino/balance?anon_id={ANON_ID}&at=ontem').status_code == 400
+
+    # Instantes com fuso são convertidos para UTC antes de consultar o ledger
+    for at in ('2024-01-01T05:00:00Z', '2024-01-01T05:00:00%2B00:00', '2024-01-01T02:00:00-03:00'):
+        response = client.get(f'/api/casino/balance?anon_id={ANON_ID}&at={at}')
+        assert response.status_code == 200
+        assert response.get_json()['ledger_seq'] == 6
+        assert response.get_json()['at'] == '2024-01-01T05:00:00'
+
+
+def test_existing_balances_get_an_opening_entry(app):
+    db.session.add_all([
+        AnonymousSession(anon_id=ANON_ID, balance_cents=4321),
+        AnonymousSession(anon_id='empty', balance_cents=0),
+    ])
+    db.session.commit()
+    assert [m['anon_id'] for m in verify_ledger()] == [ANON_ID]
+
+    assert open_ledgers(chunk_size=1) == 1
+    assert open_ledgers() == 0
+    entry = LedgerEntry.query.filter_by(anon_id=ANON_ID).one()
+    assert (entry.seq, entry.entry_type, entry.balance_cents) == (1, 'opening', 4321)
+
+    assert AnonymousSession.debit(ANON_ID, 321, entry_type='bet') == 4000
+    db.session.commit()
+    assert verify_ledger() == []
@@ -0,0 +1,151 @@
+"""
+POST /api/casino/bets/batch: parada antecipada por saldo, um único commit,
+rodadas e transações iguais aos resultados, conflito com alteração
+concorrente do saldo e validação de todo o lote antes de jogar
+"""
+
+import pytest
+from sqlalchemy import event, text
+
+from src.config import Config
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.balance_ledger import LedgerEntry
+from src.models.casino import GameRound, Transaction
+from src.routes import casino
+from src.routes.casino import casino_bp
+
+ANON_ID = '13131313-1313-1313-1313-131313131313'
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=2500))
+    db.session.commit()
+    return app.test_client()
+
+
+def fixed_results(monkeypatch, payouts, before=None):
+    """Resultados determinísticos: um pagamento (centavos) por aposta, na ordem"""
+    def results(bets, rng=None):
+        if before:
+            before()
+        return [{'payout_cents': payout, 'result': 'win' if payout else 'lose'} for payout in payouts[:len(bets)]]
+    monkeypatch.setattr(casino, 'process_game_results_batch', results)
+
+
+def without_daily_limits(monkeypatch):
+    """Sem limites diários a rota não trava a linha do dia (o SQLite travaria o banco todo)"""
+    monkeypatch.setattr(Config, 'get_daily_limits', staticmethod(lambda: {'deposit': 0, 'loss': 0}))
+
+
+def slots(amount, count):
+    return [{'game_type': 'slots', 'bet_amount': amount}] * count
+
+
+def balance():
+    db.session.expire_all()
+    return db.session.query(AnonymousSession.balance_cents).filter_by(anon_id=ANON_ID).scalar()
+
+
+def test_stops_early_when_funds_run_out(client, monkeypatch):
+    fixed_results(monkeypatch, [0, 0, 0, 5000])
+    response = client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': slots(10, 4)})
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body['processed'], body['requested']) == (2, 4)
+    assert (body['stopped_early'], body['stop_reason']) == (True, 'insufficient_funds')
+    assert [r['index'] for r in body['results']] == [0, 1]
+    # As apostas seguintes não foram liquidadas (nem o prêmio da quarta)
+    assert body['new_balance'] == 5.0 and balance() == 500
+    assert GameRound.query.count() == 2
+    assert Transaction.query.count() == 2
+
+
+def test_rounds_and_transactions_match_results_in_one_commit(client, monkeypatch):
+    fixed_results(monkeypatch, [0, 2500, 0])
+    commits = []
+    listener = lambda conn: commits.append(conn)
+    event.listen(db.engine, 'commit', listener)
+    try:
+        response = client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': slots(5, 3)})
+    finally:
+        event.remove(db.engine, 'commit', listener)
+    assert len(commits) == 1
+
+    body = response.get_json()
+    assert [r['balance'] for r in body['results']] == [20.0, 40.0, 35.0]
+    assert body['new_balance'] == 35.0 and balance() == 3500
+
+    rounds = {r.id: r for r in GameRound.query}
+    for result in body['results']:
+        game_round = rounds[result['round_id']]
+        assert game_round.bet_amount_cents == 500
+        assert game_round.win_amount_cents == round(result['result']['payout'] * 100)
+    assert [r.round_number for r in sorted(rounds.values(), key=lambda r: r.id)] == [1, 2, 3]
+
+    transactions = Transaction.query.order_by(Transaction.id).all()
+    assert [(t.transaction_type, t.amount_cents, t.balance_after_cents) for t in transactions] == [
+        ('bet', 500, 2000), ('bet', 500, 1500), ('win', 2500, 4000), ('bet', 500, 3500)
+    ]
+    entries = LedgerEntry.query.order_by(LedgerEntry.seq).all()
+    assert [e.balance_cents for e in entries] == [t.balance_after_cents for t in transactions]
+
+
+def test_concurrent_debit_conflicts_and_settles_nothing(client, monkeypatch):
+    def spend_elsewhere():
+        # Outra requisição consome o saldo entre a leitura e o UPDATE do lote
+        with db.engine.begin() as conn:
+            conn.execute(text('UPDATE anonymous_sessions SET balance_cents = 1000 WHERE anon_id = :a'), {'a': ANON_ID})
+
+    without_daily_limits(monkeypatch)
+    fixed_results(monkeypatch, [0, 0], before=spend_elsewhere)
+    response = client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': slots(10, 2)})
+
+    assert response.status_code == 409
+    assert balance() == 1000
+    assert GameRound.query.count() == Transaction.query.count() == LedgerEntry.query.count() == 0
+
+
+def test_concurrent_credit_shifts_recorded_balances(client, monkeypatch):
+    def credit_elsewhere():
+        with db.engine.begin() as conn:
+            conn.execute(text('UPDATE anonymous_sessions SET balance_cents = balance_cents + 1000 WHERE anon_id = :a'),
+                         {'a': ANON_ID})
+
+    without_daily_limits(monkeypatch)
+    fixed_results(monkeypatch, [0, 0], before=credit_elsewhere)
+    body = client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': slots(10, 2)}).get_json()
+
+    assert body['new_balance'] == 15.0 and balance() == 1500
+    assert [r['balance'] for r in body['results']] == [25.0, 15.0]
+    assert [t.balance_after_cents for t in Transaction.query.order_by(Transaction.id)] == [2500, 1500]
+
+
+@pytest.mark.parametrize('invalid, error', [
+    ({'game_type': 'slots', 'bet_amount': 'dez'}, 'número válido'),
+    ({'bet_amount': 5}, 'Tipo de jogo'),
+    ('slots', 'Aposta inválida'),
+    ({'game_type': 'slots', 'bet_amount': -5}, 'inválido'),
+    # Jogo sem limite configurado: mínimo de R$ 1,00
+    ({'game_type': 'keno', 'bet_amount': 0.5}, 'Aposta mínima para keno é R$ 1.00'),
+])
+def test_invalid_entry_in_the_middle_rejects_the_whole_batch(client, monkeypatch, invalid, error):
+    fixed_results(monkeypatch, [0, 0, 0])
+    bets = [{'game_type': 'slots', 'bet_amount': 5}, invalid, {'game_type': 'slots', 'bet_amount': 5}]
+    response = client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': bets})
+
+    assert response.status_code == 400
+    assert response.get_json()['index'] == 1
+    assert error in response.get_json()['error']
+    assert balance() == 2500
+    assert GameRound.query.count() == Transaction.query.count() == 0
+
+
+def test_single_bet_on_unconfigured_game_needs_one_real(client):
+    response = client.post('/api/casino/bet', json={'anon_id': ANON_ID, 'game_type': 'keno', 'bet_amount': 0.5})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Aposta mínima para keno é R$ 1.00'
+    assert balance() == 2500
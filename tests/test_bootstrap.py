@@ -0,0 +1,38 @@
+"""
+Boot com o banco atualizado faz um único SELECT; a inicialização grava os
+dados padrão em lote e é idempotente
+"""
+
+from src.config import DEFAULT_SETTINGS
+from src.database import db
+from src.models.casino import CasinoSettings
+from src.models.payment_methods import SystemPaymentMethod
+from src.services.bootstrap import ensure_database, get_startup_stats, initialize_database
+
+
+def test_boot_skips_initialization_when_current(app, tmp_path):
+    app.instance_path = str(tmp_path)
+    assert ensure_database(auto_init=True) == 'initialized'
+    assert SystemPaymentMethod.query.count() == len(SystemPaymentMethod.DEFAULT_METHODS)
+
+    assert ensure_database(auto_init=True, budget_ms=1000) == 'current'
+    stats = get_startup_stats()
+    assert stats['queries'] == 1
+    assert not stats['over_budget']
+
+
+def test_seed_is_idempotent_and_keeps_edited_values(app):
+    initialize_database()
+    setting = CasinoSettings.query.filter_by(setting_key='min_bet_dice').one()
+    setting.setting_value = '7'
+    db.session.commit()
+
+    initialize_database()
+    assert CasinoSettings.query.filter_by(setting_key='min_bet_dice').one().setting_value == '7'
+    keys = {key for key, *_ in DEFAULT_SETTINGS}
+    assert CasinoSettings.query.filter(CasinoSettings.setting_key.in_(keys)).count() == len(keys)
+
+
+def test_stale_database_is_reported_without_auto_init(app):
+    assert ensure_database(auto_init=False) == 'stale'
+    assert CasinoSettings.query.count() == 0
@@ -0,0 +1,124 @@
+"""
+Paginação por cursor nas rotas de histórico: páginas sem duplicatas nem
+lacunas mesmo com created_at repetido e inserções entre as requisições,
+next_cursor nulo na última página, cursor inválido e include_total
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import GameSession, Transaction
+from src.routes.anon import anon_bp
+from src.routes.casino import casino_bp
+from src.services.pagination import decode_cursor
+
+ANON_ID = '44444444-4444-4444-4444-444444444444'
+START = datetime(2024, 3, 1, 12)
+
+TRANSACTIONS_URL = f'/api/casino/transactions?anon_id={ANON_ID}'
+GAMES_URL = f'/api/anon/session/{ANON_ID}/games?'
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    app.register_blueprint(anon_bp, url_prefix='/api/anon')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+    return app.test_client()
+
+
+def add_transactions(created_at):
+    db.session.add_all([
+        Transaction(anon_id=ANON_ID, transaction_type='bet', amount_cents=100, balance_after_cents=0,
+                    created_at=when) for when in created_at
+    ])
+    db.session.commit()
+
+
+def walk(client, url, per_page, between=None):
+    """Percorrer as páginas pelo next_cursor; retorna (ids, páginas)"""
+    ids, pages, cursor = [], [], ''
+    while True:
+        body = client.get(f'{url}&per_page={per_page}&cursor={cursor}').get_json()
+        pagination = body.get('pagination', body)
+        key = 'transactions' if 'transactions' in body else 'game_sessions'
+        ids += [item['id'] for item in body[key]]
+        pages.append(pagination)
+        cursor = pagination['next_cursor']
+        if not cursor:
+            return ids, pages
+        if between:
+            between(cursor)
+
+
+def test_transaction_pages_have_no_duplicates_or_gaps(client):
+    # Três blocos de transações com o mesmo created_at, cortados pelas páginas
+    add_transactions([START + timedelta(minutes=1)] * 4 + [START] * 3 + [START - timedelta(minutes=1)] * 3)
+    expected = [t.id for t in Transaction.query.order_by(Transaction.created_at.desc(), Transaction.id.desc())]
+
+    # Entre as requisições entram transações mais recentes e no mesmo instante
+    # do cursor (id maior: ordenadas antes dele); nenhuma desloca as páginas seguintes
+    def insert_ahead_of_cursor(cursor):
+        created_at, _ = decode_cursor(cursor)
+        add_transactions([START + timedelta(hours=1), created_at])
+
+    ids, pages = walk(client, TRANSACTIONS_URL, per_page=3, between=insert_ahead_of_cursor)
+
+    assert ids == expected
+    assert [page['has_more'] for page in pages] == [True, True, True, False]
+    assert pages[-1]['next_cursor'] is None
+
+
+def test_exact_last_page_has_null_cursor(client):
+    add_transactions([START + timedelta(seconds=i) for i in range(4)])
+
+    first = client.get(f'{TRANSACTIONS_URL}&per_page=2&cursor=').get_json()
+    last = client.get(f'{TRANSACTIONS_URL}&per_page=2&cursor={first["next_cursor"]}').get_json()
+    assert len(last['transactions']) == 2
+    assert last['next_cursor'] is None and last['has_more'] is False
+
+
+def test_game_pages_walk_equal_start_times(client):
+    db.session.add_all([
+        GameSession(anon_id=ANON_ID, game_type='dice', status='ended', start_time=START + timedelta(minutes=i // 3),
+                    initial_balance_cents=0, current_balance_cents=0)
+        for i in range(7)
+    ])
+    db.session.commit()
+    expected = [g.id for g in GameSession.query.order_by(GameSession.start_time.desc(), GameSession.id.desc())]
+
+    ids, pages = walk(client, GAMES_URL, per_page=2)
+    assert ids == expected
+    assert len(pages) == 4 and pages[-1]['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', ['nao-e-cursor', 'MjAyNC0wMy0wMQ', 'MjAyNC0wMy0wMXxhYmM', '%FF'])
+def test_malformed_cursor_is_rejected(client, cursor):
+    add_transactions([START])
+
+    for url in (TRANSACTIONS_URL, f'/api/anon/session/{ANON_ID}/transactions?', GAMES_URL):
+        response = client.get(f'{url}&cursor={cursor}')
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Cursor inválido'
+
+
+def test_include_total_is_opt_in_for_cursor_pages(client):
+    add_transactions([START + timedelta(seconds=i) for i in range(5)])
+
+    body = client.get(f'{TRANSACTIONS_URL}&per_page=2&cursor=').get_json()
+    assert 'total' not in body
+
+    body = client.get(f'{TRANSACTIONS_URL}&per_page=2&cursor=&include_total=true').get_json()
+    assert body['total'] == 5 and len(body['transactions']) == 2
+    # O total é da sessão inteira, não da página restante
+    body = client.get(f'{TRANSACTIONS_URL}&per_page=2&cursor={body["next_cursor"]}&include_total=1').get_json()
+    assert body['total'] == 5
+
+    pagination = client.get(
+        f'/api/anon/session/{ANON_ID}/transactions?per_page=2&cursor=&include_total=true'
+    ).get_json()['pagination']
+    assert pagination['total'] == 5 and pagination['has_more'] is True
@@ -0,0 +1,156 @@
+"""
+player_daily_totals acompanha o ledger e sustenta get_daily_stats e os
+limites diários sem ler as transações do dia (exceto depósitos pendentes)
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import event
+
+from src.config import Config
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import CasinoUser, PlayerDailyTotals, Transaction
+from src.models.payment_methods import SystemPaymentMethod
+from src.routes.casino import casino_bp
+from src.routes.payments import payments_bp
+from src.services import outcome_engine, payment_queue
+from src.services.ledger import (
+    check_daily_limits, complete_transaction, get_daily_totals, rebuild_player_daily_totals,
+    record_transaction
+)
+from src.services.payment_queue import run_pending_jobs
+
+ANON_ID = '66666666-6666-6666-6666-666666666666'
+# Centavos
+LIMITS = {'deposit': 100000, 'loss': 10000}
+
+
+def _daily_rows():
+    return {
+        (row.player_id, str(row.day), row.game_type): (row.total_bet_cents, row.bet_count, row.total_won_cents, row.total_deposited_cents)
+        for row in PlayerDailyTotals.query.all()
+    }
+
+
+def test_daily_totals_follow_ledger_and_match_rebuild(app):
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=20000))
+    db.session.commit()
+
+    pending = record_transaction(ANON_ID, 'deposit', 30000, balance_after=20000, status='pending')
+    db.session.commit()
+    # O depósito pendente já ocupa o limite, e continua ocupando depois de creditado
+    assert check_daily_limits(ANON_ID, deposit=70000, limits=LIMITS) is None
+    assert 'depósito' in check_daily_limits(ANON_ID, deposit=70001, limits=LIMITS)
+    complete_transaction(pending, balance_after=50000)
+    db.session.commit()
+    assert check_daily_limits(ANON_ID, deposit=70000, limits=LIMITS) is None
+    assert 'depósito' in check_daily_limits(ANON_ID, deposit=70001, limits=LIMITS)
+
+    response = app.test_client().post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': [
+        {'game_type': 'dice', 'bet_amount': 10, 'bet_data': {'type': 'high_low', 'value': 'high'}},
+        {'game_type': 'slots', 'bet_amount': 5},
+    ] * 3})
+    assert response.status_code == 200
+
+    incremental = _daily_rows()
+    assert {game_type for _, _, game_type in incremental} == {'', 'dice', 'slots'}
+    assert rebuild_player_daily_totals() == len(incremental)
+    assert _daily_rows() == incremental
+
+    today = datetime.utcnow().date()
+    (summary,) = get_daily_totals(ANON_ID, today - timedelta(days=6), today)
+    bets = db.session.query(db.func.sum(Transaction.amount_cents)).filter_by(transaction_type='bet').scalar()
+    assert summary['deposits'] == 300.0
+    assert bets == 4500
+    assert summary['bets'] == 45.0
+    assert CasinoUser(user_id=ANON_ID).get_daily_stats() == summary
+
+
+def test_loss_limit_reads_one_day_without_scanning_transactions(app):
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=50000))
+    record_transaction(ANON_ID, 'bet', 8000, balance_after=42000, game_type='roulette')
+    record_transaction(ANON_ID, 'win', 2000, balance_after=44000, game_type='roulette')
+    db.session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        # Perda atual 60: cabem mais 40
+        assert check_daily_limits(ANON_ID, bet=4000, limits=LIMITS) is None
+        assert 'perda' in check_daily_limits(ANON_ID, bet=4001, limits=LIMITS)
+        assert check_daily_limits(ANON_ID, bet=100000, limits={'deposit': 0, 'loss': 0}) is None
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert statements and not [s for s in statements if 'transactions' in s]
+
+
+class RefusingGateway:
+    def find_payment(self, reference_key):
+        return {'success': False, 'found': False, 'error': 'Transação não encontrada no gateway'}
+
+    def process_payment(self, payment_data):
+        return {'success': False, 'error': 'refused'}
+
+
+def test_in_flight_deposits_count_toward_the_deposit_limit(app, monkeypatch):
+    monkeypatch.setattr(Config, 'get_daily_limits', staticmethod(lambda: LIMITS))
+    monkeypatch.setattr(payment_queue, 'payment_manager', RefusingGateway())
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    app.register_blueprint(payments_bp, url_prefix='/api/payments')
+    db.session.add(SystemPaymentMethod(method_name='pix', display_name='PIX', min_deposit_cents=100,
+                                       max_deposit_cents=500000))
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+    client = app.test_client()
+
+    def deposit(amount):
+        return client.post('/api/payments/process', json={'anon_id': ANON_ID, 'amount': amount, 'payment_method': 'pix'})
+
+    # Dois depósitos em andamento não somam mais que o limite
+    assert deposit(600).status_code == 202
+    second = deposit(600)
+    assert second.status_code == 400 and 'depósito' in second.get_json()['error']
+    immediate = client.post('/api/casino/deposit', json={'anon_id': ANON_ID, 'amount': 500, 'payment_method': 'pix'})
+    assert immediate.status_code == 400 and 'depósito' in immediate.get_json()['error']
+    assert Transaction.query.count() == 1
+    assert deposit(400).status_code == 202
+
+    # Recusados pelo gateway, liberam o limite
+    assert run_pending_jobs() == 2
+    assert Transaction.query.filter_by(status='failed').count() == 2
+    assert deposit(600).status_code == 202
+
+
+def test_losing_bet_counts_toward_the_loss_limit(app, monkeypatch):
+    monkeypatch.setattr(Config, 'get_daily_limits', staticmethod(lambda: LIMITS))
+    # Semente fixa: dados somam 10, a aposta em 'low' perde
+    monkeypatch.setattr(outcome_engine, 'default_rng', np.random.default_rng(1))
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=20000))
+    db.session.commit()
+    client = app.test_client()
+
+    def bet(amount):
+        return client.post('/api/casino/bet', json={
+            'anon_id': ANON_ID, 'game_type': 'dice', 'bet_amount': amount,
+            'bet_data': {'type': 'high_low', 'value': 'low'}
+        })
+
+    response = bet(60)
+    assert response.status_code == 200
+    assert response.get_json()['result']['payout'] == 0.0
+    assert response.get_json()['new_balance'] == 140.0
+
+    db.session.expire_all()
+    assert AnonymousSession.query.filter_by(anon_id=ANON_ID).one().balance_cents == 14000
+    assert db.session.get(PlayerDailyTotals, (ANON_ID, datetime.utcnow().date(), 'dice')).total_bet_cents == 6000
+
+    # Perda do dia em 60: uma aposta de 50 passaria do limite de 100
+    rejected = bet(50)
+    assert rejected.status_code == 400 and 'perda' in rejected.get_json()['error']
+    assert bet(40).status_code == 200
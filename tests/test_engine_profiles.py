@@ -0,0 +1,53 @@
+"""
+Perfis de engine: PRAGMAs do SQLite aplicados em cada conexão e opções de
+pool para bancos servidor
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from flask_sqlalchemy import SQLAlchemy
+
+from src.db_benchmark import run
+from src.services.engine_profiles import engine_options, init_engine_profile, read_pragmas, resolve_profile
+
+
+def test_sqlite_profile_applies_pragmas_on_every_connection(tmp_path, monkeypatch):
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '7000')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'casino.db'}"
+    db = SQLAlchemy()
+    assert init_engine_profile(app, db) == 'sqlite'
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            pragmas = read_pragmas(conn)
+        assert pragmas['journal_mode'] == 'wal'
+        assert pragmas['synchronous'] == 1  # NORMAL
+        assert pragmas['busy_timeout'] == 7000
+        assert pragmas['cache_size'] == -64 * 1024
+        db.engine.dispose()
+
+
+def test_default_profile_keeps_rollback_journal(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'casino.db'}")
+    with engine.connect() as conn:
+        assert read_pragmas(conn)['journal_mode'] == 'delete'
+    engine.dispose()
+
+
+def test_server_profile_pool_options(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '5')
+    uri = 'postgresql://casino@localhost/casino'
+    assert resolve_profile(uri) == 'server'
+    options = engine_options(uri)
+    assert options['pool_size'] == 5 and options['pool_pre_ping'] is True
+    assert engine_options(uri, 'default') == {}
+    with pytest.raises(ValueError):
+        resolve_profile(uri, 'sqlite')
+
+
+def test_benchmark_runs_both_sqlite_profiles():
+    reports = run(threads=4, ops=20)
+    assert [r['profile'] for r in reports] == ['default', 'sqlite']
+    assert reports[1]['ops'] == 80 and reports[1]['errors'] == 0
@@ -0,0 +1,135 @@
+"""
+Gateway Pagar.me contra um servidor HTTP local: conexões reaproveitadas,
+timeouts e histogramas de latência
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.payment_gateways import PagarMeGateway
+
+CUSTOMER = {'session_id': 'abc', 'name': 'Teste', 'email': 't@t.com', 'cpf': '00000000000'}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Imita POST /transactions e GET /transactions/<id> da API v1"""
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.delay)
+        if data['amount'] <= 0:
+            return self._reply(400, {'errors': [{'message': 'amount inválido'}]})
+        transaction = {'id': 123, 'status': 'waiting_payment', 'pix_qr_code': 'qr-code', 'amount': data['amount']}
+        self.server.created[data.get('reference_key')] = transaction
+        if self.server.fail_after_create:
+            # Transação criada, mas a resposta é um erro
+            return self._reply(502, {'errors': [{'message': 'bad gateway'}]})
+        self._reply(200, transaction)
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        query = parse_qs(urlparse(self.path).query)
+        if 'reference_key' in query:
+            found = self.server.created.get(query['reference_key'][0])
+            return self._reply(200, [found] if found else [])
+        self._reply(200, {'id': 123, 'status': 'paid', 'amount': 5000, 'paid_amount': 5000})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.connections = set()
+    server.created = {}
+    server.delay = 0
+    server.fail_after_create = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('PAGARME_API_URL', f'http://127.0.0.1:{server.server_port}/1')
+    monkeypatch.setenv('PAGARME_READ_TIMEOUT', '0.3')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_calls_reuse_one_keep_alive_connection(stand_in):
+    gateway = PagarMeGateway()
+    results = [gateway.process_pix_payment(5000, CUSTOMER) for _ in range(5)]
+    status = gateway.get_payment_status('123')
+
+    assert all(r['success'] and r['pix_qr_code'] == 'qr-code' for r in results)
+    assert status['status'] == 'paid' and status['amount'] == 50
+    assert len(stand_in.connections) == 1
+
+    metrics = gateway.get_metrics()
+    assert metrics['create_transaction']['count'] == 5
+    assert metrics['create_transaction [new_connection]']['count'] == 1
+    assert metrics['create_transaction [reused]']['count'] == 4
+    assert metrics['find_transaction [reused]']['count'] == 1
+
+
+def test_hung_gateway_times_out_without_retry(stand_in):
+    stand_in.delay = 1.0
+    gateway = PagarMeGateway()
+
+    started = time.perf_counter()
+    result = gateway.process_pix_payment(5000, CUSTOMER)
+
+    assert time.perf_counter() - started < 0.9
+    assert not result['success']
+    # Timeout de leitura é ambíguo: não repetir para não gerar cobrança dupla
+    assert result['retryable'] is False
+    assert result['reconcile'] is True
+    assert gateway.get_metrics()['create_transaction [error]']['count'] == 1
+
+
+def test_api_errors_are_not_retryable(stand_in):
+    result = PagarMeGateway().process_pix_payment(0, CUSTOMER)
+    assert not result['success']
+    assert 'amount inválido' in result['error']
+    assert result['retryable'] is False
+    assert result['reconcile'] is False
+
+
+def test_server_error_is_reconciled_by_reference_key(stand_in):
+    stand_in.fail_after_create = True
+    gateway = PagarMeGateway()
+
+    result = gateway.process_pix_payment(5000, CUSTOMER, reference_key='casino-7')
+    assert not result['success']
+    # 5xx depois de criar a transação: não repetir o POST, consultar pela chave
+    assert (result['retryable'], result['reconcile']) == (False, True)
+
+    found = gateway.find_payment('casino-7')
+    assert found['found'] and found['success']
+    assert (found['transaction_id'], found['status'], found['pix_qr_code']) == (123, 'waiting_payment', 'qr-code')
+    assert gateway.find_payment('casino-8')['found'] is False
+
+
+def test_refused_connection_is_retryable(monkeypatch):
+    # Porta sem servidor: a requisição nunca saiu, seguro postar de novo
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    port = server.server_port
+    server.server_close()
+    monkeypatch.setenv('PAGARME_API_URL', f'http://127.0.0.1:{port}/1')
+
+    result = PagarMeGateway().process_pix_payment(5000, CUSTOMER)
+    assert not result['success']
+    assert (result['retryable'], result['reconcile']) == (True, False)
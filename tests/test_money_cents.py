@@ -0,0 +1,108 @@
+"""
+Valores em centavos: conversão na borda, taxas e somas exatas, e a migração
+em lotes de um banco gravado em reais (Float)
+"""
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.models.payment_methods import SystemPaymentMethod
+from src.routes.casino import casino_bp
+from src.services.money import format_money, to_cents, to_reais
+from src.services.money_migration import backfill, expand, migrate_money
+
+ANON_ID = '88888888-8888-8888-8888-888888888888'
+
+
+def test_to_cents_rounds_half_up_and_rejects_garbage():
+    assert to_cents('10.005') == 1001
+    assert to_cents(0.1) == 10
+    assert to_cents(19.99) == 1999
+    assert to_cents(7) == 700
+    assert to_reais(1999) == 19.99
+    assert format_money(-5) == '-0.05'
+    for value in ('abc', None, True, float('nan'), 'inf'):
+        with pytest.raises(ValueError):
+            to_cents(value)
+
+
+def test_fees_and_sums_are_exact(app):
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    method = SystemPaymentMethod(method_name='paypal', display_name='PayPal', deposit_fee_bps=350,
+                                 deposit_fee_fixed_cents=0, min_deposit_cents=1000, max_deposit_cents=500000)
+    db.session.add(method)
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+    # 3,5% de R$ 10,10 = 35,35 centavos -> 35
+    assert method.calculate_deposit_fee(1010) == 35
+
+    client = app.test_client()
+    for _ in range(10):
+        response = client.post('/api/casino/deposit', json={'anon_id': ANON_ID, 'amount': '10.10'})
+        assert response.status_code == 200
+        assert response.get_json()['fee'] == 0.35
+
+    # Dez créditos de R$ 9,75: nenhum centavo perdido em ponto flutuante
+    assert db.session.get(AnonymousSession, 1).balance_cents == 9750
+    totals = dict(db.session.query(Transaction.transaction_type, db.func.sum(Transaction.amount_cents))
+                  .group_by(Transaction.transaction_type).all())
+    assert totals == {'deposit': 10100, 'fee': 350}
+    assert client.post('/api/casino/deposit', json={'anon_id': ANON_ID, 'amount': 'dez'}).status_code == 400
+
+
+def test_legacy_float_columns_are_migrated_in_chunks(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE anonymous_sessions (id INTEGER PRIMARY KEY, anon_id VARCHAR(36), balance FLOAT)'))
+        conn.execute(text('CREATE TABLE stats_rollups (day DATE, dimension VARCHAR(20), key VARCHAR(50), '
+                          'count INTEGER, total FLOAT NOT NULL, PRIMARY KEY (day, dimension, key))'))
+        conn.execute(text('INSERT INTO anonymous_sessions (anon_id, balance) VALUES (:a, :b)'),
+                     [{'a': f'a{i}', 'b': b} for i, b in enumerate((0.1 + 0.2, 19.99, 1e6 + 0.01, None, 0.0))])
+        conn.execute(text("INSERT INTO stats_rollups VALUES ('2024-01-01', 'transaction', 'bet', 3, 29.97), "
+                          "('2024-01-01', 'transaction', 'win', 1, 0.57), ('2024-01-02', 'transaction', 'bet', 1, 5)"))
+
+    # Primeira passada sem contract: a versão anterior continua gravando em reais
+    result = migrate_money(engine, chunk_size=2, contract_columns=False)
+    assert 'anonymous_sessions.balance_cents' in result['added']
+    assert result['backfilled'] == {'anonymous_sessions': 4, 'stats_rollups': 3}
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE anonymous_sessions SET balance = 2.5 WHERE anon_id = 'a0'"))
+
+    result = migrate_money(engine, chunk_size=2)
+    assert result['added'] == []
+    assert sorted(result['dropped']) == ['anonymous_sessions.balance', 'stats_rollups.total']
+
+    with engine.connect() as conn:
+        balances = conn.execute(text('SELECT balance_cents FROM anonymous_sessions ORDER BY id')).scalars().all()
+        totals = conn.execute(text('SELECT total_cents FROM stats_rollups ORDER BY day, key')).scalars().all()
+    assert balances == [250, 1999, 100000001, None, 0]
+    assert totals == [2997, 57, 500]
+    assert 'balance' not in {c['name'] for c in inspect(engine).get_columns('anonymous_sessions')}
+    assert migrate_money(engine) == {'added': [], 'backfilled': {}, 'dropped': []}
+    engine.dispose()
+
+
+def test_backfill_chunks_continue_after_the_last_key(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE anonymous_sessions (id INTEGER PRIMARY KEY, anon_id VARCHAR(36), balance FLOAT)'))
+        conn.execute(text('INSERT INTO anonymous_sessions (anon_id, balance) VALUES (:a, :b)'),
+                     [{'a': f'a{i}', 'b': i + 0.5} for i in range(7)])
+    expand(engine, tables=['anonymous_sessions'])
+
+    selects = []
+    listener = lambda conn, cursor, statement, parameters, *args: selects.append(parameters) \
+        if statement.lstrip().startswith('SELECT anonymous_sessions.id') else None
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert backfill(engine, tables=['anonymous_sessions'], chunk_size=3) == {'anonymous_sessions': 7}
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    # Um SELECT por lote, cada um a partir do último id do lote anterior (sem reler o começo)
+    assert len(selects) == 4
+    assert [params[-3] for params in selects[1:]] == [3, 6, 7]
+    engine.dispose()
@@ -0,0 +1,46 @@
+"""
+O motor vetorizado deve produzir exatamente os mesmos resultados que as
+funções escalares quando ambos usam o mesmo seed
+"""
+
+import numpy as np
+import pytest
+
+from src.routes.casino import process_game_result
+from src.services.game_engines import house_edges
+from src.services.outcome_engine import play_batch
+
+SEED = 20240601
+ROUNDS = 2000
+
+BET_OPTIONS = {
+    'roulette': [
+        {'type': 'number', 'value': 17}, {'type': 'number', 'value': 0},
+        {'type': 'color', 'value': 'red'}, {'type': 'color', 'value': 'black'},
+        {'type': 'even_odd', 'value': 'even'}, {'type': 'even_odd', 'value': 'odd'},
+        {'type': 'high_low', 'value': 'low'}, {'type': 'high_low', 'value': 'high'},
+        {'type': 'color', 'value': 'green'}, {'type': 'unknown', 'value': None},
+    ],
+    'dice': [
+        {'type': 'total', 'value': 7}, {'type': 'total', 'value': 2},
+        {'type': 'total', 'value': 12}, {'type': 'high_low', 'value': 'low'},
+        {'type': 'high_low', 'value': 'high'}, {'type': 'even_odd', 'value': 'even'},
+        {'type': 'even_odd', 'value': 'odd'}, {'type': 'total', 'value': 'sete'},
+    ],
+    'slots': [{}],
+}
+
+
+@pytest.mark.parametrize('game_type', sorted(BET_OPTIONS))
+def test_vectorized_matches_scalar_on_same_seed(game_type):
+    options = BET_OPTIONS[game_type]
+    # Apostas em centavos entre R$ 1,00 e R$ 500,00
+    amounts = np.random.default_rng(1).integers(100, 50_000, ROUNDS)
+    bets = [(options[i % len(options)], int(amounts[i])) for i in range(ROUNDS)]
+
+    scalar_rng = np.random.default_rng(SEED)
+    scalar = [process_game_result(game_type, bet_data, amount, scalar_rng) for bet_data, amount in bets]
+
+    vectorized = play_batch(game_type, bets, house_edges()[game_type], np.random.default_rng(SEED))
+
+    assert vectorized == scalar
@@ -0,0 +1,246 @@
+"""
+Fila de pagamentos: a rota responde 202 sem chamar o gateway e os workers
+executam a chamada com novas tentativas
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.models.payment_job import PaymentJob
+from src.routes.payments import payments_bp
+from src.services import payment_queue
+from src.services.payment_queue import PaymentWorkerPool, claim_next_job, run_pending_jobs
+
+ANON_ID = '22222222-2222-2222-2222-222222222222'
+
+
+class FakeGateway:
+    """Gateway que devolve as respostas programadas, em ordem"""
+
+    def __init__(self, *responses, lookups=()):
+        self.responses = list(responses)
+        self.lookups = list(lookups)
+        self.calls = []
+        self.lookup_calls = []
+
+    def process_payment(self, payment_data):
+        self.calls.append(payment_data)
+        return self.responses.pop(0)
+
+    def find_payment(self, reference_key):
+        self.lookup_calls.append(reference_key)
+        if self.lookups:
+            return self.lookups.pop(0)
+        return {'success': False, 'found': False, 'error': 'Transação não encontrada no gateway'}
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(payments_bp, url_prefix='/api/payments')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+    return app.test_client()
+
+
+def start_payment(client, method='credit_card'):
+    body = {'anon_id': ANON_ID, 'amount': 50, 'payment_method': method}
+    if method == 'credit_card':
+        body['card'] = {'card_hash': 'hash_abc'}
+    return client.post('/api/payments/process', json=body)
+
+
+def test_process_returns_202_without_calling_gateway(client, monkeypatch):
+    gateway = FakeGateway({'success': True, 'transaction_id': 'pg_1', 'status': 'paid'})
+    monkeypatch.setattr(payment_queue, 'payment_manager', gateway)
+
+    response = start_payment(client)
+    assert response.status_code == 202
+    transaction_id = response.get_json()['transaction_id']
+    assert gateway.calls == []
+    assert client.get(f'/api/payments/status/{transaction_id}').get_json()['job']['status'] == 'queued'
+
+    assert run_pending_jobs() == 1
+    status = client.get(f'/api/payments/status/{transaction_id}').get_json()
+    assert status['status'] == 'completed'
+    assert status['job']['status'] == 'succeeded'
+    assert db.session.get(PaymentJob, status['job']['id']).payload is None
+    assert db.session.query(AnonymousSession.balance_cents).filter_by(anon_id=ANON_ID).scalar() == 5000
+
+
+def test_transient_failures_are_retried_with_backoff(client, monkeypatch):
+    gateway = FakeGateway(
+        {'success': False, 'error': 'timeout', 'retryable': True},
+        {'success': True, 'transaction_id': 'pg_2', 'status': 'waiting_payment', 'pix_qr_code': 'qr'}
+    )
+    monkeypatch.setattr(payment_queue, 'payment_manager', gateway)
+    transaction_id = start_payment(client, method='pix').get_json()['transaction_id']
+
+    assert run_pending_jobs() == 1
+    job = PaymentJob.query.filter_by(transaction_id=transaction_id).one()
+    assert (job.status, job.attempts, job.last_error) == ('queued', 1, 'timeout')
+    assert job.next_run_at > datetime.utcnow()
+    # Ainda não chegou a hora da próxima tentativa
+    assert run_pending_jobs() == 0
+
+    job.next_run_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert run_pending_jobs() == 1
+
+    status = client.get(f'/api/payments/status/{transaction_id}').get_json()
+    assert status['status'] == 'processing'
+    assert status['pix_qr_code'] == 'qr'
+    assert status['job']['attempts'] == 2
+
+
+def _due_now(transaction_id):
+    job = PaymentJob.query.filter_by(transaction_id=transaction_id).one()
+    job.next_run_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    return job
+
+
+def test_ambiguous_failure_is_reconciled_without_posting_again(client, monkeypatch):
+    gateway = FakeGateway(
+        {'success': False, 'error': 'HTTP 502', 'retryable': False, 'reconcile': True},
+        lookups=[
+            {'success': False, 'found': False, 'error': 'Transação não encontrada no gateway'},
+            {'success': True, 'found': True, 'transaction_id': 'pg_9', 'status': 'paid'},
+        ]
+    )
+    monkeypatch.setattr(payment_queue, 'payment_manager', gateway)
+    transaction_id = start_payment(client).get_json()['transaction_id']
+
+    assert run_pending_jobs() == 1
+    job = PaymentJob.query.filter_by(transaction_id=transaction_id).one()
+    assert (job.status, job.reconcile) == ('queued', True)
+    assert gateway.calls[0]['reference_key'] == payment_queue.payment_reference(transaction_id)
+
+    # A transação ainda não aparece no gateway: continua reconciliando
+    _due_now(transaction_id)
+    assert run_pending_jobs() == 1
+    assert db.session.get(Transaction, transaction_id).status == 'pending'
+
+    _due_now(transaction_id)
+    assert run_pending_jobs() == 1
+    transaction = db.session.get(Transaction, transaction_id)
+    assert (transaction.status, transaction.external_transaction_id) == ('completed', 'pg_9')
+    assert len(gateway.calls) == 1
+    assert gateway.lookup_calls == [payment_queue.payment_reference(transaction_id)] * 2
+
+
+def test_expired_lease_checks_gateway_before_posting_again(client, monkeypatch):
+    gateway = FakeGateway(lookups=[{'success': True, 'found': True, 'transaction_id': 'pg_5', 'status': 'paid'}])
+    monkeypatch.setattr(payment_queue, 'payment_manager', gateway)
+    transaction_id = start_payment(client).get_json()['transaction_id']
+
+    # Worker reservou o job, criou a transação no gateway e morreu antes do commit
+    job_id = claim_next_job('worker-a')
+    job = db.session.get(PaymentJob, job_id)
+    job.locked_at = datetime.utcnow() - timedelta(seconds=payment_queue.LEASE_SECONDS + 1)
+    db.session.commit()
+
+    assert run_pending_jobs() == 1
+    assert gateway.calls == []
+    assert db.session.get(Transaction, transaction_id).status == 'completed'
+    assert db.session.query(AnonymousSession.balance_cents).filter_by(anon_id=ANON_ID).scalar() == 5000
+
+
+class RaisingGateway(FakeGateway):
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def process_payment(self, payment_data):
+        self.calls.append(payment_data)
+        raise self.error
+
+
+def test_escaped_exceptions_are_classified(client, monkeypatch):
+    refused = requests.exceptions.ConnectionError(MaxRetryError(None, '/transactions', NewConnectionError(None, 'refused')))
+    monkeypatch.setattr(payment_queue, 'payment_manager', RaisingGateway(refused))
+    transaction_id = start_payment(client, method='pix').get_json()['transaction_id']
+    assert run_pending_jobs() == 1
+    job = PaymentJob.query.filter_by(transaction_id=transaction_id).one()
+    assert (job.status, job.reconcile) == ('queued', False)
+
+    # Exceção depois do envio: resultado desconhecido, só reconciliar
+    monkeypatch.setattr(payment_queue, 'payment_manager', RaisingGateway(ValueError('resposta ilegível')))
+    transaction_id = start_payment(client, method='pix').get_json()['transaction_id']
+    assert run_pending_jobs() == 1
+    job = PaymentJob.query.filter_by(transaction_id=transaction_id).one()
+    assert (job.status, job.reconcile) == ('queued', True)
+
+
+def test_card_secrets_are_never_stored(client, monkeypatch):
+    monkeypatch.setattr(payment_queue, 'payment_manager', FakeGateway())
+    raw_card = {'number': '4111111111111111', 'holder_name': 'X', 'expiration_date': '1230', 'cvv': '123'}
+    response = client.post('/api/payments/process', json={
+        'anon_id': ANON_ID, 'amount': 50, 'payment_method': 'credit_card', 'card': raw_card
+    })
+    assert response.status_code == 400
+    assert Transaction.query.count() == 0
+
+    transaction_id = start_payment(client).get_json()['transaction_id']
+    job = PaymentJob.query.filter_by(transaction_id=transaction_id).one()
+    assert job.payload['card'] == {'card_hash': 'hash_abc'}
+    assert 'card' not in db.session.get(Transaction, transaction_id).extra_data['gateway_request']
+
+
+def test_scrub_removes_cards_stored_by_previous_versions(client):
+    raw_card = {'number': '4111111111111111', 'holder_name': 'X', 'expiration_date': '1230', 'cvv': '123'}
+    transaction = Transaction(anon_id=ANON_ID, transaction_type='deposit', amount_cents=5000, balance_after_cents=0, status='pending',
+                              extra_data={'gateway_request': {'method': 'credit_card', 'card': raw_card}})
+    db.session.add(transaction)
+    db.session.flush()
+    db.session.add(PaymentJob(transaction_id=transaction.id, payload={'method': 'credit_card', 'card': raw_card}))
+    db.session.commit()
+
+    assert payment_queue.scrub_card_data(chunk_size=1) == 2
+    assert payment_queue.scrub_card_data() == 0
+    db.session.expire_all()
+    assert PaymentJob.query.one().payload == {'method': 'credit_card'}
+    assert db.session.get(Transaction, transaction.id).extra_data == {'gateway_request': {'method': 'credit_card'}}
+
+
+def test_refusal_fails_without_retry(client, monkeypatch):
+    gateway = FakeGateway({'success': False, 'error': 'Pagamento recusado'})
+    monkeypatch.setattr(payment_queue, 'payment_manager', gateway)
+    transaction_id = start_payment(client).get_json()['transaction_id']
+
+    assert run_pending_jobs() == 1
+    assert db.session.get(Transaction, transaction_id).status == 'failed'
+    assert len(gateway.calls) == 1
+
+
+def test_job_is_claimed_once(client, monkeypatch):
+    monkeypatch.setattr(payment_queue, 'payment_manager', FakeGateway())
+    start_payment(client, method='pix')
+
+    assert claim_next_job('worker-a') is not None
+    assert claim_next_job('worker-b') is None
+
+
+def test_worker_pool_drains_queue(app, client, monkeypatch):
+    gateway = FakeGateway(*[{'success': True, 'transaction_id': f'pg_{i}', 'status': 'paid'} for i in range(5)])
+    monkeypatch.setattr(payment_queue, 'payment_manager', gateway)
+    transaction_ids = [start_payment(client).get_json()['transaction_id'] for _ in range(5)]
+
+    pool = PaymentWorkerPool(app, concurrency=3, poll_interval=0.05).start()
+    try:
+        deadline = datetime.utcnow() + timedelta(seconds=10)
+        while datetime.utcnow() < deadline:
+            db.session.expire_all()
+            if PaymentJob.query.filter(PaymentJob.status != 'succeeded').count() == 0:
+                break
+    finally:
+        pool.stop()
+
+    db.session.expire_all()
+    assert {db.session.get(Transaction, i).status for i in transaction_ids} == {'completed'}
+    assert len(gateway.calls) == 5
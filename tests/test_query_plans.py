@@ -0,0 +1,83 @@
+"""
+Regressão de planos de consulta: cada consulta do caminho quente deve usar
+índice (SEARCH) em vez de varrer a tabela inteira (SCAN)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from src.database import db
+from src.migrations import run_migrations
+from src.models.anon_session import AnonymousSession
+from src.models.casino import CasinoSettings, GameSession, SessionTotals, Transaction
+from src.services.settings_cache import SETTINGS_VERSION_KEY
+
+ANON_ID = '00000000-0000-0000-0000-000000000000'
+
+HOT_QUERIES = {
+    'session_by_anon_id': lambda: select(AnonymousSession).where(
+        AnonymousSession.anon_id == ANON_ID
+    ),
+    'active_game_session': lambda: select(GameSession).where(
+        GameSession.anon_id == ANON_ID,
+        GameSession.game_type == 'roulette',
+        GameSession.status == 'active'
+    ),
+    'webhook_transaction_lookup': lambda: select(Transaction).where(
+        Transaction.external_transaction_id == '12345'
+    ),
+    'transaction_history_page': lambda: select(Transaction).where(
+        Transaction.anon_id == ANON_ID
+    ).order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(20),
+    'transaction_history_cursor': lambda: select(Transaction).where(
+        Transaction.anon_id == ANON_ID,
+        (Transaction.created_at < datetime.utcnow()) | (
+            (Transaction.created_at == datetime.utcnow()) & (Transaction.id < 100)
+        )
+    ).order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(21),
+    'game_history_page': lambda: select(GameSession).where(
+        GameSession.anon_id == ANON_ID
+    ).order_by(GameSession.start_time.desc(), GameSession.id.desc()).limit(20),
+    'stale_sessions': lambda: select(AnonymousSession.id).where(
+        AnonymousSession.last_activity < datetime.utcnow() - timedelta(days=30)
+    ),
+    'balance_with_totals': lambda: select(AnonymousSession.balance_cents, SessionTotals).outerjoin(
+        SessionTotals, SessionTotals.anon_id == AnonymousSession.anon_id
+    ).where(AnonymousSession.anon_id == ANON_ID),
+    'settings_version': lambda: select(CasinoSettings.setting_value).where(
+        CasinoSettings.setting_key == SETTINGS_VERSION_KEY
+    ),
+}
+
+
+def explain(statement):
+    """Executar EXPLAIN QUERY PLAN e devolver as linhas de detalhe"""
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + str(compiled), params
+    ).fetchall()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(app, name):
+    plan = explain(HOT_QUERIES[name]())
+
+    scans = [step for step in plan if step.startswith('SCAN')]
+    assert not scans, f'{name} faz varredura completa: {plan}'
+    assert not any('TEMP B-TREE' in step for step in plan), f'{name} ordena em memória: {plan}'
+
+
+def test_migration_creates_indexes_on_existing_database(app):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.drop(db.engine)
+
+    created = run_migrations()['indexes']
+
+    assert 'ix_transactions_external_id' in created
+    assert 'ix_game_sessions_anon_game_status' in created
+    assert not run_migrations()['indexes']
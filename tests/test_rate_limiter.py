@@ -0,0 +1,107 @@
+"""
+Rate limiter: janela deslizante, despejo LRU, backend compartilhado e middleware
+"""
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from src.services.rate_limiter import MemoryBackend, SQLiteBackend, RateLimiter, init_rate_limiting
+
+
+class FakeClock:
+    def __init__(self, now=1_080_000.0):  # início de janela de 60s e de 3600s
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_sliding_window_blocks_and_recovers():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBackend(), clock=clock)
+
+    assert all(limiter.hit('ip', 5, 60) for _ in range(5))
+    assert not limiter.hit('ip', 5, 60)
+
+    # Metade da janela seguinte: ainda conta metade das 5 anteriores
+    clock.now += 60 + 30
+    assert [limiter.hit('ip', 5, 60) for _ in range(3)] == [True, True, False]
+
+    # Duas janelas depois, tudo liberado
+    clock.now += 120
+    assert all(limiter.hit('ip', 5, 60) for _ in range(5))
+
+
+def test_memory_backend_evicts_idle_keys():
+    backend = MemoryBackend(max_keys=3)
+    limiter = RateLimiter(backend, clock=FakeClock())
+    for ip in ('a', 'b', 'c'):
+        limiter.hit(ip, 1, 60)
+    limiter.hit('a', 1, 60)  # 'a' volta a ser a mais recente
+    limiter.hit('d', 1, 60)
+
+    assert len(backend) == 3
+    # 'b' foi despejada: começa do zero
+    assert limiter.hit('b', 1, 60)
+    assert not limiter.hit('a', 1, 60)
+
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    clock = FakeClock()
+    worker_a = RateLimiter(SQLiteBackend(path), clock=clock)
+    worker_b = RateLimiter(SQLiteBackend(path), clock=clock)
+
+    assert [worker_a.hit('ip', 4, 60), worker_b.hit('ip', 4, 60),
+            worker_a.hit('ip', 4, 60), worker_b.hit('ip', 4, 60)] == [True] * 4
+    assert not worker_a.hit('ip', 4, 60)
+    assert not worker_b.hit('ip', 4, 60)
+
+
+def test_middleware_applies_configured_limits(app, monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_REQUESTS_PER_MINUTE', '3')
+
+    @app.route('/api/ping')
+    def ping():
+        return {'ok': True}
+
+    init_rate_limiting(app, RateLimiter(MemoryBackend(), clock=FakeClock()))
+    client = app.test_client()
+
+    assert [client.get('/api/ping').status_code for _ in range(3)] == [200] * 3
+    blocked = client.get('/api/ping')
+    assert blocked.status_code == 429
+    assert int(blocked.headers['Retry-After']) > 0
+    # X-Forwarded-For sem proxy confiável não muda a chave
+    assert client.get('/api/ping', headers={'X-Forwarded-For': '10.0.0.9'}).status_code == 429
+    # Outro IP tem seu próprio limite
+    assert client.get('/api/ping', environ_base={'REMOTE_ADDR': '10.0.0.9'}).status_code == 200
+
+
+def test_forwarded_for_is_trusted_only_through_configured_proxies(app, monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_REQUESTS_PER_MINUTE', '2')
+
+    @app.route('/api/ping')
+    def ping():
+        return {'ok': True}
+
+    # Um proxy: vale o último endereço de X-Forwarded-For, o que o proxy viu
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    init_rate_limiting(app, RateLimiter(MemoryBackend(), clock=FakeClock()))
+    client = app.test_client()
+
+    spoofed = [client.get('/api/ping', headers={'X-Forwarded-For': f'6.6.6.{i}, 10.0.0.1'}).status_code
+               for i in range(3)]
+    assert spoofed == [200, 200, 429]
+    assert client.get('/api/ping', headers={'X-Forwarded-For': '10.0.0.2'}).status_code == 200
+
+
+def test_gateway_webhook_is_exempt(app, monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_REQUESTS_PER_MINUTE', '1')
+
+    @app.route('/api/payments/webhook/pagarme', methods=['POST'])
+    def webhook():
+        return {'ok': True}
+
+    init_rate_limiting(app, RateLimiter(MemoryBackend(), clock=FakeClock()))
+    client = app.test_client()
+    assert [client.post('/api/payments/webhook/pagarme').status_code for _ in range(5)] == [200] * 5
@@ -0,0 +1,69 @@
+"""
+Limpeza de sessões em lotes: remove sessões inativas e linhas órfãs, e
+preserva sessões com saldo ou pagamento em andamento
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from src.database import db
+from src.models import balance_ledger
+from src.models.anon_session import AnonymousSession
+from src.models.balance_ledger import BalanceSnapshot, LedgerEntry
+from src.models.casino import GameRound, GameSession, SessionTotals, Transaction
+from src.services.ledger import record_transaction
+from src.services.session_cleanup import SessionSweeper
+
+
+def create_session(days_inactive, balance=0, pending_deposit=False):
+    anon_id = str(uuid.uuid4())
+    db.session.add(AnonymousSession(
+        anon_id=anon_id, balance_cents=balance,
+        last_activity=datetime.utcnow() - timedelta(days=days_inactive)
+    ))
+    game = GameSession(anon_id=anon_id, user_id=anon_id, game_type='dice', initial_balance_cents=1000, current_balance_cents=0)
+    db.session.add(game)
+    db.session.flush()
+    db.session.add(GameRound(session_id=game.id, user_id=anon_id, round_number=1, bet_amount_cents=1000))
+    record_transaction(anon_id, 'bet', 1000, balance_after=0, game_session_id=game.id)
+    # Depósito e aposta no ledger de saldo, com snapshot (intervalo 2)
+    AnonymousSession.credit(anon_id, 1000, entry_type='deposit')
+    AnonymousSession.debit(anon_id, 1000, entry_type='bet')
+    AnonymousSession.query.filter_by(anon_id=anon_id)\
+        .update({'last_activity': datetime.utcnow() - timedelta(days=days_inactive)})
+    if pending_deposit:
+        record_transaction(anon_id, 'deposit', 5000, balance_after=0, status='processing')
+    return anon_id
+
+
+def test_sweeper_deletes_in_chunks_and_keeps_protected_sessions(app, monkeypatch):
+    monkeypatch.setattr(balance_ledger, 'SNAPSHOT_INTERVAL', 2)
+    stale = [create_session(45) for _ in range(5)]
+    funded = create_session(45, balance=2500)
+    paying = create_session(45, pending_deposit=True)
+    recent = create_session(1)
+    db.session.commit()
+
+    sweeper = SessionSweeper()
+    deleted = sweeper.run(days=30, chunk_size=2, pause=0)
+
+    assert deleted['sessions'] == 5
+    assert deleted['game_rounds'] == deleted['game_sessions'] == deleted['session_totals'] == 5
+    assert deleted['transactions'] == 5
+
+    remaining = {anon_id for (anon_id,) in db.session.query(AnonymousSession.anon_id)}
+    assert remaining == {funded, paying, recent}
+    for model in (Transaction, GameSession, SessionTotals):
+        assert {row.anon_id for row in model.query} == remaining
+    assert GameRound.query.count() == 3
+
+    stats = sweeper.get_stats()
+    assert stats['state'] == 'idle' and stats['runs'] == 1
+    # 3 lotes de sessões (2 + 2 + 1) e pelo menos um por fase seguinte
+    assert stats['chunks'] >= 3 + 5
+    assert not set(stale) & remaining
+
+    # O ledger é append-only: os lançamentos das sessões removidas ficam
+    assert 'ledger_entries' not in deleted and 'balance_snapshots' not in deleted
+    assert LedgerEntry.query.count() == 2 * 8
+    assert {row.anon_id for row in BalanceSnapshot.query} >= set(stale)
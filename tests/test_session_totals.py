@@ -0,0 +1,114 @@
+"""
+session_totals mantido na mesma transação de cada escrita no ledger: depois
+de depósito, saque, apostas e crédito por webhook, o agregado incremental é
+igual ao recálculo, e /api/casino/balance lê uma única linha
+"""
+
+import numpy as np
+from sqlalchemy import event
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import SessionTotals, Transaction
+from src.models.payment_methods import SystemPaymentMethod
+from src.routes.casino import casino_bp
+from src.services import outcome_engine
+from src.services.ledger import add_to_session_totals, rebuild_session_totals, record_transaction
+from src.services.webhook_inbox import append_event, drain_inbox
+
+ANON_ID = '12121212-1212-1212-1212-121212121212'
+
+
+def _totals():
+    db.session.expire_all()
+    return {
+        row.anon_id: {column: getattr(row, column) for pair in SessionTotals.COLUMNS.values() for column in pair}
+        for row in SessionTotals.query
+    }
+
+
+def test_incremental_totals_match_rebuild(app, monkeypatch):
+    # Semente fixa: nos dois /bet os dados somam 3 (ganha) e depois 9 (perde)
+    monkeypatch.setattr(outcome_engine, 'default_rng', np.random.default_rng(3))
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(SystemPaymentMethod(method_name='pix', display_name='PIX', deposit_fee_bps=150,
+                                       deposit_fee_fixed_cents=0, min_deposit_cents=100, max_deposit_cents=500000,
+                                       min_withdrawal_cents=100, max_withdrawal_cents=500000))
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.commit()
+    client = app.test_client()
+
+    assert client.post('/api/casino/deposit', json={
+        'anon_id': ANON_ID, 'amount': '200.00', 'payment_method': 'pix'
+    }).status_code == 200
+    assert client.post('/api/casino/withdraw', json={
+        'anon_id': ANON_ID, 'amount': 25, 'payment_method': 'pix', 'paypal_email': 'a@b.c'
+    }).status_code == 200
+    payouts = []
+    for _ in range(2):
+        response = client.post('/api/casino/bet', json={
+            'anon_id': ANON_ID, 'game_type': 'dice', 'bet_amount': 10, 'bet_data': {'type': 'high_low', 'value': 'low'}
+        })
+        assert response.status_code == 200
+        payouts.append(response.get_json()['result']['payout'])
+    assert payouts[0] > 0 and payouts[1] == 0
+    assert client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': [
+        {'game_type': 'slots', 'bet_amount': 3},
+        {'game_type': 'roulette', 'bet_amount': 5, 'bet_data': {'type': 'color', 'value': 'red'}},
+    ] * 3}).status_code == 200
+
+    # Depósito pendente creditado pelo webhook
+    record_transaction(ANON_ID, 'deposit', 7000, balance_after=0, status='processing',
+                       payment_method='pix', external_transaction_id='pg_77')
+    db.session.commit()
+    append_event('pagarme', 'pg_77', 'transaction_status_changed', 'paid', {})
+    assert drain_inbox() == 1
+
+    incremental = _totals()
+    totals = incremental[ANON_ID]
+    assert totals['deposit_count'] == 2 and totals['total_deposited_cents'] == 27000
+    assert totals['withdraw_count'] == 1 and totals['total_withdrawn_cents'] == 2500
+    assert totals['bet_count'] == 8 and totals['win_count'] >= 1
+    assert Transaction.query.filter_by(transaction_type='fee').count() == 1
+
+    assert rebuild_session_totals() == 1
+    assert _totals() == incremental
+
+
+def test_balance_reads_a_single_row(app):
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=5000))
+    record_transaction(ANON_ID, 'bet', 1000, balance_after=4000)
+    record_transaction(ANON_ID, 'win', 3000, balance_after=7000)
+    db.session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = app.test_client().get(f'/api/casino/balance?anon_id={ANON_ID}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    body = response.get_json()
+    assert (body['total_bet'], body['total_won'], body['counts']['bets']) == (10.0, 30.0, 1)
+    assert len(statements) == 1
+    assert 'session_totals' in statements[0] and 'transactions' not in statements[0]
+
+
+def test_first_write_is_a_single_upsert(app):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        add_to_session_totals(ANON_ID, 'bet', 500, game_type='dice')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    # Sem UPDATE seguido de INSERT: escritas concorrentes não colidem na chave
+    writes = [s for s in statements if 'session_totals' in s and 'player_daily_totals' not in s]
+    assert len(writes) == 1 and 'ON CONFLICT' in writes[0]
+
+    add_to_session_totals(ANON_ID, 'bet', 300, game_type='dice')
+    db.session.commit()
+    assert _totals()[ANON_ID]['total_bet_cents'] == 800 and _totals()[ANON_ID]['bet_count'] == 2
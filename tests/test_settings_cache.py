@@ -0,0 +1,62 @@
+from sqlalchemy import event
+
+from src.config import Config
+from src.database import db
+from src.services.settings_cache import SettingsCache, bump_settings_version, read_settings_version, settings_cache
+
+
+def test_bet_limits_served_from_memory(app):
+    Config.initialize_default_settings()
+    settings_cache.invalidate()
+    before = settings_cache.get_stats()['db_reads']
+
+    for _ in range(100):
+        assert Config.get_bet_limits()['dice'] == 500
+
+    # Apenas a carga inicial do snapshot consulta casino_settings
+    assert settings_cache.get_stats()['db_reads'] == before + 1
+
+
+def test_set_setting_invalidates_other_workers(app):
+    Config.initialize_default_settings()
+    other_worker = SettingsCache(check_interval=0)
+    assert other_worker.lookup('min_bet_dice') == (True, 5)
+
+    assert Config.set_setting('min_bet_dice', 8, 'number')
+
+    assert other_worker.lookup('min_bet_dice') == (True, 8)
+    assert other_worker.version_checks == 1
+    assert other_worker.refreshes == 2
+
+
+def test_public_payload_serialized_once_per_version(app):
+    Config.initialize_default_settings()
+    other_worker = SettingsCache(check_interval=0)
+    build = lambda snapshot: dict(snapshot.public)
+
+    body, etag = other_worker.serialized(build)
+    assert body == b'{}'
+    assert other_worker.serialized(build) == (body, etag)
+    assert other_worker.serializations == 1
+
+    assert Config.set_setting('min_bet_dice', 8, 'number', is_public=True)
+
+    body, new_etag = other_worker.serialized(build)
+    assert body == b'{"min_bet_dice":8.0}' and new_etag != etag
+    assert other_worker.serializations == 2
+
+
+def test_version_bump_is_a_single_upsert(app):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        # Primeira alteração: cria a linha de versão sem UPDATE prévio
+        bump_settings_version()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1 and 'ON CONFLICT' in statements[0]
+
+    bump_settings_version()
+    db.session.commit()
+    assert read_settings_version() == 2
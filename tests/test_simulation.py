@@ -0,0 +1,15 @@
+from src.simulation import BET_CATALOG, exact_rtp, simulate
+
+
+def test_exact_rtp_of_even_money_roulette_bet():
+    # 18/37 de ganhar 2x, descontada a vantagem da casa sobre o lucro
+    expected = 18 / 37 * (2 - 0.027)
+    assert abs(exact_rtp('roulette', BET_CATALOG['roulette']['color']) - expected) < 1e-12
+
+
+def test_simulation_confidence_interval_covers_exact_rtp():
+    report = simulate('dice', 'even_odd', rounds=200_000, processes=1, chunk_size=50_000, seed=7)
+
+    assert report['rounds'] == 200_000
+    assert report['within_ci95']
+    assert report['rounds_per_second_per_core'] > 0
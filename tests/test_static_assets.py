@@ -0,0 +1,58 @@
+"""
+Manifesto dos estáticos: URLs com hash imutáveis, 304 por ETag e variante
+comprimida escolhida pelo Accept-Encoding
+"""
+
+import gzip
+import os
+import re
+
+from flask import Flask, request
+
+from src.services.static_assets import IMMUTABLE, AssetManifest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _client():
+    manifest = AssetManifest(os.path.join(ROOT, 'src', 'static'), os.path.join(ROOT, 'index.html')).build()
+    app = Flask(__name__)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        return manifest.respond(manifest.lookup(path) or manifest.index, request)
+
+    return app.test_client()
+
+
+def test_index_links_hashed_assets_served_immutable_and_compressed():
+    client = _client()
+    index = client.get('/')
+    assert index.headers['Cache-Control'] == 'no-cache'
+    hashed = re.search(r'href="(src/static/css/style\.[0-9a-f]{10}\.css)"', index.get_data(as_text=True)).group(1)
+
+    original = client.get('/src/static/css/style.css')
+    compressed = client.get('/' + hashed, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Cache-Control'] == IMMUTABLE
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == original.get_data()
+    assert len(compressed.get_data()) < len(original.get_data())
+
+    refused = client.get('/' + hashed, headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_etag_revalidation_returns_304():
+    client = _client()
+    first = client.get('/src/static/js/main.js')
+    etag = first.headers['ETag']
+    assert etag.startswith('"') and not etag.startswith('W/')
+
+    again = client.get('/src/static/js/main.js', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+    # Caminho inexistente continua caindo no index.html
+    assert b'<html' in client.get('/jogos/roleta').get_data().lower()
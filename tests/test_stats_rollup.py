@@ -0,0 +1,73 @@
+"""
+Os contadores incrementais de stats_rollups devem bater com o recálculo a
+partir do ledger, e /api/admin/stats lê só o rollup
+"""
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import StatsRollup, Transaction
+from src.models.payment_methods import SystemPaymentMethod
+from src.routes.casino import casino_bp
+from src.services import stats_rollup
+from src.services.money import to_cents
+from src.services.stats_rollup import get_admin_stats, rebuild_stats_rollups
+
+ANON_ID = '55555555-5555-5555-5555-555555555555'
+
+
+def _rollup_rows():
+    return {
+        (str(row.day), row.dimension, row.key): (row.count, row.total_cents)
+        for row in StatsRollup.query.all()
+    }
+
+
+def test_incremental_rollup_matches_rebuild(app, monkeypatch):
+    monkeypatch.setattr(stats_rollup, 'CACHE_SECONDS', 0)
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    db.session.add(SystemPaymentMethod(method_name='pix', display_name='PIX', deposit_fee_bps=150,
+                                       deposit_fee_fixed_cents=0, min_deposit_cents=100, max_deposit_cents=500000))
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=1_000_000))
+    db.session.commit()
+
+    client = app.test_client()
+    # Depósito com taxa: a taxa tem transação própria, mas já está no valor bruto
+    assert client.post('/api/casino/deposit', json={
+        'anon_id': ANON_ID, 'amount': 200, 'payment_method': 'pix'
+    }).status_code == 200
+    for bets in ([{'game_type': 'dice', 'bet_amount': 10, 'bet_data': {'type': 'high_low', 'value': 'high'}}] * 4, [
+        {'game_type': 'roulette', 'bet_amount': 5, 'bet_data': {'type': 'even_odd', 'value': 'odd'}},
+        {'game_type': 'slots', 'bet_amount': 7},
+    ] * 10):
+        response = client.post('/api/casino/bets/batch', json={'anon_id': ANON_ID, 'bets': bets})
+        assert response.status_code == 200
+
+    incremental = _rollup_rows()
+    stats = get_admin_stats()
+    assert rebuild_stats_rollups() == len(incremental)
+    assert _rollup_rows() == incremental
+
+    assert stats['total_transactions'] == Transaction.query.count()
+    assert stats['by_transaction_type']['fee'] == {'count': 1, 'total': 3.0}
+    assert to_cents(stats['total_volume']) == db.session.query(db.func.sum(Transaction.amount_cents))\
+        .filter(Transaction.transaction_type != 'fee').scalar()
+    assert stats['total_game_sessions'] == 3
+    assert stats['by_game_type']['roulette']['rounds'] == 10
+    assert stats['by_game_type']['dice']['total_bet'] == 40.0
+    assert stats['by_game_type']['slots']['total_bet'] == 70.0
+    assert len(stats['by_day']) == 1
+
+
+def test_admin_stats_are_cached_until_invalidated(app, monkeypatch):
+    monkeypatch.setattr(stats_rollup, 'CACHE_SECONDS', 60)
+    stats_rollup.invalidate_cache()
+    assert get_admin_stats()['total_transactions'] == 0
+
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=0))
+    db.session.add(Transaction(anon_id=ANON_ID, transaction_type='deposit', amount_cents=5000, balance_after_cents=5000))
+    db.session.commit()
+    assert get_admin_stats()['total_transactions'] == 0
+
+    # O recálculo inclui a linha gravada fora do ledger e limpa o cache
+    rebuild_stats_rollups()
+    assert get_admin_stats()['by_transaction_type']['deposit'] == {'count': 1, 'total': 50.0}
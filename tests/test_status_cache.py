@@ -0,0 +1,77 @@
+"""
+Cache de status do gateway: TTL, single-flight e invalidação
+"""
+
+import threading
+import time
+
+from src.services.status_cache import GatewayStatusCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_status_is_cached_until_ttl_expires():
+    clock = FakeClock()
+    cache = GatewayStatusCache(ttl=5, error_ttl=1, clock=clock)
+    calls = []
+
+    def loader(external_id):
+        calls.append(external_id)
+        return {'success': True, 'status': 'waiting_payment'}
+
+    assert cache.lookup('pg_1', loader) == ({'success': True, 'status': 'waiting_payment'}, False)
+    clock.now = 4.9
+    assert cache.lookup('pg_1', loader)[1] is True
+    clock.now = 5.1
+    assert cache.lookup('pg_1', loader)[1] is False
+    assert calls == ['pg_1', 'pg_1']
+
+
+def test_concurrent_lookups_share_one_gateway_call():
+    cache = GatewayStatusCache(ttl=5)
+    calls = []
+    release = threading.Event()
+
+    def slow_loader(external_id):
+        calls.append(external_id)
+        release.wait(5)
+        return {'success': True, 'status': 'paid'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.lookup('pg_2', slow_loader)))
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    while cache.get_stats()['coalesced'] < 19:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['pg_2']
+    assert [r[0]['status'] for r in results] == ['paid'] * 20
+    assert sum(1 for _, shared in results if not shared) == 1
+
+
+def test_invalidate_drops_entry_and_in_flight_result():
+    cache = GatewayStatusCache(ttl=60)
+    statuses = iter(['waiting_payment', 'paid', 'paid'])
+
+    def loader(external_id):
+        status = next(statuses)
+        if status == 'waiting_payment':
+            # Webhook chega enquanto a consulta está em andamento
+            cache.invalidate(external_id)
+        return {'success': True, 'status': status}
+
+    assert cache.lookup('pg_3', loader)[0]['status'] == 'waiting_payment'
+    # O resultado obsoleto não ficou em cache
+    assert cache.lookup('pg_3', loader)[0]['status'] == 'paid'
+    cache.invalidate('pg_3')
+    assert cache.lookup('pg_3', loader) == ({'success': True, 'status': 'paid'}, False)
@@ -0,0 +1,108 @@
+"""
+Meses fechados saem da tabela quente para arquivos comprimidos; o histórico
+por cursor continua igual e só abre os arquivos quando chega neles
+"""
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.models.transaction_archive import TransactionArchive
+from src.routes.anon import anon_bp
+from src.routes.casino import casino_bp
+from src.services import transaction_archive
+from src.services.ledger import get_session_totals, rebuild_session_totals, record_transactions
+from src.services.transaction_archive import archive_closed_months, attach_archive, paginate_transactions
+
+ANON_ID = '77777777-7777-7777-7777-777777777777'
+NOW = datetime(2024, 6, 15)
+
+
+def _history(per_page=7):
+    ids, cursor = [], ''
+    while True:
+        items, cursor = paginate_transactions(
+            Transaction.query.filter_by(anon_id=ANON_ID), Transaction.anon_id == ANON_ID,
+            cursor=cursor, per_page=per_page
+        )
+        ids += [item.id for item in items]
+        if not cursor:
+            return ids
+
+
+def test_archive_closed_months_keeps_history_and_totals(app, tmp_path, monkeypatch):
+    monkeypatch.setenv('TRANSACTION_ARCHIVE_DIR', str(tmp_path / 'archive'))
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=10000))
+    rows = [
+        {'anon_id': ANON_ID, 'transaction_type': 'bet', 'amount_cents': 100 + 100 * day, 'balance_after_cents': 0,
+         'created_at': datetime(2024, month, day + 1, 12)}
+        for month in range(1, 7) for day in range(5)
+    ]
+    # Fevereiro tem um depósito ainda pendente: o mês fica na tabela quente
+    rows.append({'anon_id': ANON_ID, 'transaction_type': 'deposit', 'amount_cents': 5000, 'balance_after_cents': 0,
+                 'status': 'pending', 'created_at': datetime(2024, 2, 20)})
+    # Saque pendente (sem transição posterior) não impede o arquivamento de março
+    rows.append({'anon_id': ANON_ID, 'transaction_type': 'withdraw', 'amount_cents': 2000, 'balance_after_cents': 0,
+                 'status': 'pending', 'created_at': datetime(2024, 3, 20)})
+    record_transactions(rows)
+    db.session.commit()
+
+    history = _history()
+    totals = get_session_totals(ANON_ID)
+
+    result = archive_closed_months(now=NOW, hot_months=2)
+    assert result == {'2024-01': 5, '2024-02': 'open', '2024-03': 6, '2024-04': 5}
+    assert Transaction.query.count() == len(rows) - 16
+    assert (tmp_path / 'archive' / 'transactions_2024_03.db.gz').exists()
+
+    # Os arquivos intercalam com fevereiro, que continua quente
+    assert _history() == history
+    assert _history(per_page=50) == history
+
+    # Modo por número de página das duas rotas: mesmo histórico e total com os arquivos
+    app.register_blueprint(casino_bp, url_prefix='/api/casino')
+    app.register_blueprint(anon_bp, url_prefix='/api/anon')
+    client = app.test_client()
+    for url, key in ((f'/api/casino/transactions?anon_id={ANON_ID}', None),
+                     (f'/api/anon/session/{ANON_ID}/transactions?', 'pagination')):
+        ids = []
+        for page in range(1, 6):
+            body = client.get(f'{url}&per_page=7&page={page}').get_json()
+            ids += [item['id'] for item in body['transactions']]
+            pagination = body[key] if key else body
+            assert (pagination['total'], pagination['pages']) == (len(rows), 5)
+        assert ids == history
+        count = client.get(f'{url}&cursor=&include_total=true').get_json()
+        assert (count[key] if key else count)['total'] == len(rows)
+
+    rebuild_session_totals()
+    assert get_session_totals(ANON_ID) == totals
+
+    path = attach_archive('2024-01')
+    with sqlite3.connect(path) as conn:
+        assert conn.execute('SELECT COUNT(*), SUM(amount_cents) FROM transactions').fetchone() == (5, 1500)
+    assert db.session.get(TransactionArchive, '2024-01').purged_at is not None
+
+
+def test_recent_page_does_not_open_archives(app, tmp_path, monkeypatch):
+    monkeypatch.setenv('TRANSACTION_ARCHIVE_DIR', str(tmp_path / 'archive'))
+    record_transactions([
+        {'anon_id': ANON_ID, 'transaction_type': 'bet', 'amount_cents': 100, 'balance_after_cents': 0,
+         'created_at': datetime(2024, month, 1)}
+        for month in (1, 5, 5, 6, 6, 6)
+    ])
+    db.session.commit()
+    assert archive_closed_months(now=NOW, hot_months=2) == {'2024-01': 1}
+
+    def fail(*args, **kwargs):
+        pytest.fail('arquivo aberto para uma página recente')
+
+    monkeypatch.setattr(transaction_archive, 'query_archives', fail)
+    items, cursor = paginate_transactions(
+        Transaction.query.filter_by(anon_id=ANON_ID), Transaction.anon_id == ANON_ID, per_page=3
+    )
+    assert len(items) == 3 and cursor
@@ -0,0 +1,168 @@
+"""
+Inbox de webhooks: reentregas não creditam duas vezes e cada lote credita
+uma vez por sessão
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database import db
+from src.models.anon_session import AnonymousSession
+from src.models.casino import Transaction
+from src.models.webhook_event import WebhookEvent
+from src.payment_gateways import payment_manager
+from src.routes.payments import payments_bp
+from src.services.ledger import get_session_totals, record_transaction
+from src.services import payment_queue, webhook_inbox
+from src.services.payment_queue import enqueue_payment, run_pending_jobs
+from src.services.webhook_inbox import drain_inbox
+
+ANON_ID = '33333333-3333-3333-3333-333333333333'
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(payments_bp, url_prefix='/api/payments')
+    db.session.add(AnonymousSession(anon_id=ANON_ID, balance_cents=1000))
+    for index, amount in enumerate((2000, 3000, 5000)):
+        record_transaction(ANON_ID, 'deposit', amount, balance_after=1000, status='processing',
+                           payment_method='pix', external_transaction_id=f'pg_{index}')
+    db.session.commit()
+    return app.test_client()
+
+
+def deliver(client, external_id, status, signed=True):
+    body = json.dumps({
+        'event': 'transaction_status_changed',
+        'transaction': {'id': external_id, 'status': status}
+    }).encode()
+    headers = {'Content-Type': 'application/json'}
+    if signed:
+        api_key = payment_manager.gateways['pagarme'].api_key
+        headers['X-Hub-Signature'] = 'sha1=' + hmac.new(api_key.encode(), body, hashlib.sha1).hexdigest()
+    return client.post('/api/payments/webhook/pagarme', data=body, headers=headers)
+
+
+def balance():
+    db.session.expire_all()
+    return db.session.query(AnonymousSession.balance_cents).filter_by(anon_id=ANON_ID).scalar()
+
+
+def test_redelivered_paid_webhook_credits_once(client):
+    first = deliver(client, 'pg_0', 'paid')
+    again = deliver(client, 'pg_0', 'paid')
+    assert first.status_code == again.status_code == 200
+    assert again.get_json()['duplicate'] is True
+    assert balance() == 1000
+
+    assert drain_inbox() == 1
+    assert balance() == 3000
+
+    # Evento novo para uma transação já concluída é ignorado
+    deliver(client, 'pg_0', 'waiting_payment')
+    drain_inbox()
+    assert balance() == 3000
+    assert WebhookEvent.query.order_by(WebhookEvent.id.desc()).first().result == 'ignored'
+
+
+def test_batch_credits_each_session_once(client):
+    for external_id in ('pg_0', 'pg_1', 'pg_2'):
+        deliver(client, external_id, 'paid')
+    deliver(client, 'pg_desconhecida', 'paid')
+
+    assert drain_inbox() == 4
+    assert balance() == 11000
+
+    deposits = Transaction.query.filter_by(anon_id=ANON_ID).order_by(Transaction.id).all()
+    assert [t.status for t in deposits] == ['completed'] * 3
+    assert [t.balance_after_cents for t in deposits] == [3000, 6000, 11000]
+    assert get_session_totals(ANON_ID)['total_deposited_cents'] == 10000
+    assert get_session_totals(ANON_ID)['deposit_count'] == 3
+    assert sorted(e.result for e in WebhookEvent.query if e.processed_at) == ['applied'] * 3
+    # Sem transação ainda: fica na inbox para nova tentativa
+    unknown = WebhookEvent.query.filter_by(external_transaction_id='pg_desconhecida').one()
+    assert (unknown.processed_at, unknown.attempts) == (None, 1)
+    assert unknown.next_attempt_at > datetime.utcnow()
+
+
+def test_unsigned_webhook_is_rejected(client):
+    assert deliver(client, 'pg_0', 'paid', signed=False).status_code == 401
+    response = client.post('/api/payments/webhook/pagarme', json={'transaction': {'id': 'pg_0', 'status': 'paid'}},
+                           headers={'X-Hub-Signature': 'sha1=' + '0' * 40})
+    assert response.status_code == 401
+    assert WebhookEvent.query.count() == 0
+
+
+def test_refused_then_paid_in_same_batch_completes(client):
+    deliver(client, 'pg_1', 'refused')
+    deliver(client, 'pg_1', 'paid')
+    drain_inbox()
+
+    assert db.session.query(Transaction.status).filter_by(external_transaction_id='pg_1').scalar() == 'completed'
+    assert balance() == 4000
+
+
+def test_status_poll_and_webhook_credit_once(client, monkeypatch):
+    from src.routes import payments
+    from src.services.status_cache import gateway_status_cache
+
+    monkeypatch.setattr(payments.payment_manager, 'get_payment_status',
+                        lambda external_id: {'success': True, 'status': 'paid'})
+    gateway_status_cache.clear()
+    transaction_id = db.session.query(Transaction.id).filter_by(external_transaction_id='pg_2').scalar()
+
+    assert client.get(f'/api/payments/status/{transaction_id}').get_json()['status'] == 'completed'
+    deliver(client, 'pg_2', 'paid')
+    drain_inbox()
+
+    assert balance() == 6000
+    assert WebhookEvent.query.one().result == 'ignored'
+
+
+def test_webhook_before_worker_commit_is_applied_later(client, monkeypatch):
+    # Transação pendente: o worker ainda não gravou o id devolvido pelo gateway
+    transaction = record_transaction(ANON_ID, 'deposit', 4000, balance_after=1000, status='pending',
+                                     payment_method='pix')
+    db.session.flush()
+    enqueue_payment(transaction, {'method': 'pix', 'amount_cents': 4000})
+    db.session.commit()
+
+    deliver(client, 'pg_new', 'paid')
+    assert drain_inbox() == 1
+    assert balance() == 1000
+    # Reentrega do mesmo evento é deduplicada, mas o original segue pendente
+    assert deliver(client, 'pg_new', 'paid').get_json()['duplicate'] is True
+    assert drain_inbox() == 0
+
+    class Gateway:
+        def process_payment(self, payment_data):
+            return {'success': True, 'transaction_id': 'pg_new', 'status': 'waiting_payment'}
+
+    monkeypatch.setattr(payment_queue, 'payment_manager', Gateway())
+    assert run_pending_jobs() == 1
+    assert drain_inbox() == 1
+
+    event = WebhookEvent.query.filter_by(external_transaction_id='pg_new').one()
+    assert (event.result, event.attempts) == ('applied', 1)
+    assert db.session.get(Transaction, transaction.id).status == 'completed'
+    assert balance() == 5000
+
+
+def test_unmatched_event_gives_up_after_max_attempts(client, monkeypatch):
+    monkeypatch.setattr(webhook_inbox, 'NOT_FOUND_MAX_ATTEMPTS', 3)
+    deliver(client, 'pg_fantasma', 'paid')
+
+    for attempt in range(1, 4):
+        assert drain_inbox() == 1
+        event = WebhookEvent.query.one()
+        assert event.attempts == attempt
+        event.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    event = WebhookEvent.query.one()
+    assert (event.result, event.processed_at is not None) == ('not_found', True)
+    assert drain_inbox() == 0